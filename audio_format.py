@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+TTS输出音频格式协商
+根据输出设备能力选择线上（StartSession）音频格式：
+- 优先 pcm_s16le（Int16，2字节/采样）：网络字节、队列内存、拷贝开销均为 Float32 的一半
+- 设备不支持 Int16 时回退 pcm（Float32，4字节/采样）
+- 可通过环境变量 DRAGON_TTS_FORMAT=auto|pcm_s16le|pcm 强制指定
+
+协商结果同时决定 StartSession 的 tts.audio_config.format 与输出流的采样格式，
+服务端下发的音频包无需任何逐包转换即可直接写入设备。
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyaudio  # type: ignore
+    PA_INT16 = pyaudio.paInt16
+    PA_FLOAT32 = pyaudio.paFloat32
+except Exception:
+    # 与 official_example/config.py 保持一致的常量回退
+    PA_INT16 = 8
+    PA_FLOAT32 = 1
+
+
+@dataclass(frozen=True)
+class WireFormat:
+    """线上音频格式描述"""
+    name: str          # StartSession 中 tts.audio_config.format 的取值
+    pa_format: int     # PyAudio 采样格式常量
+    sample_width: int  # 每个采样的字节数
+    numpy_dtype: str   # 对应的 numpy dtype（小端）
+    label: str         # 日志展示用名称
+
+
+PCM_S16LE = WireFormat(name="pcm_s16le", pa_format=PA_INT16, sample_width=2, numpy_dtype="<i2", label="Int16")
+PCM_F32LE = WireFormat(name="pcm", pa_format=PA_FLOAT32, sample_width=4, numpy_dtype="<f4", label="Float32")
+
+WIRE_FORMATS: Dict[str, WireFormat] = {fmt.name: fmt for fmt in (PCM_S16LE, PCM_F32LE)}
+
+# 优先级：字节数少的格式优先
+DEFAULT_PREFERENCE: List[WireFormat] = [PCM_S16LE, PCM_F32LE]
+
+_FORMAT_ALIASES = {
+    "pcm_s16le": "pcm_s16le",
+    "s16le": "pcm_s16le",
+    "int16": "pcm_s16le",
+    "pcm": "pcm",
+    "f32le": "pcm",
+    "float32": "pcm",
+}
+
+
+def resolve_wire_format(name: Optional[str]) -> Optional[WireFormat]:
+    """将格式名（含别名）解析为 WireFormat；auto/空/未知返回 None"""
+    if not name:
+        return None
+    key = _FORMAT_ALIASES.get(str(name).strip().lower())
+    return WIRE_FORMATS.get(key) if key else None
+
+
+def device_supports_format(pa: Any, fmt: WireFormat, sample_rate: int, channels: int,
+                           device_index: Optional[int] = None) -> bool:
+    """查询输出设备是否支持指定采样格式；无法查询时按支持处理（PortAudio 会自行转换）"""
+    if pa is None:
+        return True
+    try:
+        if device_index is None:
+            device_index = pa.get_default_output_device_info()["index"]
+        return bool(pa.is_format_supported(
+            sample_rate,
+            output_device=device_index,
+            output_channels=channels,
+            output_format=fmt.pa_format,
+        ))
+    except ValueError:
+        # PyAudio 对不支持的组合抛出 ValueError
+        return False
+    except Exception:
+        return True
+
+
+def negotiate_output_format(pa: Any, sample_rate: int, channels: int,
+                            device_index: Optional[int] = None,
+                            preferred: Optional[str] = None) -> WireFormat:
+    """按设备能力协商 TTS 线上格式
+
+    Args:
+        pa: PyAudio 实例（None 表示无设备可查询，例如无头模式）
+        sample_rate: 输出采样率
+        channels: 输出声道数
+        device_index: 输出设备索引，None 为默认设备
+        preferred: 强制格式，None 时读取 DRAGON_TTS_FORMAT
+
+    Returns:
+        WireFormat: 协商得到的格式
+    """
+    if preferred is None:
+        preferred = os.environ.get("DRAGON_TTS_FORMAT", "auto")
+    forced = resolve_wire_format(preferred)
+    if forced is not None:
+        candidates = [forced] + [fmt for fmt in DEFAULT_PREFERENCE if fmt is not forced]
+    else:
+        if preferred and str(preferred).strip().lower() != "auto":
+            print(f"⚠️ DRAGON_TTS_FORMAT 无效: {preferred}，使用自动协商")
+        candidates = list(DEFAULT_PREFERENCE)
+
+    for fmt in candidates:
+        if device_supports_format(pa, fmt, sample_rate, channels, device_index):
+            if forced is not None and fmt is not forced:
+                print(f"⚠️ 输出设备不支持 {forced.label}，回退 {fmt.label}")
+            return fmt
+    # 所有候选都被设备拒绝时保留首选，交由打开输出流时报错
+    return candidates[0]
+
+
+def apply_to_start_session(start_session_req: Dict[str, Any], fmt: WireFormat) -> Dict[str, Any]:
+    """将协商结果写入 StartSession 请求的 tts.audio_config.format"""
+    tts = start_session_req.setdefault("tts", {})
+    audio_config = tts.setdefault("audio_config", {})
+    audio_config["format"] = fmt.name
+    return start_session_req
+
+
+def bytes_per_second(fmt: WireFormat, sample_rate: int, channels: int = 1) -> int:
+    """每秒语音对应的 PCM 字节数"""
+    return fmt.sample_width * sample_rate * channels
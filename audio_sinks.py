@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+可插拔音频输出端（AudioSink）
+将播放线程与具体声卡解耦，便于在无声卡机器上运行完整会话并做播放链路压测：
+- PyAudioSink:      PyAudio 实时输出（原有行为），由设备缓冲决定节奏
+- SubprocessSink:   流式写入 paplay/aplay 子进程的标准输入
+- WavFileSink:      写入 WAV 文件
+- NullSink:         丢弃音频，仅统计
+除 PyAudio 外的输出端均按实时节奏阻塞 write()，与真实设备的背压一致；
+所有输出端都会统计写入帧数、欠载次数以及播放线程消耗的 CPU 时间。
+
+环境变量：
+- DRAGON_AUDIO_SINK=auto|pyaudio|subprocess|wav|null   (默认 auto)
+- DRAGON_AUDIO_SINK_FILE=输出WAV路径                    (wav 输出端，默认 dragon_output.wav)
+- DRAGON_AUDIO_SINK_BUFFER_MS=200                        (非设备输出端允许超前写入的缓冲时长)
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from typing import Any, Dict, List, Optional
+
+from audio_format import WireFormat, PCM_S16LE
+
+try:
+    import pyaudio  # type: ignore
+    PYAUDIO_AVAILABLE = True
+except Exception:
+    pyaudio = None
+    PYAUDIO_AVAILABLE = False
+
+SINK_KINDS = ("pyaudio", "subprocess", "wav", "null")
+
+
+class AudioSink:
+    """音频输出端基类
+
+    子类实现 _open/_write/_close；write() 负责实时节奏控制与统计。
+    """
+
+    kind = "base"
+    # 设备自带背压的输出端（PyAudio）无需软件节拍
+    self_paced = False
+
+    def __init__(self, wire_format: WireFormat, sample_rate: int, channels: int = 1,
+                 buffer_ms: Optional[int] = None, realtime: bool = True):
+        self.wire_format = wire_format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bytes_per_frame = wire_format.sample_width * channels
+        self.realtime = realtime
+        if buffer_ms is None:
+            try:
+                buffer_ms = int(os.environ.get("DRAGON_AUDIO_SINK_BUFFER_MS", "200"))
+            except ValueError:
+                buffer_ms = 200
+        self.buffer_sec = max(0, buffer_ms) / 1000.0
+        self.is_open = False
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self.frames_written = 0
+        self.write_calls = 0
+        self.underruns = 0
+        self.cpu_seconds = 0.0
+        self._clock_start: Optional[float] = None
+        self._clock_frames = 0
+        self._cpu_thread: Optional[int] = None
+        self._cpu_origin = 0.0
+
+    # ---- 生命周期 ----
+    def open(self) -> "AudioSink":
+        if not self.is_open:
+            self._open()
+            self.is_open = True
+        return self
+
+    def close(self) -> None:
+        if self.is_open:
+            self.is_open = False
+            try:
+                self._close()
+            except Exception as e:
+                print(f"⚠️ 关闭音频输出端失败({self.kind}): {e}")
+
+    def discard_pending(self) -> None:
+        """打断播放时调用：重置实时节拍，使下一段音频不再等待已丢弃的积压"""
+        with self._lock:
+            self._clock_start = None
+            self._clock_frames = 0
+
+    # ---- 写入 ----
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        if not self.is_open:
+            raise RuntimeError(f"音频输出端未打开: {self.kind}")
+        frames = len(data) // self.bytes_per_frame
+        if self.realtime and not self.self_paced:
+            self._pace(frames)
+        self._write(data)
+        self.frames_written += frames
+        self.write_calls += 1
+        self._account_cpu()
+
+    def _pace(self, frames: int) -> None:
+        """实时节拍：最多超前 buffer_sec 写入，超出部分按真实播放速度阻塞"""
+        now = time.monotonic()
+        with self._lock:
+            if self._clock_start is None:
+                self._clock_start = now
+                self._clock_frames = 0
+            played = now - self._clock_start
+            queued = self._clock_frames / self.sample_rate
+            if queued < played:
+                # 写入跟不上播放：设备欠载，重新对齐时钟
+                if self._clock_frames > 0:
+                    self.underruns += 1
+                self._clock_start = now
+                self._clock_frames = 0
+                queued = played = 0.0
+            wait = queued - played - self.buffer_sec
+            self._clock_frames += frames
+        if wait > 0:
+            time.sleep(wait)
+
+    def _account_cpu(self) -> None:
+        """统计播放线程 CPU 时间（含出队、重采样等写入之间的全部工作，不含节拍睡眠）"""
+        ident = threading.get_ident()
+        cpu_now = time.thread_time()
+        if self._cpu_thread != ident:
+            # 首次写入或播放线程更替：以当前线程 CPU 时钟为新起点
+            self._cpu_thread = ident
+            self._cpu_origin = cpu_now - self.cpu_seconds
+        self.cpu_seconds = cpu_now - self._cpu_origin
+
+    def stats(self) -> Dict[str, Any]:
+        seconds = self.frames_written / float(self.sample_rate) if self.sample_rate else 0.0
+        return {
+            "kind": self.kind,
+            "format": self.wire_format.name,
+            "sample_rate": self.sample_rate,
+            "frames_written": self.frames_written,
+            "seconds_written": round(seconds, 3),
+            "write_calls": self.write_calls,
+            "underruns": self.underruns,
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "cpu_per_audio_second": round(self.cpu_seconds / seconds, 6) if seconds else 0.0,
+        }
+
+    # ---- 子类实现 ----
+    def _open(self) -> None:
+        pass
+
+    def _write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class PyAudioSink(AudioSink):
+    """PyAudio 实时输出（可选设备索引）"""
+
+    kind = "pyaudio"
+    self_paced = True
+
+    def __init__(self, wire_format: WireFormat, sample_rate: int, channels: int = 1,
+                 pa: Any = None, frames_per_buffer: int = 3200,
+                 device_index: Optional[int] = None, **kwargs):
+        super().__init__(wire_format, sample_rate, channels, **kwargs)
+        if not PYAUDIO_AVAILABLE and pa is None:
+            raise RuntimeError("PyAudio 未安装")
+        self.pa = pa
+        self._owns_pa = pa is None
+        self.frames_per_buffer = frames_per_buffer
+        self.device_index = device_index
+        self.stream = None
+
+    def _open(self) -> None:
+        if self.pa is None:
+            self.pa = pyaudio.PyAudio()
+        kwargs = dict(
+            format=self.wire_format.pa_format,
+            channels=self.channels,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer,
+        )
+        if self.device_index is not None:
+            kwargs["output_device_index"] = self.device_index
+        self.stream = self.pa.open(**kwargs)
+
+    def _write(self, data: bytes) -> None:
+        # 写入前等待到足够帧空间，避免大块阻塞；部分后端不支持查询时直接写
+        frames = len(data) // self.bytes_per_frame
+        while True:
+            try:
+                if self.stream.get_write_available() >= frames:
+                    break
+            except Exception:
+                break
+            time.sleep(0.002)
+        self.stream.write(data, exception_on_underflow=False)
+
+    def _close(self) -> None:
+        if self.stream is not None:
+            try:
+                if self.stream.is_active():
+                    self.stream.stop_stream()
+            except Exception:
+                pass
+            self.stream.close()
+            self.stream = None
+        if self._owns_pa and self.pa is not None:
+            self.pa.terminate()
+            self.pa = None
+
+
+class SubprocessSink(AudioSink):
+    """流式写入外部播放器（paplay/aplay）的标准输入"""
+
+    kind = "subprocess"
+
+    def __init__(self, wire_format: WireFormat, sample_rate: int, channels: int = 1,
+                 command: Optional[List[str]] = None, **kwargs):
+        super().__init__(wire_format, sample_rate, channels, **kwargs)
+        self.command = command or self.default_command(wire_format, sample_rate, channels)
+        if not self.command:
+            raise RuntimeError("未找到可用的流式播放器 (paplay/aplay)")
+        self.process: Optional[subprocess.Popen] = None
+
+    @staticmethod
+    def default_command(wire_format: WireFormat, sample_rate: int, channels: int) -> Optional[List[str]]:
+        is_int16 = wire_format.sample_width == 2
+        if shutil.which("paplay"):
+            return ["paplay", "--raw", f"--rate={sample_rate}", f"--channels={channels}",
+                    f"--format={'s16le' if is_int16 else 'float32le'}"]
+        if shutil.which("aplay"):
+            return ["aplay", "-q", "-t", "raw", "-f", "S16_LE" if is_int16 else "FLOAT_LE",
+                    "-c", str(channels), "-r", str(sample_rate)]
+        return None
+
+    def _open(self) -> None:
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def _write(self, data: bytes) -> None:
+        if self.process is None or self.process.poll() is not None:
+            raise RuntimeError(f"播放子进程已退出: {self.command[0]}")
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def _close(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+
+class WavFileSink(AudioSink):
+    """写入 WAV 文件（Int16 为标准 PCM；Float32 按 4 字节采样原样写入）"""
+
+    kind = "wav"
+
+    def __init__(self, wire_format: WireFormat, sample_rate: int, channels: int = 1,
+                 path: Optional[str] = None, **kwargs):
+        super().__init__(wire_format, sample_rate, channels, **kwargs)
+        self.path = path or os.environ.get("DRAGON_AUDIO_SINK_FILE", "dragon_output.wav")
+        self._wav = None
+
+    def _open(self) -> None:
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(self.channels)
+        self._wav.setsampwidth(self.wire_format.sample_width)
+        self._wav.setframerate(self.sample_rate)
+
+    def _write(self, data: bytes) -> None:
+        self._wav.writeframes(data)
+
+    def _close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+class NullSink(AudioSink):
+    """丢弃音频，只做实时节拍与统计，用于无头压测"""
+
+    kind = "null"
+
+    def _write(self, data: bytes) -> None:
+        pass
+
+
+def _sink_classes() -> Dict[str, type]:
+    return {
+        "pyaudio": PyAudioSink,
+        "subprocess": SubprocessSink,
+        "wav": WavFileSink,
+        "null": NullSink,
+    }
+
+
+def create_audio_sink(wire_format: WireFormat = PCM_S16LE, sample_rate: int = 24000, channels: int = 1,
+                      kind: Optional[str] = None, **kwargs) -> AudioSink:
+    """按类型创建并打开输出端
+
+    kind 为 None 时读取 DRAGON_AUDIO_SINK；auto 依次尝试 pyaudio -> subprocess -> null。
+    kwargs 透传给具体输出端（如 pa / device_index / path / command）。
+    """
+    kind = (kind or os.environ.get("DRAGON_AUDIO_SINK", "auto")).strip().lower()
+    classes = _sink_classes()
+    if kind != "auto":
+        if kind not in classes:
+            raise ValueError(f"未知音频输出端: {kind}（可选: {', '.join(SINK_KINDS)}）")
+        return _build(classes[kind], wire_format, sample_rate, channels, kwargs).open()
+
+    failures: List[str] = []
+    for candidate in ("pyaudio", "subprocess", "null"):
+        try:
+            sink = _build(classes[candidate], wire_format, sample_rate, channels, kwargs).open()
+            if failures:
+                print(f"⚠️ 音频输出端不可用({'; '.join(failures)})，改用 {candidate} 输出端")
+            return sink
+        except Exception as e:
+            failures.append(f"{candidate}: {e}")
+    raise RuntimeError(f"无可用音频输出端: {'; '.join(failures)}")
+
+
+def _build(cls: type, wire_format: WireFormat, sample_rate: int, channels: int,
+           kwargs: Dict[str, Any]) -> AudioSink:
+    # 只传递目标输出端认识的参数
+    accepted = {
+        PyAudioSink: ("pa", "frames_per_buffer", "device_index"),
+        SubprocessSink: ("command",),
+        WavFileSink: ("path",),
+        NullSink: (),
+    }[cls]
+    common = ("buffer_ms", "realtime")
+    params = {k: v for k, v in kwargs.items() if k in accepted or k in common}
+    return cls(wire_format, sample_rate, channels, **params)
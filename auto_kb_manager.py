@@ -222,34 +222,54 @@ class AutoKnowledgeBaseManager:
         try:
             category = self._detect_category(file_path)
             success = self.kb_manager.add_document(str(file_path), category)
-            
-            if success:
-                logger.info(f"✅ 成功添加到知识库: {file_path.name} (分类: {category})")
-                
-                # 更新元数据
-                file_key = str(file_path)
-                if file_key in self.file_metadata["files"]:
-                    self.file_metadata["files"][file_key]["in_kb"] = True
-                    self.file_metadata["files"][file_key]["added_time"] = time.time()
-                    self.file_metadata["files"][file_key]["status"] = "success"
-                
-                return True
-            else:
-                logger.warning(f"⚠️ 跳过文档（可能是扫描版或空内容）: {file_path.name}")
-                
-                # 记录跳过状态
-                file_key = str(file_path)
-                if file_key in self.file_metadata["files"]:
-                    self.file_metadata["files"][file_key]["in_kb"] = False
-                    self.file_metadata["files"][file_key]["status"] = "skipped_empty_content"
-                    self.file_metadata["files"][file_key]["skip_reason"] = "Empty content or scanned PDF"
-                
-                return False
+            return self._record_kb_result(file_path, success, category)
                 
         except Exception as e:
             logger.error(f"添加文件到知识库时出错 {file_path.name}: {e}")
             return False
     
+    def add_files_to_kb(self, file_paths: List[Path]) -> Dict[str, bool]:
+        """批量添加文件到知识库：按分类分组，每组一次分批编码写入"""
+        if not self.kb_manager:
+            logger.error("知识库管理器未初始化")
+            return {str(path): False for path in file_paths}
+        
+        by_category: Dict[str, List[Path]] = {}
+        for file_path in file_paths:
+            by_category.setdefault(self._detect_category(file_path), []).append(file_path)
+        
+        results = {}
+        for category, paths in by_category.items():
+            outcome = self.kb_manager.add_documents([str(path) for path in paths], category)
+            for file_path in paths:
+                results[str(file_path)] = self._record_kb_result(file_path, outcome.get(str(file_path), False), category)
+        return results
+    
+    def _record_kb_result(self, file_path: Path, success: bool, category: str) -> bool:
+        """记录文件入库结果到元数据"""
+        file_key = str(file_path)
+        info = self.file_metadata["files"].get(file_key)
+        if success:
+            logger.info(f"✅ 成功添加到知识库: {file_path.name} (分类: {category})")
+            
+            # 更新元数据
+            if info is not None:
+                info["in_kb"] = True
+                info["added_time"] = time.time()
+                info["status"] = "success"
+            
+            return True
+        
+        logger.warning(f"⚠️ 跳过文档（可能是扫描版或空内容）: {file_path.name}")
+        
+        # 记录跳过状态
+        if info is not None:
+            info["in_kb"] = False
+            info["status"] = "skipped_empty_content"
+            info["skip_reason"] = "Empty content or scanned PDF"
+        
+        return False
+    
     def auto_update_knowledge_base(self) -> Dict[str, int]:
         """自动更新知识库"""
         logger.info("🔄 开始自动更新知识库...")
@@ -264,16 +284,16 @@ class AutoKnowledgeBaseManager:
             "errors": 0
         }
         
-        # 处理新文件
+        # 新文件与修改的文件（重新添加）一起批量编码入库
+        results = self.add_files_to_kb(new_files + modified_files)
         for file_path in new_files:
-            if self.add_file_to_kb(file_path):
+            if results.get(str(file_path)):
                 stats["new_added"] += 1
             else:
                 stats["errors"] += 1
         
-        # 处理修改的文件（重新添加）
         for file_path in modified_files:
-            if self.add_file_to_kb(file_path):
+            if results.get(str(file_path)):
                 stats["modified_updated"] += 1
             else:
                 stats["errors"] += 1
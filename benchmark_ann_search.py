@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+IVF 近似检索基准测试：召回率@K 与耗时
+在同一语料上对比精确检索（DenseVectorIndex 逐行扫描）与 IVF-flat（ivf_index.IVFFlatIndex）
+在不同 nprobe 下的单条查询耗时、扫描比例与召回率@K（以精确 Top-K 为基准），用于选择
+DRAGON_KB_IVF_NLIST / DRAGON_KB_IVF_NPROBE。
+
+不依赖嵌入模型：语料为带主题结构的合成向量（若干主题中心 + 噪声，模拟同一手册/法规的片段彼此相近），
+查询从同一分布另行采样，不与语料重合。纯随机向量没有簇结构，任何 IVF 在其上都只能靠扫描大部分列表取得召回。
+
+使用示例：
+    python3 benchmark_ann_search.py
+    python3 benchmark_ann_search.py --sizes 100000,300000 --nprobe 4,8,16,32 --top-k 5
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from ivf_index import IVFFlatIndex, auto_nlist
+from vector_index import DenseVectorIndex
+
+DIM = 384
+
+
+def clustered_corpus(size: int, dim: int, topics: int, noise: float, seed: int) -> np.ndarray:
+    """主题中心 + 高斯噪声（分块生成，控制临时内存）"""
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(0).standard_normal((topics, dim), dtype=np.float32)
+    out = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 100000):
+        end = min(size, start + 100000)
+        labels = rng.integers(0, topics, end - start)
+        out[start:end] = centers[labels] + noise * rng.standard_normal((end - start, dim), dtype=np.float32)
+    return out
+
+
+def per_query_ms(fn, queries: np.ndarray) -> float:
+    fn(queries[0])  # 预热
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF 近似检索基准测试（召回率@K 与耗时）")
+    parser.add_argument("--sizes", default="100000,300000", help="语料片段数（逗号分隔）")
+    parser.add_argument("--dim", type=int, default=DIM, help="向量维度")
+    parser.add_argument("--top-k", type=int, default=5, help="召回率@K 的 K")
+    parser.add_argument("--queries", type=int, default=200, help="查询条数")
+    parser.add_argument("--nlist", type=int, default=0, help="倒排列表数（0 = √片段数）")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="探查列表数（逗号分隔）")
+    parser.add_argument("--topics", type=int, default=0, help="合成语料主题数（0 = 片段数/200）")
+    parser.add_argument("--noise", type=float, default=1.5, help="主题内噪声强度（越大簇结构越弱）")
+    parser.add_argument("--dtype", default="float32", help="索引存储精度（float32 / float16）")
+    args = parser.parse_args()
+
+    sizes: List[int] = [int(s) for s in args.sizes.split(",") if s.strip()]
+    nprobes: List[int] = [int(s) for s in args.nprobe.split(",") if s.strip()]
+
+    print("🔎 IVF 近似检索基准测试")
+    print(f"   维度 {args.dim} | 召回率@{args.top_k} | 查询 {args.queries} 条 | 存储 {args.dtype} | 噪声 {args.noise}")
+    for size in sizes:
+        topics = args.topics or max(1, size // 200)
+        corpus = clustered_corpus(size, args.dim, topics, args.noise, seed=1)
+        queries = clustered_corpus(args.queries, args.dim, topics, args.noise, seed=2)
+        index = DenseVectorIndex(corpus, dtype=args.dtype)
+        del corpus
+
+        ivf = IVFFlatIndex(index, nlist=args.nlist or auto_nlist(size))
+        ivf.train()
+        exact_ms = per_query_ms(lambda q: index.search(q, args.top_k), queries)
+        exact = [set(idx.tolist()) for idx, _ in index.search(queries, args.top_k)]
+
+        print("=" * 72)
+        print(f"片段数 {size} | 主题 {topics} | nlist {ivf.nlist} | 训练 {ivf.train_seconds:.1f}s "
+              f"| 精确检索 {exact_ms:.2f} ms/条")
+        print(f"{'nprobe':>8}{'扫描比例':>10}{'ms/条':>10}{'加速比':>10}{f'召回率@{args.top_k}':>12}")
+        for nprobe in nprobes:
+            if nprobe > ivf.nlist:
+                continue
+            ms = per_query_ms(lambda q: ivf.search(q, args.top_k, nprobe=nprobe), queries)
+            got = [set(idx.tolist()) for idx, _ in ivf.search(queries, args.top_k, nprobe=nprobe)]
+            recall = np.mean([len(g & e) / max(1, len(e)) for g, e in zip(got, exact)])
+            print(f"{nprobe:>8}{nprobe / ivf.nlist:>10.1%}{ms:>10.2f}{exact_ms / ms:>10.1f}{recall:>12.1%}")
+        del index, ivf
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+TTS输出格式基准测试
+对比 Float32(pcm) 与 Int16(pcm_s16le) 每秒语音的：
+- 网络字节数（原始 PCM / gzip 压缩后）
+- 播放链路 CPU 时间（入队、出队、按 512 帧分块写入空设备）
+同时给出旧播放路径（每包调用不存在的 _ensure_output_format 并捕获 AttributeError）的开销作为对照。
+
+使用示例：
+    python3 benchmark_audio_formats.py
+    python3 benchmark_audio_formats.py --seconds 30 --packet-ms 40
+"""
+
+import argparse
+import array
+import gzip
+import math
+import queue
+import time
+
+from audio_format import PCM_F32LE, PCM_S16LE, WireFormat, bytes_per_second
+
+SAMPLE_RATE = 24000
+FRAMES_PER_WRITE = 512
+
+
+def synthesize_speech_like(seconds: float, fmt: WireFormat) -> bytes:
+    """生成类语音信号（基频+共振峰+音节包络），用于衡量真实的压缩率"""
+    total = int(seconds * SAMPLE_RATE)
+    values = []
+    for n in range(total):
+        t = n / SAMPLE_RATE
+        envelope = 0.5 * (1 - math.cos(2 * math.pi * 4 * t))  # 约4个音节/秒
+        sample = (0.5 * math.sin(2 * math.pi * 140 * t)
+                  + 0.3 * math.sin(2 * math.pi * 720 * t)
+                  + 0.2 * math.sin(2 * math.pi * 1240 * t))
+        values.append(0.6 * envelope * sample)
+    if fmt.sample_width == 2:
+        return array.array('h', (int(v * 32767) for v in values)).tobytes()
+    return array.array('f', values).tobytes()
+
+
+def split_packets(pcm: bytes, fmt: WireFormat, packet_ms: int):
+    packet_bytes = int(SAMPLE_RATE * packet_ms / 1000) * fmt.sample_width
+    return [pcm[i:i + packet_bytes] for i in range(0, len(pcm), packet_bytes)]
+
+
+class _NullStream:
+    """不发声的输出流，只消费字节"""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, chunk, exception_on_underflow=False):
+        self.bytes_written += len(chunk)
+
+
+class _LegacySession:
+    """模拟旧播放路径：每包调用不存在的格式适配函数"""
+
+
+def play_packets(packets, fmt: WireFormat, legacy: bool) -> int:
+    audio_queue = queue.Queue()
+    stream = _NullStream()
+    session = _LegacySession()
+    bytes_per_write = FRAMES_PER_WRITE * fmt.sample_width
+    for packet in packets:
+        audio_queue.put(packet)
+    while not audio_queue.empty():
+        audio_data = audio_queue.get_nowait()
+        if legacy:
+            try:
+                audio_data = session._ensure_output_format(audio_data)
+            except Exception:
+                pass
+        for i in range(0, len(audio_data), bytes_per_write):
+            stream.write(audio_data[i:i + bytes_per_write], exception_on_underflow=False)
+    return stream.bytes_written
+
+
+def measure(fmt: WireFormat, seconds: float, packet_ms: int, repeat: int, legacy: bool = False) -> dict:
+    pcm = synthesize_speech_like(seconds, fmt)
+    packets = split_packets(pcm, fmt, packet_ms)
+    compressed = sum(len(gzip.compress(p)) for p in packets)
+
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        play_packets(packets, fmt, legacy)
+    cpu_elapsed = time.process_time() - cpu_start
+
+    return {
+        "format": fmt.label + (" (旧路径)" if legacy else ""),
+        "raw_bytes_per_sec": len(pcm) / seconds,
+        "gzip_bytes_per_sec": compressed / seconds,
+        "cpu_us_per_sec": cpu_elapsed / repeat / seconds * 1e6,
+        "packets_per_sec": len(packets) / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS输出格式基准测试")
+    parser.add_argument("--seconds", type=float, default=10.0, help="模拟语音时长(秒)")
+    parser.add_argument("--packet-ms", type=int, default=40, help="服务端音频包时长(毫秒)")
+    parser.add_argument("--repeat", type=int, default=50, help="播放链路重复次数")
+    args = parser.parse_args()
+
+    print("🎚️ TTS输出格式基准测试")
+    print(f"   采样率 {SAMPLE_RATE}Hz 单声道 | 包长 {args.packet_ms}ms | 语音 {args.seconds}s x {args.repeat}")
+    print("=" * 78)
+    print(f"{'格式':<18}{'原始字节/秒':>14}{'gzip字节/秒':>14}{'包/秒':>10}{'CPU(µs)/秒语音':>18}")
+    rows = [
+        measure(PCM_F32LE, args.seconds, args.packet_ms, args.repeat, legacy=True),
+        measure(PCM_F32LE, args.seconds, args.packet_ms, args.repeat),
+        measure(PCM_S16LE, args.seconds, args.packet_ms, args.repeat),
+    ]
+    for row in rows:
+        print(f"{row['format']:<18}{row['raw_bytes_per_sec']:>14.0f}{row['gzip_bytes_per_sec']:>14.0f}"
+              f"{row['packets_per_sec']:>10.1f}{row['cpu_us_per_sec']:>18.1f}")
+    print("=" * 78)
+    f32 = bytes_per_second(PCM_F32LE, SAMPLE_RATE)
+    s16 = bytes_per_second(PCM_S16LE, SAMPLE_RATE)
+    print(f"📉 Int16 相比 Float32 原始字节减少 {100 * (1 - s16 / f32):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+混合检索基准测试：延迟与命中率
+在展厅评测集（kb_eval_queries.json：游客问法 + 应命中的文档）上对比：
+
+- 向量：LangChain 语义检索（Chroma）；
+- BM25：同一批片段上的关键词检索；
+- 混合：两路并发 + 倒数排名融合（hybrid_retriever.HybridRetriever），并在不同延迟预算下重复，
+  预算过小时向量检索被跳过，命中率退化为 BM25 的水平。
+
+命中率@K：Top-K 结果中任一片段来自 expected 所列文档即为命中，按 exact（含精确产品名/术语）与
+paraphrase（换了说法）分别统计。测试期间关闭查询缓存，每条查询都实际执行检索与查询编码。
+
+使用示例：
+    python3 benchmark_hybrid_search.py
+    python3 benchmark_hybrid_search.py --kb-dir knowledge_base/langchain_kb --top-k 3 --budget-ms 0,50,150,300
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+import query_cache
+from hybrid_retriever import HybridRetriever
+from langchain_knowledge_base import LangChainKnowledgeBase
+
+Search = Callable[[str, int], List[Dict[str, Any]]]
+
+
+def is_hit(results: List[Dict[str, Any]], expected: List[str]) -> bool:
+    return any(name in result.get("filename", "") for result in results for name in expected)
+
+
+def evaluate(label: str, search: Search, queries: List[Dict[str, Any]], top_k: int) -> None:
+    search(queries[0]["query"], top_k)  # 预热（加载倒排表、首次推理）
+    latencies: List[float] = []
+    hits: Dict[str, List[bool]] = {}
+    for item in queries:
+        start = time.perf_counter()
+        results = search(item["query"], top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits.setdefault(item.get("kind", "other"), []).append(is_hit(results, item["expected"]))
+    overall = [h for kind_hits in hits.values() for h in kind_hits]
+
+    def rate(values: List[bool]) -> str:
+        return f"{np.mean(values):.1%}" if values else "-"
+
+    print(f"{label:<18}{np.mean(latencies):>10.1f}{np.percentile(latencies, 95):>10.1f}"
+          f"{rate(overall):>10}{rate(hits.get('exact', [])):>10}{rate(hits.get('paraphrase', [])):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="混合检索基准测试（延迟与命中率）")
+    parser.add_argument("--kb-dir", default="knowledge_base/langchain_kb", help="LangChain 知识库目录")
+    parser.add_argument("--queries", default="kb_eval_queries.json", help="评测集文件")
+    parser.add_argument("--top-k", type=int, default=3, help="命中率@K 的 K")
+    parser.add_argument("--budget-ms", default="0,50,150,300", help="混合检索延迟预算（毫秒，逗号分隔；0 = 不限）")
+    args = parser.parse_args()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+    budgets = [float(s) for s in args.budget_ms.split(",") if s.strip()]
+
+    # 关闭查询缓存：每条查询都实际编码与检索
+    query_cache.embedding_cache.maxsize = 0
+    query_cache.result_cache.maxsize = 0
+
+    print(f"🔎 混合检索基准测试 | 知识库 {args.kb_dir} | 查询 {len(queries)} 条 | 命中率@{args.top_k}")
+    start = time.perf_counter()
+    kb = LangChainKnowledgeBase(args.kb_dir)
+    kb.ready.result()  # 等待嵌入模型与向量数据库后台加载完成
+    print(f"   知识库加载 {time.perf_counter() - start:.1f}s")
+    print("=" * 70)
+    print(f"{'检索方式':<14}{'平均ms':>10}{'P95 ms':>10}{'命中率':>9}{'exact':>10}{'paraphrase':>12}")
+    evaluate("向量", kb.search, queries, args.top_k)  # 已就绪，不会回退为关键词检索
+    evaluate("BM25", kb.lexical_search, queries, args.top_k)
+    for budget in budgets:
+        retriever = HybridRetriever({"vector": kb.search, "bm25": kb.lexical_search}, budget_ms=budget)
+        evaluate(f"混合 预算{budget:.0f}ms" if budget > 0 else "混合 不限时", retriever.search, queries, args.top_k)
+        stats = retriever.snapshot()
+        if any(stats["timeouts"].values()):
+            print(f"{'':<18}超时: {stats['timeouts']}")
+        retriever.close()
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
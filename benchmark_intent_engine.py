@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+共享意图引擎基准测试与回归语料
+对每个语音命令前端（dialog / ros / keyboard / simple / agent）：
+- 在标注语料 intent_corpus.json 上校验意图是否符合期望；
+- 对比意图引擎（单次 Aho-Corasick 扫描）与旧式逐意图 `any(phrase in text ...)` 线性扫描的耗时；
+  拼音音近回退（旧实现没有）的开销单独列出；
+- 对话前端另与旧版 DragonRobotController.execute_command（命令表 `in` 扫描两遍 + 顺序 str.replace 纠错）
+  对比，语料可用 --asr-corpus 换成真实 ASR 转写（每行一条，例如从运行日志 "🎤 语音识别到:" 中导出）。
+
+使用示例：
+    python3 benchmark_intent_engine.py
+    python3 benchmark_intent_engine.py --corpus intent_corpus.json --repeat 500
+    python3 benchmark_intent_engine.py --asr-corpus asr_log.txt
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from intent_engine import IntentEngine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BASE_DIR, "intent_corpus.json")
+
+# 各前端调用引擎时使用的选项（与前端实现一致）
+FRONTEND_OPTIONS = {
+    "dialog": {"phonetic": True},
+    "ros": {},
+    "keyboard": {"ordered": True},
+    "simple": {"keywords": True, "ordered": True},
+    "agent": {"ordered": True},
+}
+
+
+class LinearScan:
+    """旧式实现：按命令表顺序逐意图 any(phrase in text) 扫描"""
+
+    def __init__(self, engine: IntentEngine, intents):
+        self.table = [(name, spec.phrases) for name, spec in engine.intents.items() if name in intents]
+
+    def match(self, text: str) -> Optional[str]:
+        for name, phrases in self.table:
+            if any(phrase in text for phrase in phrases):
+                return name
+        return None
+
+
+class LegacyExecuteCommand:
+    """旧版 DragonRobotController.execute_command 的匹配逻辑（不含打印）"""
+
+    def __init__(self, engine: IntentEngine):
+        self.command_map = engine.phrase_map("cmd_id", frontend="dialog")
+        self.corrections = engine.corrections
+
+    def match(self, text: str) -> Optional[str]:
+        text = text.strip()
+        matched = [(c, s) for c, s in self.command_map.items() if c in text]
+        if not matched:
+            corrected_text = text
+            for error, correct in self.corrections.items():
+                corrected_text = corrected_text.replace(error, correct)
+            if corrected_text != text:
+                for command, cmd_string in self.command_map.items():
+                    if command in corrected_text:
+                        return cmd_string
+        for command, cmd_string in self.command_map.items():
+            if command in text:
+                return cmd_string
+        return None
+
+
+def load_samples(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["samples"]
+
+
+def time_per_call(fn, texts: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享意图引擎基准测试")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="标注语料JSON")
+    parser.add_argument("--repeat", type=int, default=300, help="语料重复次数")
+    parser.add_argument("--asr-corpus", help="对比旧版 execute_command 所用的 ASR 转写文件（每行一条；默认用标注语料）")
+    args = parser.parse_args()
+
+    build_start = time.perf_counter()
+    engine = IntentEngine()
+    build_ms = (time.perf_counter() - build_start) * 1000
+    samples = load_samples(args.corpus)
+    texts = [s["text"] for s in samples]
+
+    print("🧭 共享意图引擎基准测试")
+    print(f"   语料 {len(samples)} 条 x {args.repeat} 次 | 意图 {len(engine.intents)} 个"
+          f" | 模式 {engine.automaton.pattern_count} 个 | 编译 {build_ms:.2f}ms")
+    print("=" * 72)
+    print(f"{'前端':<10}{'线性扫描 µs/条':>16}{'意图引擎 µs/条':>16}{'加速比':>10}{'标注一致':>14}")
+
+    failures, phonetic_notes = [], []
+    for frontend, options in FRONTEND_OPTIONS.items():
+        intents = engine.intents_for(frontend)
+        legacy = LinearScan(engine, intents)
+        legacy_us = time_per_call(legacy.match, texts, args.repeat) * 1e6
+        exact = {k: v for k, v in options.items() if k != "phonetic"}
+        engine_us = time_per_call(lambda t: engine.match(t, intents, **exact), texts, args.repeat) * 1e6
+        if options.get("phonetic"):
+            full_us = time_per_call(lambda t: engine.match(t, intents, **options), texts, args.repeat) * 1e6
+            phonetic_notes.append(f"{frontend} 含拼音音近回退: {full_us:.2f} µs/条（未命中时回退）")
+
+        checked = passed = 0
+        for sample in samples:
+            if frontend not in sample:
+                continue
+            checked += 1
+            match = engine.match(sample["text"], intents, **options)
+            got = match.intent if match else None
+            if got == sample[frontend]:
+                passed += 1
+            else:
+                failures.append(f"[{frontend}] '{sample['text']}' 期望={sample[frontend]} 实际={got}")
+        print(f"{frontend:<10}{legacy_us:>16.2f}{engine_us:>16.2f}{legacy_us / engine_us:>10.2f}"
+              f"{f'{passed}/{checked}':>14}")
+    print("=" * 72)
+    for line in phonetic_notes:
+        print(f"ℹ️ {line}")
+
+    asr_texts = texts
+    if args.asr_corpus:
+        with open(args.asr_corpus, "r", encoding="utf-8") as f:
+            asr_texts = [line.strip() for line in f if line.strip()]
+    intents = engine.intents_for("dialog")
+    legacy_us = time_per_call(LegacyExecuteCommand(engine).match, asr_texts, args.repeat) * 1e6
+    engine_us = time_per_call(lambda t: engine.match(t, intents), asr_texts, args.repeat) * 1e6
+    print(f"ℹ️ dialog 旧版 execute_command（两遍 in 扫描 + 顺序纠错）: {legacy_us:.2f} µs/条 | "
+          f"意图引擎 {engine_us:.2f} µs/条 | 加速比 {legacy_us / engine_us:.2f} | ASR 语料 {len(asr_texts)} 条")
+
+    for line in failures:
+        print(f"⚠️ {line}")
+    if failures:
+        sys.exit(1)
+    print("✅ 全部标注样本通过")
+
+
+if __name__ == "__main__":
+    main()
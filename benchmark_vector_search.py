@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+知识库向量检索基准测试
+对比旧实现（每次查询 cosine_similarity 对全部语料重新归一化 + 全量 argsort）与
+DenseVectorIndex（建索引时一次归一化、矩阵-向量乘积 + argpartition、批量查询）在
+10k / 100k / 1M 片段规模上的单条查询、批量查询耗时与 Top-K 一致性。
+
+不依赖嵌入模型：用固定种子的随机向量模拟 all-MiniLM-L6-v2 的 384 维嵌入，
+只测检索本身（查询编码耗时与语料规模无关）。float16 存储内存减半，但单条查询需逐块转换为
+float32，耗时接近旧实现；批量查询可摊薄转换开销。
+
+使用示例：
+    python3 benchmark_vector_search.py
+    python3 benchmark_vector_search.py --sizes 10000,100000 --dtype float16 --batch 32
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from vector_index import DenseVectorIndex, top_k_indices
+
+DIM = 384
+
+
+def legacy_search(embeddings: np.ndarray, query: np.ndarray, top_k: int) -> np.ndarray:
+    """旧版 VectorSearchEngine.search：cosine_similarity（两侧逐次归一化）+ 全量 argsort"""
+    q = query.reshape(1, -1)
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    corpus = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = (q @ corpus.T)[0]
+    return np.argsort(similarities)[::-1][:top_k]
+
+
+def synthetic_corpus(size: int, dim: int, seed: int = 0) -> np.ndarray:
+    """分块生成随机嵌入（模拟未归一化的模型输出）"""
+    rng = np.random.default_rng(seed)
+    out = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 100000):
+        end = min(size, start + 100000)
+        out[start:end] = rng.standard_normal((end - start, dim), dtype=np.float32)
+    return out
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """float32 精确 Top-K（分块归一化，不复制整个语料）"""
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = np.empty((len(q), len(corpus)), dtype=np.float32)
+    for start in range(0, len(corpus), 100000):
+        block = corpus[start:start + 100000]
+        scores[:, start:start + len(block)] = q @ (block / np.linalg.norm(block, axis=1, keepdims=True)).T
+    return top_k_indices(scores, top_k)
+
+
+def time_ms(fn: Callable[[], object], repeat: int) -> float:
+    fn()  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库向量检索基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="语料片段数（逗号分隔）")
+    parser.add_argument("--dim", type=int, default=DIM, help="向量维度")
+    parser.add_argument("--top-k", type=int, default=5, help="返回结果数")
+    parser.add_argument("--batch", type=int, default=16, help="批量查询条数")
+    parser.add_argument("--dtype", default="float32", help="索引存储精度（float32 / float16）")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数")
+    parser.add_argument("--legacy-max", type=int, default=100000, help="超过该规模跳过旧实现（每次查询复制整个语料）")
+    args = parser.parse_args()
+
+    sizes: List[int] = [int(s) for s in args.sizes.split(",") if s.strip()]
+    queries = synthetic_corpus(args.batch, args.dim, seed=1)
+
+    print("🔎 知识库向量检索基准测试")
+    print(f"   维度 {args.dim} | Top-{args.top_k} | 批量 {args.batch} 条 | 存储 {args.dtype} | 重复 {args.repeat} 次")
+    print("=" * 96)
+    print(f"{'片段数':>10}{'建索引 ms':>12}{'索引 MB':>10}{'旧实现 ms/条':>14}{'新实现 ms/条':>14}"
+          f"{'批量 ms/条':>12}{'加速比':>10}{'Top-K一致':>12}")
+
+    for size in sizes:
+        corpus = synthetic_corpus(size, args.dim)
+        start = time.perf_counter()
+        index = DenseVectorIndex(corpus, dtype=args.dtype)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        single_ms = time_ms(lambda: index.search(queries[0], args.top_k), args.repeat)
+        batch_ms = time_ms(lambda: index.search(queries, args.top_k), max(1, args.repeat // 4)) / len(queries)
+
+        # Top-K 一致性：与 float32 精确结果比较（float16 存储时可能在得分并列附近交换次序）
+        exact = exact_top_k(corpus, queries, args.top_k)
+        got = [set(idx.tolist()) for idx, _ in index.search(queries, args.top_k)]
+        agree = np.mean([len(g & set(e.tolist())) / args.top_k for g, e in zip(got, exact)])
+
+        if size <= args.legacy_max:
+            legacy_ms = time_ms(lambda: legacy_search(corpus, queries[0], args.top_k), max(1, args.repeat // 4))
+            legacy_col, speedup_col = f"{legacy_ms:>14.2f}", f"{legacy_ms / single_ms:>10.1f}"
+        else:
+            legacy_col, speedup_col = f"{'跳过':>14}", f"{'-':>10}"
+        print(f"{size:>10}{build_ms:>12.1f}{index.memory_bytes() / 1e6:>10.1f}{legacy_col}{single_ms:>14.2f}"
+              f"{batch_ms:>12.2f}{speedup_col}{agree:>12.1%}")
+        del corpus, index
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+中文友好的 BM25 倒排索引
+取代按空白切词的关键词检索（对中文来说整句话就是一个"词"，只能逐片段做子串判断）：
+
+- 分词：NFKC 折叠全角、转小写；连续汉字切为字二元组（单字成段时取单字），
+  连续字母/数字（如 "TeleChat"、"5G"）整体作为一个词；可选 jieba 搜索引擎模式分词
+  （DRAGON_KB_TOKENIZER=jieba，未安装时回退为二元组）；
+- 倒排表以 CSR 形式存放：按词排序的片段号（int32）与词频（uint16）数组 + 每个词的偏移，
+  查询只读取命中词的倒排链，耗时随触及的倒排项数增长而非语料规模；
+- BM25 打分（k1=1.2, b=0.75），idf 取 log(1 + (N - df + 0.5) / (df + 0.5))，恒为正；
+- 增量维护：add() 先记入待合并区，下次查询前一次性合并；delete() 打墓碑，
+  compact() 压缩倒排表（只搬移数组，不重新分词）；
+- save()/load() 存为 .npz（不允许 pickle），附带分词方式与语料指纹，不一致时由调用方重建。
+
+环境变量：
+    DRAGON_KB_TOKENIZER   分词方式：bigram（默认）/ jieba
+"""
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vector_index import compact_ratio, top_k_indices
+
+try:
+    import jieba
+    JIEBA_AVAILABLE = True
+except ImportError:
+    JIEBA_AVAILABLE = False
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|([^\\W_{_CJK}]+)")
+
+TOKENIZER_BIGRAM = "bigram"
+TOKENIZER_JIEBA = "jieba"
+
+
+def default_tokenizer() -> str:
+    name = os.environ.get("DRAGON_KB_TOKENIZER", TOKENIZER_BIGRAM).strip().lower()
+    if name == TOKENIZER_JIEBA and not JIEBA_AVAILABLE:
+        print("⚠️ 未安装 jieba，BM25 分词回退为字二元组")
+        return TOKENIZER_BIGRAM
+    return TOKENIZER_JIEBA if name == TOKENIZER_JIEBA else TOKENIZER_BIGRAM
+
+
+def tokenize(text: str, tokenizer: str = TOKENIZER_BIGRAM) -> List[str]:
+    """文本 -> 词列表（汉字段按 tokenizer 切分，字母数字段整体保留）"""
+    if not text:
+        return []
+    tokens: List[str] = []
+    for cjk, word in _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).lower()):
+        if word:
+            tokens.append(word)
+        elif tokenizer == TOKENIZER_JIEBA:
+            tokens.extend(t for t in jieba.lcut_for_search(cjk) if t.strip())
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def fingerprint(texts: Iterable[str]) -> str:
+    """语料指纹：加载已保存的索引时校验与当前文档是否一致"""
+    digest = hashlib.md5()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """BM25 倒排索引；行号与调用方的文档列表下标一一对应"""
+
+    def __init__(self, tokenizer: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.tokenizer = tokenizer or default_tokenizer()
+        self.k1 = k1
+        self.b = b
+        self._reset()
+
+    def _reset(self) -> None:
+        self.vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.empty(0, dtype=np.int32)
+        self._tfs = np.empty(0, dtype=np.uint16)
+        self._doc_len = np.empty(0, dtype=np.float32)
+        self._deleted: Optional[np.ndarray] = None
+        self.deleted_count = 0
+        self._live_len = 0.0
+        # 待合并的倒排项（词号、行号、词频）
+        self._pending: Tuple[List[int], List[int], List[int]] = ([], [], [])
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    @property
+    def live_count(self) -> int:
+        return len(self) - self.deleted_count
+
+    @property
+    def deleted_ratio(self) -> float:
+        return self.deleted_count / len(self) if len(self) else 0.0
+
+    @property
+    def postings(self) -> int:
+        return len(self._docs) + len(self._pending[0])
+
+    def build(self, texts: Sequence[str]) -> None:
+        self._reset()
+        self.add(texts)
+        self._merge()
+
+    def add(self, texts: Sequence[str]) -> range:
+        """追加文本，返回新行号范围（倒排项在下次查询前合并）"""
+        start = len(self)
+        terms, docs, tfs = self._pending
+        lengths = []
+        for row, text in enumerate(texts, start):
+            counts = Counter(tokenize(text, self.tokenizer))
+            for term, tf in counts.items():
+                terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                docs.append(row)
+                tfs.append(min(tf, 65535))
+            lengths.append(sum(counts.values()))
+        self._doc_len = np.concatenate([self._doc_len, np.asarray(lengths, dtype=np.float32)])
+        if self._deleted is not None:
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(lengths), dtype=bool)])
+        self._live_len += float(sum(lengths))
+        return range(start, len(self))
+
+    def _term_ids(self) -> np.ndarray:
+        """每个倒排项所属的词号（由偏移数组展开）"""
+        return np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int32), np.diff(self._offsets))
+
+    def _merge(self) -> None:
+        terms, docs, tfs = self._pending
+        if not terms:
+            return
+        all_terms = np.concatenate([self._term_ids(), np.asarray(terms, dtype=np.int32)])
+        all_docs = np.concatenate([self._docs, np.asarray(docs, dtype=np.int32)])
+        all_tfs = np.concatenate([self._tfs, np.asarray(tfs, dtype=np.uint16)])
+        # 稳定排序：同一词内片段号保持升序
+        order = np.argsort(all_terms, kind="stable")
+        self._docs, self._tfs = all_docs[order], all_tfs[order]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(all_terms, minlength=len(self.vocab)))])
+        self._pending = ([], [], [])
+
+    def delete(self, rows: Iterable[int]) -> int:
+        """给行打墓碑（检索时跳过）；返回新增墓碑数"""
+        rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+        if rows.size == 0:
+            return 0
+        if self._deleted is None:
+            self._deleted = np.zeros(len(self), dtype=bool)
+        fresh = rows[~self._deleted[rows]]
+        self._deleted[fresh] = True
+        self.deleted_count += len(fresh)
+        self._live_len -= float(self._doc_len[fresh].sum())
+        return len(fresh)
+
+    def is_deleted(self, row: int) -> bool:
+        return self._deleted is not None and bool(self._deleted[row])
+
+    def compact(self) -> np.ndarray:
+        """移除墓碑行的倒排项；返回保留行的旧行号（新行号即其位置）"""
+        if not self.deleted_count:
+            return np.arange(len(self))
+        self._merge()
+        keep = np.flatnonzero(~self._deleted)
+        new_rows = np.full(len(self), -1, dtype=np.int64)
+        new_rows[keep] = np.arange(len(keep))
+        live = ~self._deleted[self._docs]
+        terms = self._term_ids()[live]
+        self._docs = new_rows[self._docs[live]].astype(np.int32)
+        self._tfs = self._tfs[live]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocab)))])
+        self._doc_len = self._doc_len[keep]
+        self._deleted = None
+        self.deleted_count = 0
+        return keep
+
+    def needs_compaction(self) -> bool:
+        return self.deleted_ratio > compact_ratio()
+
+    def search(self, query: str, top_k: int = 5,
+               accept: Optional[Callable[[int], bool]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (行号数组, BM25 得分数组)，按得分降序；accept(行号) 为 False 的行跳过（元数据过滤）"""
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        self._merge()
+        term_ids = {self.vocab[t] for t in tokenize(query, self.tokenizer) if t in self.vocab}
+        if not term_ids or not self.live_count:
+            return empty
+
+        total = len(self)
+        avgdl = max(self._live_len / self.live_count, 1e-6)
+        doc_parts, weight_parts = [], []
+        for term_id in term_ids:
+            lo, hi = self._offsets[term_id], self._offsets[term_id + 1]
+            if lo == hi:
+                continue
+            docs = self._docs[lo:hi]
+            tf = self._tfs[lo:hi].astype(np.float32)
+            idf = np.log1p((total - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[docs] / avgdl)
+            doc_parts.append(docs)
+            weight_parts.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not doc_parts:
+            return empty
+
+        rows, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts)).astype(np.float32)
+        if self.deleted_count:
+            live = ~self._deleted[rows]
+            rows, scores = rows[live], scores[live]
+        if accept is None:
+            idx = top_k_indices(scores, top_k)
+        else:
+            idx = []
+            for i in np.argsort(-scores, kind="stable"):
+                if accept(int(rows[i])):
+                    idx.append(i)
+                    if len(idx) == top_k:
+                        break
+            idx = np.asarray(idx, dtype=np.int64)
+        return rows[idx].astype(np.int64), scores[idx]
+
+    def save(self, path: str, corpus_fingerprint: str = "") -> None:
+        """写入 .npz（临时文件 + 原子替换）"""
+        self._merge()
+        # 同一目录可能有多个知识库实例（会话与自动管理器）同时写入：临时文件按线程区分
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, docs=self._docs, tfs=self._tfs, offsets=self._offsets, doc_len=self._doc_len,
+                     deleted=self._deleted if self._deleted is not None else np.empty(0, dtype=bool),
+                     vocab=np.frombuffer("\n".join(self.vocab).encode("utf-8"), dtype=np.uint8),
+                     tokenizer=np.array(self.tokenizer), fingerprint=np.array(corpus_fingerprint),
+                     params=np.array([self.k1, self.b]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, corpus_fingerprint: Optional[str] = None) -> Optional["BM25Index"]:
+        """加载索引；文件不存在、分词方式变化或语料指纹不一致时返回 None"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved_tokenizer = str(data["tokenizer"])
+                saved_fingerprint = str(data["fingerprint"])
+                if saved_tokenizer != default_tokenizer():
+                    print(f"⚠️ BM25 索引分词方式 ({saved_tokenizer}) 与当前设置不一致，需重建")
+                    return None
+                if corpus_fingerprint is not None and saved_fingerprint != corpus_fingerprint:
+                    return None
+                k1, b = (float(v) for v in data["params"])
+                index = cls(tokenizer=saved_tokenizer, k1=k1, b=b)
+                index._docs, index._tfs = data["docs"], data["tfs"]
+                index._offsets, index._doc_len = data["offsets"], data["doc_len"]
+                deleted = data["deleted"]
+                vocab = bytes(data["vocab"]).decode("utf-8")
+        except (OSError, KeyError, ValueError):
+            return None
+        index.vocab = {term: i for i, term in enumerate(vocab.split("\n"))} if vocab else {}
+        if deleted.size:
+            index._deleted = deleted.copy()
+            index.deleted_count = int(deleted.sum())
+        index._live_len = float(index._doc_len[~deleted].sum() if deleted.size else index._doc_len.sum())
+        return index
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "tokenizer": self.tokenizer,
+            "documents": self.live_count,
+            "terms": len(self.vocab),
+            "postings": self.postings,
+            "deleted": self.deleted_count,
+            "memory_bytes": int(self._docs.nbytes + self._tfs.nbytes + self._offsets.nbytes + self._doc_len.nbytes),
+        }
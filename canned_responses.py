@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+固定回复表
+身份/归属问答与开场问候的答案是固定句子，没有必要每次都走云端 LLM + TTS。
+回复表（环境变量 DRAGON_CANNED_RESPONSES_FILE，默认 canned_responses.json）：
+
+    {
+        "responses": {
+            "identity": {
+                "text": "我是……",              # 固定回复（同时是TTS缓存的文本键）
+                "triggers": ["你是谁", ...]     # 触发短语（大小写不敏感，包含即命中）
+            },
+            "greeting": {"text": "...", "triggers": []}   # 无触发词：开场问候
+        }
+    }
+
+触发短语编译为一个 Aho-Corasick 自动机，多个回复同时命中时按表内顺序优先。
+回复音频由 tts_audio_cache.TTSAudioCache 缓存（离线预热：python3 tts_audio_cache.py --warm）。
+"""
+
+import argparse
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from command_matcher import AhoCorasickAutomaton
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESPONSES_FILE = os.path.join(BASE_DIR, "canned_responses.json")
+
+GREETING = "greeting"
+
+
+@dataclass(frozen=True)
+class CannedResponse:
+    """一条固定回复"""
+    name: str
+    text: str
+    triggers: Tuple[str, ...] = ()
+    order: int = 0
+
+
+def parse_responses(raw: Dict[str, Any]) -> Dict[str, CannedResponse]:
+    """校验并构建回复；任一回复无效时抛出 ValueError（整表不生效）"""
+    responses = {}
+    for order, (name, entry) in enumerate(raw.get("responses", {}).items()):
+        text = (entry.get("text") or "").strip() if isinstance(entry, dict) else ""
+        if not text:
+            raise ValueError(f"固定回复 {name} 缺少回复文本 text")
+        triggers = entry.get("triggers", ())
+        if isinstance(triggers, str) or not all(isinstance(t, str) and t for t in triggers):
+            raise ValueError(f"固定回复 {name} 的触发短语必须是非空字符串列表")
+        responses[name] = CannedResponse(name=name, text=text, triggers=tuple(triggers), order=order)
+    return responses
+
+
+def compile_triggers(responses: Dict[str, CannedResponse]) -> AhoCorasickAutomaton:
+    automaton = AhoCorasickAutomaton()
+    for response in responses.values():
+        for trigger in response.triggers:
+            automaton.add(trigger.lower(), response)
+    automaton.build()
+    return automaton
+
+
+class CannedResponses:
+    """由回复表编译的固定回复匹配器"""
+
+    def __init__(self, responses_file: Optional[str] = None):
+        if responses_file is None:
+            responses_file = os.environ.get("DRAGON_CANNED_RESPONSES_FILE", DEFAULT_RESPONSES_FILE)
+        self.responses_file = responses_file
+        self.version = 0
+        self.responses: Dict[str, CannedResponse] = {}
+        self.automaton = compile_triggers(self.responses)
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """重新编译回复表；文件未变化且非强制时跳过，校验失败保留旧表。返回是否已替换。"""
+        try:
+            mtime = os.path.getmtime(self.responses_file)
+        except OSError:
+            mtime = None
+        if not force and mtime == self._file_mtime:
+            return False
+        responses = {}
+        if mtime is not None:
+            try:
+                with open(self.responses_file, "r", encoding="utf-8") as f:
+                    responses = parse_responses(json.load(f))
+            except Exception as e:
+                print(f"⚠️ 固定回复表加载失败（保留当前回复）: {e}")
+                self._file_mtime = mtime
+                return False
+        automaton = compile_triggers(responses)
+
+        with self._lock:
+            self.responses = responses
+            self.automaton = automaton
+            self._file_mtime = mtime
+            self.version += 1
+        return True
+
+    def match(self, text: str) -> Optional[CannedResponse]:
+        """单次扫描返回命中的固定回复（表内靠前者优先）"""
+        if not text:
+            return None
+        best = None
+        for _start, _end, _pattern, response in self.automaton.iter_matches(text.lower()):
+            if best is None or response.order < best.order:
+                best = response
+        return best
+
+    def get(self, name: str) -> Optional[CannedResponse]:
+        return self.responses.get(name)
+
+    def texts(self) -> List[str]:
+        """全部回复文本（供TTS缓存预热）"""
+        return [r.text for r in self.responses.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="固定回复表")
+    parser.add_argument("text", nargs="*", help="待匹配的文本")
+    args = parser.parse_args()
+
+    canned = CannedResponses()
+    print(f"📋 固定回复 {len(canned.responses)} 条: {canned.responses_file}")
+    for text in args.text:
+        response = canned.match(text)
+        print(f"   '{text}' -> {response.name + ': ' + response.text if response else '无'}")
+
+
+if __name__ == "__main__":
+    main()
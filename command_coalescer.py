@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+机器人命令去重与合并
+同一句话可能经 asr_result、事件 451（推测/最终）与事件 550 多条路径到达控制器，
+每条路径都会触发命令事件回调与 ROS Twist。合并器以 (cmd_id, 话轮id) 为键：
+
+- 同一话轮内，同一命令在时间窗口内只下发一次，其余计为重复并丢弃；
+- 同一话轮中更新的冲突命令替换旧命令：保留（hold）期间替换尚未下发的命令；已下发（执行中）
+  的命令先经 supersede 回调撤销（事件回调 + ROS 停止）再下发新命令，旧命令之后迟到的重复仍被丢弃；
+- 话轮id 在用户开始说话（事件 450）时递增。
+
+环境变量：
+    DRAGON_COMMAND_COALESCE_SEC   去重时间窗口（秒，默认 5.0；0 表示不去重）
+    DRAGON_COMMAND_HOLD_MS        下发前保留时长（毫秒，默认 0 即立即下发）
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class CommandCoalescer:
+    """按 (cmd_id, 话轮id) 去重的命令合并器
+
+    fire(match) 为真正的下发函数；supersede(match) 撤销被同一话轮新命令替换的已下发命令；
+    match 需有 cmd_id 属性。
+    """
+
+    def __init__(self, fire: Callable[[Any], Any],
+                 window_sec: Optional[float] = None,
+                 hold_sec: Optional[float] = None,
+                 supersede: Optional[Callable[[Any], Any]] = None):
+        self.fire = fire
+        self.supersede = supersede
+        self.window_sec = window_sec if window_sec is not None else _env_float("DRAGON_COMMAND_COALESCE_SEC", 5.0)
+        self.hold_sec = hold_sec if hold_sec is not None else _env_float("DRAGON_COMMAND_HOLD_MS", 0.0) / 1000.0
+        self.utterance_id = 0
+        self._fired: Dict[Tuple[str, int], float] = {}
+        self._pending: Optional[Tuple[Any, int]] = None
+        self._in_flight: Optional[Tuple[Any, int]] = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "submitted": 0,
+            "fired": 0,
+            "suppressed_duplicates": 0,
+            "replaced": 0,
+        }
+
+    def begin_utterance(self) -> int:
+        """新话轮开始；上一话轮尚未下发的命令照常下发"""
+        with self._lock:
+            self._flush_locked()
+            self._in_flight = None
+            self.utterance_id += 1
+            now = time.monotonic()
+            self._fired = {k: t for k, t in self._fired.items() if now - t < self.window_sec}
+            return self.utterance_id
+
+    def _is_duplicate(self, key: Tuple[str, int], now: float) -> bool:
+        fired_at = self._fired.get(key)
+        return fired_at is not None and now - fired_at < self.window_sec
+
+    def submit(self, match: Any) -> bool:
+        """提交命令；返回是否被接受（立即下发或进入保留）"""
+        with self._lock:
+            self.stats["submitted"] += 1
+            now = time.monotonic()
+            key = (match.cmd_id, self.utterance_id)
+            if self._is_duplicate(key, now):
+                self.stats["suppressed_duplicates"] += 1
+                return False
+            if self._pending is not None:
+                pending, utterance_id = self._pending
+                if pending.cmd_id == match.cmd_id and utterance_id == self.utterance_id:
+                    self.stats["suppressed_duplicates"] += 1
+                    return False
+                if utterance_id == self.utterance_id:
+                    self.stats["replaced"] += 1
+                    self._cancel_timer()
+                    self._pending = None
+                else:
+                    self._flush_locked()
+            if self.hold_sec <= 0:
+                self._fire_locked(match, self.utterance_id, now)
+                return True
+            self._pending = (match, self.utterance_id)
+            self._timer = threading.Timer(self.hold_sec, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+            return True
+
+    def forget(self, cmd_id: str) -> None:
+        """撤回后允许本话轮再次下发该命令"""
+        with self._lock:
+            self._fired.pop((cmd_id, self.utterance_id), None)
+            if self._in_flight is not None and self._in_flight[0].cmd_id == cmd_id:
+                self._in_flight = None
+
+    def flush(self) -> None:
+        """立即下发保留中的命令"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self._cancel_timer()
+        if self._pending is not None:
+            match, utterance_id = self._pending
+            self._pending = None
+            self._fire_locked(match, utterance_id, time.monotonic())
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _fire_locked(self, match: Any, utterance_id: int, now: float) -> None:
+        if self.window_sec > 0:
+            self._fired[(match.cmd_id, utterance_id)] = now
+        in_flight = self._in_flight
+        if in_flight is not None and in_flight[1] == utterance_id and in_flight[0].cmd_id != match.cmd_id:
+            self.stats["replaced"] += 1
+            if self.supersede is not None:
+                try:
+                    self.supersede(in_flight[0])
+                except Exception as e:
+                    print(f"⚠️ 撤销被替换命令失败: {e}")
+        self._in_flight = (match, utterance_id)
+        self.stats["fired"] += 1
+        try:
+            self.fire(match)
+        except Exception as e:
+            print(f"⚠️ 命令下发失败: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, utterance_id=self.utterance_id,
+                        window_sec=self.window_sec, hold_sec=self.hold_sec,
+                        pending=self._pending[0].cmd_id if self._pending else None,
+                        in_flight=self._in_flight[0].cmd_id if self._in_flight else None)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+机器人命令多模式匹配
+基于 Aho-Corasick 自动机：命令表与常见语音识别纠错在启动时一次性编译，
+每条 ASR 文本只需单次线性扫描即可得到全部命中（含位置）。
+共享意图引擎（intent_engine.py）、知识库意图分类器与固定回复表都在此自动机上构建。
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick 多模式字符串匹配自动机
+
+    用法：add() 添加全部模式后 build()，之后 iter_matches()/find_all() 单次扫描文本。
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态自身的模式：(模式长度, 模式, 附带值)；_out 为 build 时合并失败链后的输出
+        self._own: List[List[Tuple[int, str, Any]]] = [[]]
+        self._out: List[List[Tuple[int, str, Any]]] = [[]]
+        self._built = False
+        self.pattern_count = 0
+
+    def add(self, pattern: str, value: Any = None) -> None:
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+                self._out.append([])
+            state = nxt
+        self._own[state].append((len(pattern), pattern, value))
+        self.pattern_count += 1
+        self._built = False
+
+    def build(self) -> "AhoCorasickAutomaton":
+        """广度优先计算失败指针，并沿失败链合并输出（可重复调用：每次从各状态自身的模式重新计算）"""
+        self._fail = [0] * len(self._goto)
+        self._out = [list(own) for own in self._own]
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str, Any]]:
+        """逐个产出命中：(起始位置, 结束位置(不含), 模式, 附带值)"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for length, pattern, value in out[state]:
+                    yield end - length, end, pattern, value
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str, Any]]:
+        return list(self.iter_matches(text))
+
+    @property
+    def state_count(self) -> int:
+        return len(self._goto)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Dragon机器人语音系统 - 基于官方豆包（火山引擎）实时语音示例，严格官方音频播放：
-- 输出 Float32 / 24000Hz / 单声道 / chunk=3200
+- 输出 24000Hz / 单声道 / chunk=3200，采样格式按设备能力协商（优先 Int16，回退 Float32）
 - 实时写入 PyAudio，无文件回放
 保留机器人控制、知识库与 Prompt 集成。
 
@@ -27,7 +27,13 @@ import threading
 from typing import Dict, Any, Optional, Callable, List
 from dataclasses import dataclass
 
-import pyaudio
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    pyaudio = None
+    PYAUDIO_AVAILABLE = False
+    print("⚠️ PyAudio未安装，仅可使用无声卡音频输出端 (DRAGON_AUDIO_SINK)")
 
 # 动态加入官方示例路径（当前仓库内 official_example）
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -37,6 +43,19 @@ if OFFICIAL_DIR not in sys.path:
 from realtime_dialog_client import RealtimeDialogClient
 import protocol
 import config as official_config
+from audio_format import WireFormat, PCM_F32LE, PA_INT16, PA_FLOAT32, negotiate_output_format, apply_to_start_session
+from audio_sinks import AudioSink, create_audio_sink
+from intent_engine import IntentMatch, get_intent_engine
+from intent_cache import IntentCache, IntentDecision
+from command_coalescer import CommandCoalescer
+from knowledge_intent import KnowledgeIntent, KnowledgeIntentClassifier
+from speculative_intent import SpeculativeIntentStage, speculative_enabled
+from tts_audio_cache import TTSAudioCache, tts_cache_enabled, warm_up
+from canned_responses import GREETING, CannedResponse, CannedResponses
+from navigation_metrics import NavigationMetrics
+from navigation_routes import CACHE_WARM, NavigationRoute, NavigationRoutes, stale_routes
+from navigation_scheduler import NavigationJob, NavigationScheduler
+from timer_wheel import TimerWheel
 
 # ROS 可选
 try:
@@ -102,6 +121,7 @@ class EventInterface:
 
     _voice_callbacks: List[Callable[[str], None]] = []
     _command_callbacks: List[Callable[[str, str], None]] = []
+    _command_retract_callbacks: List[Callable[[str, str], None]] = []
     _navigation_callbacks: List[Callable[[str], None]] = []
 
     @classmethod
@@ -109,6 +129,7 @@ class EventInterface:
         """测试/重新初始化时清空所有已注册回调。"""
         cls._voice_callbacks.clear()
         cls._command_callbacks.clear()
+        cls._command_retract_callbacks.clear()
         cls._navigation_callbacks.clear()
         print("🔄 EventInterface 已重置回调列表")
 
@@ -142,6 +163,21 @@ class EventInterface:
             except Exception as e:
                 print(f"⚠️ 命令事件回调失败: {e}")
 
+    @classmethod
+    def register_command_retract_callback(cls, callback: Callable[[str, str], None]) -> None:
+        if callable(callback):
+            cls._command_retract_callbacks.append(callback)
+
+    @classmethod
+    def emit_command_retract_event(cls, cmd_id: str, command_phrase: str) -> None:
+        """撤回此前根据流式中间结果提前下发的命令"""
+        print(f"{cmd_id}_retract")
+        for callback in list(cls._command_retract_callbacks):
+            try:
+                callback(cmd_id, command_phrase)
+            except Exception as e:
+                print(f"⚠️ 命令撤回回调失败: {e}")
+
     @classmethod
     def voice_start(cls) -> None:
         cls.emit_voice_event("voice_start")
@@ -205,100 +241,21 @@ class AudioConfig:
 
 class DragonRobotController:
     """Dragon机器人控制器"""
+
     def __init__(self):
         self.ros_enabled = ROS_AVAILABLE and self.init_ros()
         self.current_action = "停止"
         
-        # 字符串命令映射 (cmd_1 到 cmd_6)
-        self.string_command_map = {
-            # 基本移动命令
-            "前进": "cmd_1",
-            "后退": "cmd_2", 
-            "左转": "cmd_3",
-            "右转": "cmd_4",
-            "向前": "cmd_1",
-            "向后": "cmd_2",
-            "向左": "cmd_3",
-            "向右": "cmd_4",
-            "往前": "cmd_1",
-            "往后": "cmd_2",
-            "往左": "cmd_3",
-            "往右": "cmd_4",
-            "前走": "cmd_1",
-            "后走": "cmd_2",
-            "左拐": "cmd_3",
-            "右拐": "cmd_4",
-            "走前面": "cmd_1",
-            "走后面": "cmd_2",
-            "左边": "cmd_3",
-            "右边": "cmd_4",
-            "机器人前进": "cmd_1",
-            "机器人后退": "cmd_2",
-            "机器人左转": "cmd_3",
-            "机器人右转": "cmd_4",
-            "让机器人前进": "cmd_1",
-            "让机器人后退": "cmd_2",
-            "让机器人左转": "cmd_3",
-            "让机器人右转": "cmd_4",
-            
-            # 导航目的地命令
-            "前往洗手间": "cmd_5",
-            "去洗手间": "cmd_5",
-            "到洗手间": "cmd_5",
-            "带我去洗手间": "cmd_5",
-            "我要去洗手间": "cmd_5",
-            "洗手间在哪": "cmd_5",
-            "找洗手间": "cmd_5",
-            "去厕所": "cmd_5",
-            "前往厕所": "cmd_5",
-            "到厕所": "cmd_5",
-            
-            "前往电梯间": "cmd_6",
-            "去电梯间": "cmd_6",
-            "到电梯间": "cmd_6",
-            "带我去电梯": "cmd_6",
-            "我要坐电梯": "cmd_6",
-            "电梯在哪": "cmd_6",
-            "找电梯": "cmd_6",
-            "去电梯": "cmd_6",
-            "前往电梯": "cmd_6",
-            "到电梯": "cmd_6",
-        }
-        
-        # ROS指令映射 (保留用于ROS模式)
-        self.command_map = {
-            "前进": (0.5, 0.0),
-            "后退": (-0.3, 0.0), 
-            "左转": (0.0, 0.5),
-            "右转": (0.0, -0.5),
-            "停止": (0.0, 0.0),
-            "向前": (0.5, 0.0),
-            "向后": (-0.3, 0.0),
-            "向左": (0.0, 0.5),
-            "向右": (0.0, -0.5),
-            "往前": (0.5, 0.0),
-            "往后": (-0.3, 0.0),
-            "往左": (0.0, 0.5),
-            "往右": (0.0, -0.5),
-            "前走": (0.5, 0.0),
-            "后走": (-0.3, 0.0),
-            "左拐": (0.0, 0.5),
-            "右拐": (0.0, -0.5),
-            "走前面": (0.5, 0.0),
-            "走后面": (-0.3, 0.0),
-            "左边": (0.0, 0.5),
-            "右边": (0.0, -0.5),
-            "机器人前进": (0.5, 0.0),
-            "机器人后退": (-0.3, 0.0),
-            "机器人左转": (0.0, 0.5),
-            "机器人右转": (0.0, -0.5),
-            "机器人停止": (0.0, 0.0),
-            "让机器人前进": (0.5, 0.0),
-            "让机器人后退": (-0.3, 0.0),
-            "让机器人左转": (0.0, 0.5),
-            "让机器人右转": (0.0, -0.5),
-            "让机器人停止": (0.0, 0.0),
-        }
+        # 共享意图引擎：命令短语、纠错、cmd_id 与 ROS Twist 均来自声明式命令表 voice_commands.json，
+        # 每条ASR文本单次扫描（Aho-Corasick），未命中再走拼音音近回退
+        self.intent_engine = get_intent_engine()
+        self.intents = self.intent_engine.intents_for("dialog")
+        # 旧接口兼容：短语 -> cmd_id / 短语 -> Twist
+        self.string_command_map = self.intent_engine.phrase_map("cmd_id", "dialog")
+        self.command_map = self.intent_engine.phrase_map("twist")
+        self.fuzzy_corrections = self.intent_engine.corrections
+        # 同一话轮内的重复命令（asr_result / 事件451 / 事件550 多路径到达）只下发一次，冲突的新命令替换旧命令
+        self.command_coalescer = CommandCoalescer(self._emit_command, supersede=self._supersede_command)
 
     def init_ros(self) -> bool:
         """初始化ROS节点"""
@@ -310,89 +267,93 @@ class DragonRobotController:
             print(f"⚠️ ROS初始化失败: {e}")
             return False
 
+    def match_command(self, text: str) -> Optional[IntentMatch]:
+        """匹配机器人控制指令（精确优先，其次纠错，再次音近；最长匹配优先），不执行
+
+        音近命中只在短句且几乎整句都对得上时采纳（IntentEngine.phonetic_acceptable），
+        其余音近候选只记录日志，不当作命令。
+        """
+        text = text.strip()
+        match = self.intent_engine.match(text, self.intents, phonetic=True)
+        if match is None:
+            candidate = self.intent_engine.match_phonetic(text, self.intents)
+            if candidate is not None:
+                dprint(f"🔎 [机器人控制器] 音近候选未采纳: '{candidate.matched_text}' ≈ '{candidate.phrase}' "
+                       f"({candidate.cmd_id})，原句 '{text}'")
+        return match
+
     def execute_command(self, text: str) -> str:
         """执行机器人控制指令"""
         text = text.strip()
-        print(f"🔍 [机器人控制器] 分析语音: '{text}'")
-        print(f"🔍 [机器人控制器] 语音长度: {len(text)}, 包含字符: {list(text)}")
-        
-        # 检查是否包含机器人控制指令
-        matched_commands = []
-        for command, cmd_string in self.string_command_map.items():
-            if command in text:
-                matched_commands.append((command, cmd_string))
-                print(f"✅ [机器人控制器] 匹配到命令: '{command}' -> {cmd_string}")
-        
-        if not matched_commands:
-            print(f"❌ [机器人控制器] 没有找到精确匹配的命令")
-            # 尝试模糊匹配处理语音识别错误
-            fuzzy_matched = self.fuzzy_match_command(text)
-            if fuzzy_matched:
-                print(f"🔧 [机器人控制器] 模糊匹配到: {fuzzy_matched}")
-                matched_commands = [fuzzy_matched]
-            else:
-                # 显示一些相近的命令作为参考
-                print("📝 [机器人控制器] 洗手间相关命令:")
-                for cmd in ["前往洗手间", "去洗手间", "洗手间在哪"]:
-                    print(f"   - '{cmd}'")
+        return self.execute_match(text, self.match_command(text))
+
+    def execute_match(self, text: str, match: Optional[IntentMatch]) -> str:
+        """执行已判定的命令（会话按缓存的意图判定调用）"""
+        dprint(f"🔍 [机器人控制器] 分析语音: '{text}'")
+        if match is None:
+            dprint("❌ [机器人控制器] 没有找到匹配的命令")
+            return ""
+        if match.phonetic:
+            print(f"🔧 [机器人控制器] 音近匹配到: '{match.matched_text}' -> '{match.phrase}' ({match.cmd_id}, 置信度 {match.confidence:.2f})")
+        elif match.corrected:
+            print(f"🔧 [机器人控制器] 模糊匹配到: '{match.matched_text}' -> '{match.phrase}' ({match.cmd_id})")
+        else:
+            dprint(f"✅ [机器人控制器] 匹配到命令: '{match.phrase}' -> {match.cmd_id}")
+        return self.dispatch_command(match)
+
+    def begin_utterance(self) -> int:
+        """用户开始新一轮说话（事件450），返回新的话轮id"""
+        return self.command_coalescer.begin_utterance()
+
+    def dispatch_command(self, match: IntentMatch) -> str:
+        """下发已匹配的命令（经合并器去重，同一话轮同一命令只下发一次）"""
+        if not self.command_coalescer.submit(match):
+            dprint(f"🔁 [机器人控制器] 本轮已下发 {match.cmd_id}，忽略重复命令 '{match.phrase}'")
+            return ""
+        if self.ros_enabled and match.twist is not None:
+            return f"✅ 机器人执行: {match.phrase} -> {match.cmd_id}"
+        return f"🤖 机器人执行: {match.phrase} -> {match.cmd_id}"
+
+    def _emit_command(self, match: IntentMatch) -> None:
+        """真正下发命令：事件回调 + 可选ROS"""
+        command, cmd_string = match.phrase, match.cmd_id
+        self.current_action = command
+        EventInterface.emit_command_event(cmd_string, command)
         
-        for command, cmd_string in self.string_command_map.items():
-            if command in text:
-                self.current_action = command
-                EventInterface.emit_command_event(cmd_string, command)
-                
-                # 明显输出机器人命令
-                print("=" * 60)
-                print(f"🤖 【机器人控制指令】: {cmd_string}")
-                print(f"📝 用户语音: '{command}'")
-                print(f"⚡ 执行时间: {time.strftime('%H:%M:%S')}")
-                print("=" * 60)
-                
-                # 可选：同时执行ROS命令（如果启用）
-                if self.ros_enabled and command in self.command_map:
-                    linear_x, angular_z = self.command_map[command]
-                    self.send_twist_command(linear_x, angular_z)
-                    return f"✅ 机器人执行: {command} -> {cmd_string}"
-                else:
-                    return f"🤖 机器人执行: {command} -> {cmd_string}"
+        # 明显输出机器人命令
+        print("=" * 60)
+        print(f"🤖 【机器人控制指令】: {cmd_string}")
+        print(f"📝 用户语音: '{command}'")
+        print(f"⚡ 执行时间: {time.strftime('%H:%M:%S')}")
+        print("=" * 60)
         
-        return ""
+        # 可选：同时执行ROS命令（如果启用）
+        if self.ros_enabled and match.twist is not None:
+            linear_x, angular_z = match.twist
+            self.send_twist_command(linear_x, angular_z)
+
+    def retract_command(self, match: IntentMatch) -> None:
+        """撤回推测下发的命令：事件回调 + 可选ROS停止"""
+        self.command_coalescer.forget(match.cmd_id)
+        self._supersede_command(match)
+
+    def _supersede_command(self, match: IntentMatch) -> None:
+        """撤销已下发的命令（被撤回，或被同一话轮的新命令替换）：事件回调 + 可选ROS停止"""
+        if self.current_action == match.phrase:
+            self.current_action = None
+        EventInterface.emit_command_retract_event(match.cmd_id, match.phrase)
+        if self.ros_enabled and match.twist is not None:
+            self.send_twist_command(0.0, 0.0)
 
     def fuzzy_match_command(self, text: str) -> tuple:
-        """模糊匹配命令，处理语音识别错误"""
-        # 常见的语音识别错误映射
-        fuzzy_patterns = {
-            # 洗手间相关
-            "西手间": "洗手间",
-            "洗手剪": "洗手间", 
-            "洗受间": "洗手间",
-            "系手间": "洗手间",
-            # 电梯间相关  
-            "第题间": "电梯间",
-            "电提间": "电梯间",
-            "店梯间": "电梯间",
-            # 前进相关
-            "钱进": "前进",
-            "千进": "前进",
-            # 其他可能错误
-            "座转": "左转",
-            "做转": "左转",
-        }
-        
-        # 替换可能的错误
-        corrected_text = text
-        for error, correct in fuzzy_patterns.items():
-            corrected_text = corrected_text.replace(error, correct)
-        
-        if corrected_text != text:
-            print(f"🔧 [模糊匹配] 纠正: '{text}' -> '{corrected_text}'")
-            
-            # 用纠正后的文本重新匹配
-            for command, cmd_string in self.string_command_map.items():
-                if command in corrected_text:
-                    return (command, cmd_string)
-        
-        return None
+        """模糊匹配命令，处理语音识别错误（纠错变体已编译进自动机，其余走拼音音近索引）"""
+        matches, _speed = self.intent_engine.find_all(text, self.intents)
+        corrected = [m for m in matches if m.corrected]
+        if not corrected:
+            phonetic = self.intent_engine.match_phonetic(text, self.intents, strict=True)
+            return (phonetic.phrase, phonetic.cmd_id) if phonetic else None
+        best = min(corrected, key=lambda m: (-m.length, m.start))
+        return (best.phrase, best.cmd_id)
 
     def send_twist_command(self, linear_x: float, angular_z: float):
         """发送ROS Twist命令"""
@@ -403,18 +364,26 @@ class DragonRobotController:
             self.cmd_vel_pub.publish(twist)
 
 class AudioDeviceManager:
-    """音频设备管理类 - 完全按照官方"""
+    """音频设备管理类 - 输入沿用官方PyAudio，输出通过可插拔 AudioSink"""
 
     def __init__(self, input_config: AudioConfig, output_config: AudioConfig):
         self.input_config = input_config
         self.output_config = output_config
-        self.pyaudio = pyaudio.PyAudio()
-        self.input_stream: Optional[pyaudio.Stream] = None
-        self.output_stream: Optional[pyaudio.Stream] = None
+        self.pyaudio = None
+        if PYAUDIO_AVAILABLE:
+            try:
+                self.pyaudio = pyaudio.PyAudio()
+            except Exception as e:
+                print(f"⚠️ PyAudio初始化失败: {e}")
+        self.input_stream = None
+        self.output_sink: Optional[AudioSink] = None
         self.is_44k_mode = False  # 是否使用44kHz模式
+        self.wire_format: WireFormat = PCM_F32LE
 
-    def open_input_stream(self) -> pyaudio.Stream:
+    def open_input_stream(self):
         """打开音频输入流 - 完全按照官方"""
+        if self.pyaudio is None:
+            raise RuntimeError("PyAudio不可用，无法打开麦克风输入")
         self.input_stream = self.pyaudio.open(
             format=self.input_config.bit_size,
             channels=self.input_config.channels,
@@ -424,41 +393,92 @@ class AudioDeviceManager:
         )
         return self.input_stream
 
-    def open_output_stream(self) -> pyaudio.Stream:
-        """打开音频输出流（严格官方）：直接按配置打开，可选环境变量覆盖设备索引"""
-        # 可选设备索引覆盖，便于你在“声卡”上强制选择输出设备
+    def _output_device_index(self) -> Optional[int]:
+        """可选设备索引覆盖，便于你在“声卡”上强制选择输出设备"""
         device_idx = os.environ.get('DRAGON_AUDIO_DEVICE_INDEX')
-        kwargs = dict(
-            format=self.output_config.bit_size,
+        if device_idx is None or str(device_idx).strip() == "":
+            return None
+        try:
+            return int(device_idx)
+        except ValueError:
+            print(f"⚠️ DRAGON_AUDIO_DEVICE_INDEX 无效: {device_idx}")
+            return None
+
+    def negotiate_output_format(self, preferred: Optional[str] = None) -> WireFormat:
+        """按输出设备能力协商TTS线上格式，并同步到输出配置"""
+        self.wire_format = negotiate_output_format(
+            self.pyaudio,
+            sample_rate=self.output_config.sample_rate,
             channels=self.output_config.channels,
-            rate=self.output_config.sample_rate,
-            output=True,
-            frames_per_buffer=self.output_config.chunk
+            device_index=self._output_device_index(),
+            preferred=preferred,
         )
-        if device_idx is not None and str(device_idx).strip() != "":
-            try:
-                kwargs['output_device_index'] = int(device_idx)
-                print(f"🔧 使用指定输出设备索引: {device_idx}")
-            except ValueError:
-                print(f"⚠️ DRAGON_AUDIO_DEVICE_INDEX 无效: {device_idx}")
-        self.output_stream = self.pyaudio.open(**kwargs)
-        return self.output_stream
+        self.output_config.bit_size = self.wire_format.pa_format
+        self.output_config.format = self.wire_format.name
+        return self.wire_format
+
+    @property
+    def output_bytes_per_frame(self) -> int:
+        return self.wire_format.sample_width * self.output_config.channels
+
+    def open_output_sink(self, kind: Optional[str] = None) -> AudioSink:
+        """打开音频输出端：默认 PyAudio（可选环境变量覆盖设备索引），无声卡时按 DRAGON_AUDIO_SINK 回退"""
+        device_idx = self._output_device_index()
+        if device_idx is not None:
+            print(f"🔧 使用指定输出设备索引: {device_idx}")
+        self.output_sink = create_audio_sink(
+            self.wire_format,
+            sample_rate=self.output_config.sample_rate,
+            channels=self.output_config.channels,
+            kind=kind,
+            pa=self.pyaudio,
+            frames_per_buffer=self.output_config.chunk,
+            device_index=device_idx,
+        )
+        print(f"🔈 音频输出端: {self.output_sink.kind}")
+        return self.output_sink
+
+    def reopen_output_sink(self) -> AudioSink:
+        """关闭并按相同类型重新打开输出端（写入异常后的恢复）"""
+        kind = self.output_sink.kind if self.output_sink else None
+        if self.output_sink:
+            self.output_sink.close()
+        return self.open_output_sink(kind=kind)
 
     def cleanup(self) -> None:
         """清理音频设备资源 - 完全按照官方"""
-        for stream in [self.input_stream, self.output_stream]:
-            if stream:
-                stream.stop_stream()
-                stream.close()
-        self.pyaudio.terminate()
+        if self.input_stream:
+            self.input_stream.stop_stream()
+            self.input_stream.close()
+        if self.output_sink:
+            self.output_sink.close()
+        if self.pyaudio is not None:
+            self.pyaudio.terminate()
 
 class DragonDialogSession:
     """Dragon对话会话管理类 - 基于官方DialogSession + 完整功能集成"""
 
+    NAV_END_SILENCE_SEC = 1.0  # 导航音频结束后静默判定时间
+    NAV_STALE_AUDIO_SEC = float(os.environ.get('DRAGON_NAV_STALE_AUDIO_SEC', '5') or '0')  # 被抢占任务云端音频的最长丢弃时间
+    NAV_ROUTES_RELOAD_SEC = float(os.environ.get('DRAGON_NAV_ROUTES_RELOAD_SEC', '2') or '0')  # 路线表变化检查间隔（0 关闭）
+
     def __init__(self):
         # 初始化机器人控制器
         self.robot_controller = DragonRobotController()
         
+        # 知识库意图分类器（词表可由 DRAGON_KB_KEYWORDS_FILE 配置）
+        self.knowledge_intent_classifier = KnowledgeIntentClassifier()
+        # 固定回复表（身份/归属/问候）：命中后本机直接播放缓存音频（表可由 DRAGON_CANNED_RESPONSES_FILE 配置）
+        self.canned_responses = CannedResponses()
+        # 意图判定 LRU 缓存：规范化文本 -> (命令, 知识库意图, 固定回复)，命令表/关键词表/回复表更新时失效
+        self.intent_cache = IntentCache(
+            self._decide_intent,
+            version=lambda: (self.robot_controller.intent_engine.version,
+                             self.knowledge_intent_classifier.version,
+                             self.canned_responses.version),
+            refresh=self._reload_intent_rules,
+        )
+
         # 初始化知识库
         self.knowledge_base = None
         self.auto_kb_manager = None
@@ -468,14 +488,16 @@ class DragonDialogSession:
         self.microphone_muted = False
         self.mic_muted_due_to_navigation = False
         self.pending_navigation_point = None
-        self.navigation_task_active = False
-        import queue as _queue_init
-        self.navigation_queue = _queue_init.Queue()
         
+        # 嵌入模型与向量数据库在后台线程加载（model_warmup），这里立即返回；
+        # 就绪前的知识库查询在 DRAGON_KB_READY_WAIT_MS 内等待，超时走 BM25 关键词回退
         if LANGCHAIN_KB_AVAILABLE:
             try:
                 self.knowledge_base = UnifiedKnowledgeBaseManager()
-                print("🧠 LangChain知识库已加载")
+                print("🧠 LangChain知识库已创建（嵌入模型后台预热中）")
+                self.knowledge_base.ready.add_done_callback(
+                    lambda f: print("🧠 知识库语义检索已就绪" if f.exception() is None
+                                    else f"⚠️ 知识库模型加载失败，仅使用关键词检索: {f.exception()}"))
             except Exception as e:
                 print(f"⚠️ LangChain知识库初始化失败: {e}")
                 # 尝试使用简单知识库
@@ -503,16 +525,22 @@ class DragonDialogSession:
                 self.auto_kb_manager = AutoKnowledgeBaseManager(watch_dirs=watch_dirs, kb_dir=kb_dir)
                 print(f"🔄 自动知识库管理器已初始化 | kb_dir={kb_dir} | watch_dirs={watch_dirs}")
 
-                # 启动时执行一次自动更新（增量导入新增/修改的文件）
-                try:
-                    print(f"📁 正在扫描知识库目录: {watch_dirs} …")
-                    update_stats = self.auto_kb_manager.auto_update_knowledge_base()
-                    print(f"✅ 知识库扫描完成: 新增{update_stats.get('new_added',0)} 更新{update_stats.get('modified_updated',0)} 删除{update_stats.get('deleted_removed',0)} 错误{update_stats.get('errors',0)}")
-                except Exception as scan_e:
-                    print(f"⚠️ 启动扫描失败: {scan_e}")
+                # 启动时执行一次自动更新（增量导入新增/修改的文件）；入库要等嵌入模型，放到后台线程
+                threading.Thread(target=self._startup_kb_scan, args=(watch_dirs,),
+                                 name="kb-startup-scan", daemon=True).start()
             except Exception as e:
                 print(f"⚠️ 自动知识库管理器初始化失败: {e}")
         
+        # 流式ASR推测式意图：事件451中间结果的稳定前缀上提前匹配命令。
+        # 只做命令匹配、不经合并判定缓存：中间结果不做知识库意图分类（及其拼音音近回退）
+        self.speculative_intent = None
+        if speculative_enabled():
+            self.speculative_intent = SpeculativeIntentStage(
+                matcher=self.robot_controller.match_command,
+                dispatch=self.robot_controller.dispatch_command,
+                retract=self.robot_controller.retract_command,
+            )
+
         # 加载Prompt配置
         if PROMPT_CONFIG_AVAILABLE:
             try:
@@ -555,6 +583,7 @@ class DragonDialogSession:
                 print(f"⚠️ 音色配置加载失败，使用默认: {e}")
         else:
             speaker_id = "zh_male_yunzhou_jupiter_bigtts"
+        self.tts_speaker = speaker_id
         
         # 官方配置（直接使用官方示例中的常量，并刷新 Connect-Id）
         self.ws_config = dict(official_config.ws_connect_config)
@@ -567,18 +596,28 @@ class DragonDialogSession:
             "format": "pcm",
             "channels": 1,
             "sample_rate": 16000,
-            "bit_size": pyaudio.paInt16
+            "bit_size": PA_INT16
         }
         
-        # 输出配置 - 严格按照官方（Float32 / 24000Hz / chunk=3200）
+        # 输出配置 - 24000Hz / chunk=3200，采样格式在下方按设备能力协商
         self.output_audio_config = {
             "chunk": 3200,
             "format": "pcm",
             "channels": 1,
             "sample_rate": 24000,
-            "bit_size": pyaudio.paFloat32
+            "bit_size": PA_FLOAT32
         }
 
+        # 音频设备 - 完全按照官方；需在StartSession之前协商TTS线上格式
+        self.audio_device = AudioDeviceManager(
+            AudioConfig(**self.input_audio_config),
+            AudioConfig(**self.output_audio_config)
+        )
+        self.wire_format = self.audio_device.negotiate_output_format()
+        self.output_audio_config["format"] = self.wire_format.name
+        self.output_audio_config["bit_size"] = self.wire_format.pa_format
+        print(f"🎚️ TTS输出格式协商: {self.wire_format.label} ({self.wire_format.name})")
+
         # 会话初始化 - 完全按照官方
         self.say_hello_over_event = asyncio.Event()
         self.session_id = str(uuid.uuid4())
@@ -594,7 +633,7 @@ class DragonDialogSession:
                 "speaker": speaker_id,
                 "audio_config": {
                     "channel": 1,
-                    "format": "pcm",
+                    "format": self.wire_format.name,
                     "sample_rate": 24000
                 },
             },
@@ -615,35 +654,53 @@ class DragonDialogSession:
         self.client = RealtimeDialogClient(
             config=self.ws_config, 
             session_id=self.session_id,
-            output_audio_format="pcm"
+            output_audio_format=self.wire_format.name
         )
         
         # 设置自定义会话配置
-        self.client.start_session_req = self.start_session_req
+        self.client.start_session_req = apply_to_start_session(self.start_session_req, self.wire_format)
 
         self.is_running = True
         self.is_session_finished = False
         self.is_user_querying = False
         self.is_sending_chat_tts_text = False
+        # 本话轮已由本机播放固定回复：丢弃云端本轮回复音频，直到TTS结束（事件359）或用户再次开口
+        self.suppress_cloud_reply = False
+        # 本话轮已为冷缓存的固定回复发送过实时TTS（每轮至多一次）
+        self._canned_live_tts_sent = False
+        self._utterance_text = None
         self.audio_buffer = b''
         self.is_voice_playback_active = False
         self.loop = None
         self.microphone_muted = False
         self.mic_muted_due_to_navigation = False
         self.pending_navigation_point = None
-        self.navigation_prompts = {
-            "point1": "请你一字不落的重复下列文字：欢迎各位领导，各位来宾莅临中国电信人工智能展示中心.请各位领导移步至最佳观影点，接下来由星小辰为大家做一段自我介绍，讲述电信在人工智能的起源与发展，各位领导请看向大屏幕",
-            "point2": "请你一字不落的重复下列文字：这边为真实之境，通过观看沙盘的短片，来了解电信智传网是如何以技术为纽带，贯穿三大空间。",
-            "point3": "请你一字不落的重复下列文字：各位领导下面请移步至我们的数字人展区，中国电信花卷数字人目前已为政务服务、教育培训、品牌营销、文旅宣传和医疗服务等行业提供定制化全套解决方案，赋能智慧化转型升级。接下来我安排一位同事在这里配合做分钟级的数字人复刻。",
-            "point4": "请你一字不落的重复下列文字：请各位领导向后转身。这边展示的是中国电信全自研的全模态、全国产、全尺寸大模型基座，包括语义、语音、视觉、多模态。星辰语义大模型，以全国产化万卡万参技术架构成为国内首个完成万亿参数全自主训练的AI基座。不仅斩获国际顶级赛事双赛道冠军，更获得2024年度信息通讯领域十大科技进展。目前 已开源十亿到千亿（115B）系列模型，助力开发者快速构建行业智能应用，更赋能金融、政务等场景的复杂决策。我们应用案例中有到深圳市12345热门项目，提高坐席的效率。此外语义大模型也支持超大表格处理和逻辑推理问题的处理，感兴趣的领导可以在触摸台上操作体验。",
-            "point5": "请你一字不落的重复下列文字：请各位领导移步至我们的智能家居展厅，区分为儿童区、休闲区和办公区，每个场景会有相应的一些AI产品。",
-        }
+        # 导航路线表（讲解词/优先级/缓存策略/超时），运行中热更新，见 navigation_routes.py
+        self.navigation_routes = NavigationRoutes()
+        self._route_warm_task: Optional[asyncio.Task] = None
+        self._route_warm_pending: List[str] = []
+        # 本地TTS音频缓存：导航讲解词首次播放（或离线预热）后直接本地回放
+        self.tts_audio_cache = TTSAudioCache() if tts_cache_enabled() else None
         EventInterface.register_voice_callback(self._handle_voice_event)
         EventInterface.register_navigation_callback(self._handle_navigation_trigger)
-        # 导航调度相关状态（确保所有导航请求都在主事件循环 self.loop 中执行）
-        self.navigation_queue = queue.Queue()
-        self.navigation_task_active = False
-        self.navigation_lock = threading.Lock()
+        # 事件循环上的分层时间轮：导航超时/音频回退/静默判定/硬重启等看门狗统一注册（可取消、可重新计时）
+        self.timers = TimerWheel()
+        # 导航调度器：事件循环上的单个调度协程串行播报（优先级、抢占、重复触发合并、排队有效期与播报超时）
+        self.navigation_scheduler = NavigationScheduler(
+            announce=self._announce_navigation,
+            on_timeout=self._on_navigation_timeout,
+            on_preempt=self._on_navigation_preempted,
+            on_close=self._on_navigation_closed,
+            timers=self.timers,
+        )
+        # 导航耗时指标：触发/入队/发送/首包/voice_end/麦克风恢复各阶段时间戳与分位统计
+        self.navigation_metrics = NavigationMetrics()
+        # 云端导航TTS流所属任务：抢占后旧任务的音频仍会以 SERVER_ACK 到达，
+        # 在其TTS结束（事件359）前丢弃，不播放也不录入新任务的缓存
+        self._nav_tts_job_id: Optional[int] = None
+        self._stale_tts_job_id: Optional[int] = None
+        self._stale_tts_deadline = 0.0
+        self.stale_tts_packets_dropped = 0
         # 导航音频监控时间戳
         self.last_navigation_send_time = 0.0
         self.last_audio_packet_time = 0.0
@@ -655,22 +712,18 @@ class DragonDialogSession:
         except Exception:
             self.initial_speaker_mute_sec = 0
 
-        # 音频队列和设备 - 完全按照官方
+        # 音频队列 - 完全按照官方
         self.audio_queue = queue.Queue()
-        self.audio_device = AudioDeviceManager(
-            AudioConfig(**self.input_audio_config),
-            AudioConfig(**self.output_audio_config)
-        )
         
-        # 尝试初始化音频输出流
+        # 尝试初始化音频输出端（PyAudio / 子进程 / WAV / Null）
         try:
-            self.output_stream = self.audio_device.open_output_stream()
+            self.output_sink = self.audio_device.open_output_sink()
             self.audio_available = True
             print("✅ 音频系统初始化成功")
         except Exception as e:
             print(f"❌ 音频系统初始化失败: {e}")
             self.audio_available = False
-            self.output_stream = None
+            self.output_sink = None
         
         # 启动播放线程 - 完全按照官方
         self.is_recording = True
@@ -698,7 +751,7 @@ class DragonDialogSession:
                 self.navigation_test_server = None
 
     def _audio_player_thread(self):
-        """音频播放线程 - 专注PyAudio解决方案"""
+        """音频播放线程 - 写入可插拔音频输出端（PyAudio/子进程/WAV/Null）"""
         print("🎵 音频播放线程已启动")
         
         if not self.audio_available:
@@ -706,12 +759,10 @@ class DragonDialogSession:
             return
             
         audio_packet_count = 0
+        # 将写入块控制为约 512 帧（经验值），兼顾延迟与稳定；帧大小由协商格式决定，只需计算一次
+        frames_per_write = 512
+        bytes_per_write = frames_per_write * self.audio_device.output_bytes_per_frame
         
-        # 导航播放结束 watchdog 相关变量
-        last_packet_time = time.time()
-        last_nav_packet_time = None
-        NAV_END_SILENCE_SEC = 1.0  # 导航音频结束后静默判定时间
-
         while self.is_playing:
             try:
                 # 从队列获取音频数据
@@ -719,13 +770,9 @@ class DragonDialogSession:
                 if audio_data is not None:
                     audio_packet_count += 1
                     dprint(f"🔊 收到音频包 #{audio_packet_count}: {len(audio_data)} 字节")
-                    last_packet_time = time.time()
-                    # 如果当前处于导航静音，记录导航包时间
-                    try:
-                        if getattr(self, 'mic_muted_due_to_navigation', False):
-                            last_nav_packet_time = last_packet_time
-                    except Exception:
-                        pass
+                    # 导航播报中：每个音频包重新计时静默定时器，静默满阈值即判定播报结束
+                    if self.mic_muted_due_to_navigation:
+                        self._arm_navigation_silence_timer()
                     
                     # PyAudio专项优化方案
                     try:
@@ -739,40 +786,14 @@ class DragonDialogSession:
                             self.last_audio_packet_time = time.time()
                             # 直接跳过实际写入
                             continue
-                        # 方案1：强制清空缓冲区
-                        if hasattr(self.output_stream, '_stream'):
-                            try:
-                                # 获取当前缓冲区状态
-                                frames_available = self.output_stream.get_write_available()
-                                dprint(f"📊 可写入帧数: {frames_available}")
-                                
-                                # 如果缓冲区几乎满了，稍微等待
-                                if frames_available < 1000:
-                                    dprint("⏳ 缓冲区接近满，等待...")
-                                    time.sleep(0.01)
-                                    
-                            except Exception as e:
-                                print(f"📊 无法获取缓冲区状态: {e}")
-                        
                         # 检查是否需要重采样
                         if hasattr(self.audio_device, 'is_44k_mode') and self.audio_device.is_44k_mode:
                             dprint("🔄 需要从24kHz重采样到44kHz")
                             audio_data = self._resample_audio(audio_data, 24000, 44100)
                             dprint(f"🔄 重采样完成，新大小: {len(audio_data)} 字节")
-                        
-                        # 在写入前，尽量确保音频数据与输出格式匹配（Float32/Int16）
-                        try:
-                            audio_data = self._ensure_output_format(audio_data)
-                        except Exception as fmt_err:
-                            dprint(f"⚠️ 音频格式适配失败: {fmt_err}")
-
-                        # 方案2：分块写入避免大块阻塞
-                        # 以帧为单位控制写入，避免字节与帧混淆
-                        sample_size = self.audio_device.pyaudio.get_sample_size(self.audio_device.output_config.bit_size)
-                        bytes_per_frame = sample_size * self.audio_device.output_config.channels
-                        # 将写入块控制为约 512 帧（经验值），兼顾延迟与稳定
-                        frames_per_write = 512
-                        bytes_per_write = frames_per_write * bytes_per_frame
+
+                        # 线上格式已与输出流协商一致，音频包原样写入，无逐包格式转换
+                        # 方案2：分块写入避免大块阻塞（以帧为单位控制写入，避免字节与帧混淆）
                         chunk_size = bytes_per_write
                         total_chunks = len(audio_data) // chunk_size + (1 if len(audio_data) % chunk_size else 0)
                         dprint(f"🔧 开始分块写入，总数据{len(audio_data)}字节，分{total_chunks}块")
@@ -781,46 +802,24 @@ class DragonDialogSession:
                             chunk = audio_data[i:i+chunk_size]
                             chunk_num = i//chunk_size + 1
                             try:
-                                # 写入前等待到足够帧空间（不少于frames_per_write）
-                                # 有些后端返回的是帧数
-                                while True:
-                                    try:
-                                        available_frames = self.output_stream.get_write_available()
-                                        if available_frames >= frames_per_write:
-                                            break
-                                    except Exception:
-                                        # 如果获取失败，不阻塞直接尝试写
-                                        break
-                                    time.sleep(0.002)
-
-                                self.output_stream.write(chunk, exception_on_underflow=False)
+                                # 设备缓冲等待 / 实时节拍由输出端负责
+                                self.output_sink.write(chunk)
                                 dprint(f"✅ 块{chunk_num}/{total_chunks} 写入成功 ({len(chunk)}字节)")
-                                # 较小延迟，减轻拥塞
-                                time.sleep(0.0005)
                                 
                             except Exception as chunk_error:
                                 print(f"⚠️ 块 {chunk_num}/{total_chunks} 写入失败: {chunk_error}")
-                                # 尝试重新打开输出流
+                                # 尝试重新打开输出端
                                 try:
-                                    dprint("🔄 尝试重新打开输出流...")
-                                    try:
-                                        if self.output_stream.is_active():
-                                            self.output_stream.stop_stream()
-                                    except Exception:
-                                        pass
-                                    try:
-                                        self.output_stream.close()
-                                    except Exception:
-                                        pass
-                                    self.output_stream = self.audio_device.open_output_stream()
-                                    dprint("🔄 输出流已重新打开，重试写入...")
-                                    self.output_stream.write(chunk, exception_on_underflow=False)
+                                    dprint("🔄 尝试重新打开输出端...")
+                                    self.output_sink = self.audio_device.reopen_output_sink()
+                                    dprint("🔄 输出端已重新打开，重试写入...")
+                                    self.output_sink.write(chunk)
                                     dprint(f"✅ 重新打开后块{chunk_num}写入成功")
                                 except Exception as reopen_error:
                                     print(f"❌ 重新打开失败: {reopen_error}")
                                     break
                         
-                        dprint(f"✅ PyAudio播放音频包 #{audio_packet_count} 成功")
+                        dprint(f"✅ 播放音频包 #{audio_packet_count} 成功 ({self.output_sink.kind})")
                         # 初始静音窗口：若设置了 initial_speaker_mute_sec 且尚在时间内，将本包视作已消费但不真正输出（需要更早处理：此处用于兜底提示）
                         # 由于实际写入已发生，这里仅打印提示；真正静音需在更外层实现（若后续迭代，可前移到 write 之前条件判断）
                         if self.initial_speaker_mute_sec > 0 and (time.time() - self.process_start_time) < self.initial_speaker_mute_sec:
@@ -828,7 +827,7 @@ class DragonDialogSession:
                                 print(f"🔇 初始静音窗口 {self.initial_speaker_mute_sec}s 内（重启后），本阶段音频不外放")
                         
                     except Exception as write_error:
-                        print(f"⚠️ PyAudio播放失败: {write_error}")
+                        print(f"⚠️ 音频播放失败: {write_error}")
                         # 某些发行版的 python3-pyaudio 存在 "PY_SSIZE_T_CLEAN" 相关问题，直接建议切换为文件播放
                         if isinstance(write_error, SystemError) and 'PY_SSIZE_T_CLEAN' in str(write_error):
                             print("💡 检测到 PyAudio 写入兼容性问题，建议设置 DRAGON_AUDIO_FORCE_FILE=1 使用文件播放模式")
@@ -836,71 +835,50 @@ class DragonDialogSession:
                             self.is_playing = False
                             break
                         
-                        # 方案3：尝试重新初始化PyAudio
+                        # 方案3：尝试重新初始化输出端
                         try:
-                            print("🔄 尝试重新初始化PyAudio...")
-                            try:
-                                if self.output_stream and self.output_stream.is_active():
-                                    self.output_stream.stop_stream()
-                            except Exception:
-                                pass
-                            try:
-                                if self.output_stream:
-                                    self.output_stream.close()
-                            except Exception:
-                                pass
-                            
-                            # 重新创建输出流
-                            self.output_stream = self.audio_device.open_output_stream()
-                            print("✅ PyAudio重新初始化成功")
+                            print("🔄 尝试重新初始化音频输出端...")
+                            self.output_sink = self.audio_device.reopen_output_sink()
+                            print("✅ 音频输出端重新初始化成功")
                             
                             # 重试写入
-                            self.output_stream.write(audio_data, exception_on_underflow=False)
+                            self.output_sink.write(audio_data)
                             print(f"✅ 重新初始化后播放音频包 #{audio_packet_count} 成功")
                             
                         except Exception as reinit_error:
-                            print(f"❌ PyAudio重新初始化失败: {reinit_error}")
+                            print(f"❌ 音频输出端重新初始化失败: {reinit_error}")
                         
             except queue.Empty:
-                # 队列空闲，检查导航结束条件
-                now = time.time()
-                # 若处于导航静音且最近播放过导航音频包，但已静默超过阈值 -> 触发voice_end
-                try:
-                    if (getattr(self, 'mic_muted_due_to_navigation', False)
-                        and last_nav_packet_time is not None
-                        and (now - last_nav_packet_time) >= NAV_END_SILENCE_SEC):
-                        print(f"⏱️ 导航音频静默 >= {NAV_END_SILENCE_SEC}s，自动触发 voice_end")
-                        EventInterface.emit_voice_event("voice_end")
-                        last_nav_packet_time = None  # 防止重复触发
-                except Exception as werr:
-                    print(f"⚠️ 导航静默检测异常: {werr}")
-                time.sleep(0.1)
+                # 队列空闲：导航静默判定由时间轮定时器负责，无需轮询
+                continue
             except Exception as e:
                 print(f"❌ 音频播放错误: {e}")
                 time.sleep(0.1)
                 
         print(f"🎵 音频播放线程结束，共处理了 {audio_packet_count} 个音频包")
 
-    # 严格官方：无需格式适配函数和重采样
+    def _arm_navigation_silence_timer(self) -> None:
+        """（重新）计时导航静默定时器；时间轮未启动时忽略"""
+        try:
+            self.timers.schedule("nav/silence", self.NAV_END_SILENCE_SEC, self._on_navigation_silence)
+        except RuntimeError:
+            pass
+
+    def _on_navigation_silence(self) -> None:
+        """（时间轮回调）导航音频静默超过阈值 -> 触发 voice_end"""
+        if self.mic_muted_due_to_navigation:
+            print(f"⏱️ 导航音频静默 >= {self.NAV_END_SILENCE_SEC}s，自动触发 voice_end")
+            EventInterface.emit_voice_event("voice_end")
+
+    # 严格官方：无需格式适配函数；仅在 44kHz 兼容模式下重采样
 
     def _resample_audio(self, audio_data, from_rate, to_rate):
-        """简单的音频重采样"""
+        """简单的音频重采样（按协商的线上格式解析与输出）"""
         try:
             import numpy as np
-            
-            # 判定当前输出流期望的采样格式
-            # 我们的播放采用Float32，如为其它格式，先转换为float32以便统一重采样
-            dtype_infer = np.float32
-            try:
-                # 粗略判断：如果长度是偶数且不能被4整除，可能是int16
-                if len(audio_data) % 4 != 0 and len(audio_data) % 2 == 0:
-                    dtype_infer = np.int16
-            except Exception:
-                dtype_infer = np.float32
-
-            samples = np.frombuffer(audio_data, dtype=dtype_infer)
-            if dtype_infer == np.int16:
-                samples = (samples.astype(np.float32)) / 32768.0
+
+            dtype = np.dtype(self.wire_format.numpy_dtype)
+            samples = np.frombuffer(audio_data, dtype=dtype).astype(np.float32)
             
             # 计算重采样比率
             ratio = to_rate / from_rate
@@ -910,8 +888,10 @@ class DragonDialogSession:
             old_indices = np.linspace(0, len(samples) - 1, new_length)
             new_samples = np.interp(old_indices, np.arange(len(samples)), samples)
             
-            # 转换回字节
-            return new_samples.astype(np.float32).tobytes()
+            # 转换回字节（保持与输出流相同的采样格式）
+            if dtype.kind == 'i':
+                new_samples = np.clip(np.rint(new_samples), -32768, 32767)
+            return new_samples.astype(dtype).tobytes()
             
         except Exception as e:
             print(f"⚠️ 重采样失败: {e}，from {from_rate} -> {to_rate}，使用原始数据")
@@ -932,14 +912,15 @@ class DragonDialogSession:
             # 将PCM数据转换为WAV格式
             with wave.open(temp_path, 'wb') as wav_file:
                 wav_file.setnchannels(1)  # 单声道
-                wav_file.setsampwidth(4)  # Float32 = 4 bytes
+                wav_file.setsampwidth(self.wire_format.sample_width)  # Int16 = 2 / Float32 = 4 bytes
                 wav_file.setframerate(24000)  # 24kHz
                 wav_file.writeframes(audio_data)
             
+            is_int16 = self.wire_format.sample_width == 2
             # 按优先级尝试不同的播放器
             players = [
-                (['paplay', '--rate=24000', '--channels=1', '--format=float32le', temp_path], 'paplay'),
-                (['aplay', '-f', 'FLOAT_LE', '-c', '1', '-r', '24000', temp_path], 'aplay'),
+                (['paplay', '--rate=24000', '--channels=1', f"--format={'s16le' if is_int16 else 'float32le'}", temp_path], 'paplay'),
+                (['aplay', '-f', 'S16_LE' if is_int16 else 'FLOAT_LE', '-c', '1', '-r', '24000', temp_path], 'aplay'),
                 (['play', temp_path], 'play'),
                 (['ffplay', '-nodisp', '-autoexit', temp_path], 'ffplay')
             ]
@@ -992,29 +973,35 @@ class DragonDialogSession:
         if not nav_context:
             return
         print("🔊 (voice_end) 进入导航结束处理流程")
+        self.navigation_metrics.mark_current("voice_end")
         self._complete_navigation_end(source="voice_end_event")
 
     def _complete_navigation_end(self, source: str):
         """统一的导航结束收尾：不论正常/静默/强制/voice_end均走这里"""
         print(f"🧷 导航结束收尾 | source={source}")
+        self.timers.cancel("nav/silence")
+        self.timers.cancel("nav/audio_fallback")
         # 恢复麦克风与标志
         self.mic_muted_due_to_navigation = False
         self.microphone_muted = False
         self.pending_navigation_point = None
+        self.navigation_metrics.mark_current("mic_restored")
+        self.navigation_scheduler.finish(reason=source)
         if getattr(self, 'is_voice_playback_active', False):
             print("🔄 收尾: is_voice_playback_active -> False")
             self.is_voice_playback_active = False
         if hasattr(self, 'is_user_querying') and self.is_user_querying:
             print("🔄 收尾: is_user_querying -> False")
             self.is_user_querying = False
+        # 录制只在云端 TTS 结束事件（359）时写入缓存；到这里仍未写入说明音频流未正常结束
+        # （静音计时触发的 voice_end 可能只是网络停顿、强制恢复），录到的音频可能被截断
+        if self.tts_audio_cache is not None:
+            self.tts_audio_cache.abort_capture()
         # 清理强制恢复标志
         if hasattr(self, '_nav_forced_recover'):
             self._nav_forced_recover = False
         # 状态打印
-        try:
-            q_len = self.navigation_queue.qsize() if hasattr(self,'navigation_queue') else 'NA'
-        except Exception:
-            q_len = 'NA'
+        q_len = self.navigation_scheduler.queue_length
         print(f"🧪 导航收尾状态: mic_muted={self.microphone_muted} voice_playback={self.is_voice_playback_active} queue={q_len}")
         # 模式切换+可选软重启
         if getattr(self, 'dialog_mode', None) == 'navigation':
@@ -1037,9 +1024,11 @@ class DragonDialogSession:
             return
         self._restart_pending = True
         print(f"♻️ 计划在 {delay}s 后执行系统硬重启 (导航结束策略)")
-        timer = threading.Timer(delay, self._perform_hard_restart)
-        timer.daemon = True
-        timer.start()
+        try:
+            self.timers.schedule("session/hard_restart", delay, self._perform_hard_restart)
+        except RuntimeError:
+            self._restart_pending = False
+            raise
 
     def _perform_hard_restart(self):
         try:
@@ -1090,23 +1079,9 @@ class DragonDialogSession:
         except Exception as e:
             print(f"⚠️ 强制恢复收尾失败: {e}")
 
-    def _schedule_navigation_timeout_guard(self, point_key: str, timeout: float = 25.0):
-        """调度一个超时守护：若超过timeout仍未恢复则强制回退"""
-        if not getattr(self, 'loop', None) or not self.loop.is_running():
-            return
-        start_marker = time.time()
-        def _timeout_check():
-            # 仅当仍处于导航静音且 pending 为该点时才强制
-            if self.mic_muted_due_to_navigation and self.pending_navigation_point == point_key:
-                elapsed = time.time() - start_marker
-                if elapsed >= timeout:
-                    self._force_navigation_recovery(f"导航点 {point_key} 超过 {timeout}s 未收到 voice_end")
-            # 否则无需处理
-        self.loop.call_later(timeout + 0.1, _timeout_check)
-
     def _schedule_navigation_audio_fallback(self, point_key: str):
         """发送导航文本后若短时间内没有音频开始则强制恢复，避免一直静音等待。"""
-        if not getattr(self, 'loop', None) or not self.loop.is_running():
+        if not self.timers.running:
             return
         try:
             delay = float(os.environ.get('DRAGON_NAV_AUDIO_FALLBACK_SEC', '6'))
@@ -1120,7 +1095,7 @@ class DragonDialogSession:
                 send_snapshot == self.last_navigation_send_time and
                 self.last_audio_packet_time < send_snapshot):
                 self._force_navigation_recovery(f"audio_fallback_no_voice point={point_key}")
-        self.loop.call_later(delay, _audio_fallback_check)
+        self.timers.schedule("nav/audio_fallback", delay, _audio_fallback_check)
 
     def _enter_navigation_mode(self, point_key: str):
         """进入导航模式：静音麦克风、记录模式、可选播报提示"""
@@ -1150,104 +1125,78 @@ class DragonDialogSession:
         self.microphone_muted = False
         self.mic_muted_due_to_navigation = False
         self.pending_navigation_point = None
-        self.navigation_task_active = False
-        if hasattr(self, 'navigation_queue') and self.navigation_queue:
-            try:
-                while not self.navigation_queue.empty():
-                    self.navigation_queue.get(False)
-            except Exception:
-                pass
         print("🔄 已重置为普通对话模式，所有导航状态清空")
 
-    def _handle_navigation_trigger(self, point_key: str) -> None:
+    def _handle_navigation_trigger(self, point_key: str, priority: Optional[int] = None,
+                                   triggered_at: Optional[float] = None) -> Optional[NavigationJob]:
         print(f"🎯 [NAV] 收到导航触发: {point_key}")
 
         # 基本校验
-        if point_key not in self.navigation_prompts:
+        route = self.navigation_routes.get(point_key)
+        if route is None:
             print(f"⚠️ [NAV] 未知导航点: {point_key}")
-            return
+            return None
 
-        # 如果主事件循环尚未记录（极早期阶段）
-        if not getattr(self, 'loop', None):
-            try:
-                self.loop = asyncio.get_running_loop()
-                print(f"ℹ️ [NAV] 捕获运行事件循环: {id(self.loop)}")
-            except RuntimeError:
-                print("❌ [NAV] 无法获取事件循环，丢弃导航触发")
-                return
-
-        if not self.loop.is_running():
-            print("❌ [NAV] 事件循环未运行，无法调度导航")
-            return
-
-        # 入队 + 调度
-        with self.navigation_lock:
-            if self.navigation_task_active:
-                self.navigation_queue.put(point_key)
-                print(f"⏳ [NAV] 当前有正在执行的导航，已排队: {point_key} | 队列长度={self.navigation_queue.qsize()}")
-                return
-            else:
-                # 立即调度
-                self.navigation_task_active = True
-                print(f"� [NAV] 立即调度导航任务: {point_key}")
-                self._schedule_navigation_coroutine(point_key)
-
-    def _schedule_navigation_coroutine(self, point_key: str) -> None:
-        """确保在 self.loop 上调度协程，不创建新事件循环"""
         try:
-            def _done_cb(fut: asyncio.Future):
-                try:
-                    fut.result()
-                    print(f"✅ [NAV] 导航任务完成: {point_key}")
-                except Exception as e:
-                    print(f"❌ [NAV] 导航任务异常: {e}")
-                finally:
-                    # 处理下一个
-                    self._process_next_navigation()
-
-            # 当前线程是否已经在该loop中？
+            job = self.navigation_scheduler.submit(
+                point_key,
+                priority=route.priority if priority is None else priority,
+                timeout=route.timeout,
+                triggered_at=triggered_at,
+            )
+        except RuntimeError as e:
+            print(f"❌ [NAV] 无法调度导航: {e}")
+            return None
+        if job.coalesced:
+            print(f"🔁 [NAV] 重复触发已合并: {point_key} ({job.state}, 合并{job.coalesced}次)")
+        else:
+            print(f"⏳ [NAV] 导航任务已入队: {point_key} (优先级{job.priority}) | 排队={self.navigation_scheduler.queue_length}")
+        return job
+
+    async def _announce_navigation(self, job: NavigationJob) -> bool:
+        """调度器回调：开始播报一个导航任务，返回是否已开始"""
+        self.navigation_metrics.begin(job.job_id, job.point_key, triggered_at=job.triggered_at,
+                                      enqueued_at=job.created_at)
+        self._nav_tts_job_id = job.job_id
+        return await self._send_navigation_prompt(job.point_key)
+
+    def _on_navigation_closed(self, job: NavigationJob) -> None:
+        """任务结束（完成/超时/抢占/取消）：归档耗时记录"""
+        self.navigation_metrics.complete(job.job_id, job.reason)
+
+    def _on_navigation_timeout(self, job: NavigationJob) -> None:
+        """播报超时（未收到 voice_end）：强制恢复麦克风与对话模式"""
+        if self.mic_muted_due_to_navigation and self.pending_navigation_point == job.point_key:
+            self._force_navigation_recovery(f"导航点 {job.point_key} 超过 {job.timeout}s 未收到 voice_end")
+
+    def _on_navigation_preempted(self, job: NavigationJob) -> None:
+        """正在播报的任务被更高优先级导航点抢占：停止本地播放并丢弃录制，保持导航静音；
+        该任务的云端TTS流在结束前继续到达的音频一并丢弃"""
+        print(f"⏹️ [NAV] 停止播报 {job.point_key}")
+        if self._nav_tts_job_id == job.job_id:
+            self._stale_tts_job_id = job.job_id
+            self._stale_tts_deadline = time.monotonic() + self.NAV_STALE_AUDIO_SEC
+            self._nav_tts_job_id = None
+        while not self.audio_queue.empty():
             try:
-                running_loop = asyncio.get_running_loop()
-            except RuntimeError:
-                running_loop = None
-
-            if running_loop is self.loop:
-                print(f"� [NAV] 在主事件循环中直接创建任务: {point_key}")
-                task = asyncio.create_task(self._send_navigation_prompt(point_key))
-                task.add_done_callback(_done_cb)
-            else:
-                print(f"🔄 [NAV] 跨线程提交到主事件循环: {point_key}")
-                fut = asyncio.run_coroutine_threadsafe(self._send_navigation_prompt(point_key), self.loop)
-                fut.add_done_callback(_done_cb)
-        except Exception as e:
-            print(f"❌ [NAV] 调度失败: {e}")
-            # 直接释放占用，避免死锁
-            with self.navigation_lock:
-                self.navigation_task_active = False
-
-    def _process_next_navigation(self) -> None:
-        """从队列中取下一个导航任务"""
-        with self.navigation_lock:
-            if not self.navigation_queue.empty():
-                next_point = self.navigation_queue.get()
-                print(f"➡️ [NAV] 调度排队中的下一个导航: {next_point} | 剩余={self.navigation_queue.qsize()}")
-                self.navigation_task_active = True
-                self._schedule_navigation_coroutine(next_point)
-            else:
-                print("🟢 [NAV] 导航队列清空，空闲")
-                self.navigation_task_active = False
+                self.audio_queue.get_nowait()
+            except queue.Empty:
+                break
+        if self.output_sink:
+            self.output_sink.discard_pending()
+        if self.tts_audio_cache is not None:
+            self.tts_audio_cache.abort_capture()
+        self.pending_navigation_point = None
 
-    async def _send_navigation_prompt(self, point_key: str) -> None:
+    async def _send_navigation_prompt(self, point_key: str) -> bool:
+        """发送导航播报（本地缓存回放或云端请求），返回是否已开始播报"""
         print(f"🎯 开始处理导航点: {point_key}")
         
-        prompt_text = self.navigation_prompts.get(point_key)
-        if not prompt_text:
+        route = self.navigation_routes.get(point_key)
+        if route is None:
             print(f"⚠️ 未识别的导航点: {point_key}")
-            return
-            
-        if hasattr(self, 'mic_muted_due_to_navigation') and self.mic_muted_due_to_navigation:
-            print(f"🔁 导航播报尚未结束，忽略新的触发: {point_key}")
-            return
+            return False
+        prompt_text = route.prompt
 
         print(f"🛰️ 导航触发: {point_key} -> 发送文本请求")
         print(f"📝 导航文本: {prompt_text[:100]}...")  # 显示前100字符
@@ -1266,20 +1215,30 @@ class DragonDialogSession:
             except Exception as e:
                 print(f"⚠️ 进入导航模式失败: {e}")
 
-        # 安排超时守护，防止 voice_end 未触发导致一直静音
-        try:
-            self._schedule_navigation_timeout_guard(point_key)
-        except Exception as e:
-            print(f"⚠️ 安排导航超时守护失败: {e}")
+        # 播报超时（voice_end 未触发导致一直静音）由导航调度器按任务超时处理
+        # 本地TTS缓存命中：直接回放，不发云端请求
+        if self._play_cached_navigation_audio(route):
+            return True
 
         try:
             # 检查client是否存在
             if not hasattr(self, 'client') or not self.client:
                 print(f"❌ Dragon客户端未初始化")
-                return
-                
-            print(f"📡 发送导航文本到AI模型...")
-            await self.client.chat_text_query(prompt_text, dialog_extra={"input_mod": "text"})
+                return False
+
+            # 首次播放录制写入缓存：只发一次讲解词的直接TTS请求，录到的音频就是 route.script 本身
+            # （与离线预热 tts_audio_cache.synthesize 一致）；模型复述可能走样，兜底TTS又会叠加
+            # 第二段音频，二者都不能以讲解词为键写入缓存
+            capturing = (self.tts_audio_cache is not None and route.cacheable and
+                         self.tts_audio_cache.begin_capture(self.tts_speaker, route.script, self.wire_format.name,
+                                                            sample_width=self.wire_format.sample_width))
+            if capturing:
+                print(f"📡 发送导航讲解词TTS请求（录制本地缓存）...")
+                await self.client.chat_tts_text(is_user_querying=False, start=True, end=True, content=route.script)
+            else:
+                print(f"📡 发送导航文本到AI模型...")
+                await self.client.chat_text_query(prompt_text, dialog_extra={"input_mod": "text"})
+            self.navigation_metrics.mark_current("query_sent")
             print(f"✅ 导航文本发送成功: {point_key}")
             self.last_navigation_send_time = time.time()
             try:
@@ -1287,15 +1246,20 @@ class DragonDialogSession:
             except Exception as e:
                 print(f"⚠️ 安排导航音频回退守护失败: {e}")
 
-            # 兜底：如果模型不返回501文本后自动TTS，我们主动再发送一个 chat_tts_text 请求（非用户提问语境）
-            try:
-                await self.client.chat_tts_text(is_user_querying=False, start=True, end=True, content=prompt_text)
-                print(f"🔁 已发送导航兜底TTS: {point_key}")
-            except Exception as e:
-                print(f"⚠️ 导航兜底TTS发送失败: {e}")
+            # 兜底：如果模型不返回501文本后自动TTS，我们主动再发送一个 chat_tts_text 请求（非用户提问语境），
+            # 只播报讲解词本身，不含逐字复述指令
+            if not capturing:
+                try:
+                    await self.client.chat_tts_text(is_user_querying=False, start=True, end=True, content=route.script)
+                    print(f"🔁 已发送导航兜底TTS: {point_key}")
+                except Exception as e:
+                    print(f"⚠️ 导航兜底TTS发送失败: {e}")
+            return True
             
         except Exception as e:
             print(f"❌ 导航文本发送失败: {e}")
+            if self.tts_audio_cache is not None:
+                self.tts_audio_cache.abort_capture()
             # 恢复状态
             if hasattr(self, 'microphone_muted'):
                 self.microphone_muted = False
@@ -1303,9 +1267,143 @@ class DragonDialogSession:
                 self.mic_muted_due_to_navigation = False
             if hasattr(self, 'pending_navigation_point'):
                 self.pending_navigation_point = None
+            return False
 
-    def trigger_navigation_point(self, point_key: str) -> None:
-        self._handle_navigation_trigger(point_key)
+    def _is_stale_tts_audio(self) -> bool:
+        """音频包是否属于已被抢占任务的云端TTS流（超过 NAV_STALE_AUDIO_SEC 仍未结束则不再丢弃）"""
+        if self._stale_tts_job_id is None:
+            return False
+        if time.monotonic() > self._stale_tts_deadline:
+            print(f"⚠️ 被抢占导航任务 #{self._stale_tts_job_id} 的音频流超时未结束，恢复播放")
+            self._stale_tts_job_id = None
+            return False
+        self.stale_tts_packets_dropped += 1
+        return True
+
+    def _play_cached_navigation_audio(self, route: NavigationRoute) -> bool:
+        """导航讲解词命中本地TTS缓存时直接送入播放队列；返回是否命中"""
+        cache = self.tts_audio_cache
+        if cache is None or not self.audio_available or not route.cacheable:
+            return False
+        audio = cache.get(self.tts_speaker, route.script, self.wire_format.name)
+        if audio is None:
+            return False
+        print(f"⚡ 导航音频命中本地缓存: {route.id} ({len(audio)} 字节)，跳过云端请求")
+        self._nav_tts_job_id = None
+        self.last_navigation_send_time = time.time()
+        self.navigation_metrics.mark_current("first_audio", cached=True)
+        self._queue_local_audio(audio)
+        return True
+
+    def _queue_local_audio(self, audio: bytes) -> None:
+        """本地缓存音频送入播放队列（与云端音频走同一播放线程）"""
+        self.last_audio_packet_time = time.time()
+        if not self.is_voice_playback_active:
+            EventInterface.emit_voice_event("voice_start")
+            self.is_voice_playback_active = True
+        # 按与云端音频包相近的大小分段入队，事件450清空队列时可及时打断
+        step = self.output_audio_config["chunk"] * self.wire_format.sample_width
+        for i in range(0, len(audio), step):
+            self.audio_queue.put(audio[i:i + step])
+
+    def _cached_reply_audio(self, response: CannedResponse) -> Optional[bytes]:
+        if self.tts_audio_cache is None or not self.audio_available:
+            return None
+        return self.tts_audio_cache.get(self.tts_speaker, response.text, self.wire_format.name)
+
+    def _answer_canned(self, text: str) -> bool:
+        """识别结果命中固定回复：音频已缓存则本机立即播放并丢弃云端本轮回复音频，
+        否则保留云端回复并实时合成规范答案；返回是否已本机播放"""
+        if self.suppress_cloud_reply or not text or self.dialog_mode == 'navigation':
+            return False
+        response = self.decide_intent(text).canned
+        if response is None:
+            return False
+        audio = self._cached_reply_audio(response)
+        if audio is None:
+            self._speak_canned_live(response)
+            return False
+        print(f"⚡ 固定回复 {response.name}: '{response.text}'（本地播放，忽略云端本轮回复）")
+        self.suppress_cloud_reply = True
+        self._queue_local_audio(audio)
+        return True
+
+    def _speak_canned_live(self, response: CannedResponse) -> None:
+        """固定回复尚无缓存音频：不丢弃云端回复，另发规范答案的实时TTS（模型作答前送达时替换闲聊结果），
+        并后台预热该文本，下次命中即本机播放"""
+        if self._canned_live_tts_sent or self.loop is None or not getattr(self, 'client', None):
+            return
+        self._canned_live_tts_sent = True
+        print(f"ℹ️ 固定回复 {response.name} 尚无缓存音频，实时合成规范答案并后台预热")
+        self.loop.create_task(self._send_canned_tts(response))
+        self._warm_navigation_routes([response.text])
+
+    async def _send_canned_tts(self, response: CannedResponse) -> None:
+        try:
+            await self.client.chat_tts_text(is_user_querying=False, start=True, end=True, content=response.text)
+        except Exception as e:
+            print(f"⚠️ 固定回复 {response.name} 实时TTS发送失败: {e}")
+
+    def trigger_navigation_point(self, point_key: str, priority: Optional[int] = None,
+                                 triggered_at: Optional[float] = None) -> Optional[NavigationJob]:
+        return self._handle_navigation_trigger(point_key, priority, triggered_at)
+
+    def _watch_navigation_routes(self) -> None:
+        """（时间轮回调）检查路线表文件变化并重新计时"""
+        try:
+            self._reload_navigation_routes()
+        except Exception as e:
+            print(f"⚠️ 导航路线表检查失败: {e}")
+        if self.is_running:
+            self.timers.schedule("routes/watch", self.NAV_ROUTES_RELOAD_SEC, self._watch_navigation_routes)
+
+    def _reload_navigation_routes(self) -> bool:
+        """重新加载路线表；讲解词变化的路线旧缓存作废并后台重新合成，已删除的路线取消排队任务"""
+        old_routes = self.navigation_routes.routes
+        if not self.navigation_routes.reload():
+            return False
+        routes = self.navigation_routes.routes
+        print(f"🧭 导航路线表已更新: 版本 {self.navigation_routes.file_version} | {len(routes)} 条 {list(routes)}")
+        rewarm = []
+        for route in stale_routes(old_routes, routes):
+            if route.id not in routes:
+                self.navigation_scheduler.cancel(route.id, reason="route_removed")
+            if self.tts_audio_cache is not None and \
+                    self.tts_audio_cache.invalidate(self.tts_speaker, route.script, self.wire_format.name):
+                print(f"🗑️ 导航点 {route.id} 讲解词已变化，旧缓存音频作废")
+                successor = routes.get(route.id)
+                if successor is not None and successor.cacheable:
+                    rewarm.append(successor.script)
+        self._warm_navigation_routes(rewarm)
+        return True
+
+    def _warm_navigation_routes(self, texts: Optional[List[str]] = None) -> None:
+        """后台合成音频：warm 策略的全部导航讲解词 + 指定文本（如固定回复；已缓存的跳过）"""
+        if self.tts_audio_cache is None or not self.audio_available or self.loop is None:
+            return
+        texts = list(texts or []) + [r.script for r in self.navigation_routes.ordered() if r.cache == CACHE_WARM]
+        texts = [t for t in dict.fromkeys(texts)
+                 if not self.tts_audio_cache.contains(self.tts_speaker, t, self.wire_format.name)]
+        if not texts:
+            return
+        if self._route_warm_task is not None and not self._route_warm_task.done():
+            # 上一轮预热尚未结束：合并到下一轮
+            self._route_warm_pending.extend(texts)
+            return
+        self._route_warm_task = self.loop.create_task(self._run_route_warm(texts))
+
+    async def _run_route_warm(self, texts: List[str]) -> None:
+        print(f"🔥 后台预热导航讲解词音频: {len(texts)} 段")
+        try:
+            result = await warm_up(self.tts_audio_cache, texts, self.tts_speaker, self.wire_format)
+            print(f"🔥 导航音频预热完成: 已有 {result['cached']} | 新合成 {result['synthesized']} | 失败 {result['failed']}")
+        except Exception as e:
+            print(f"⚠️ 导航音频预热失败: {e}")
+        finally:
+            pending, self._route_warm_pending = self._route_warm_pending, []
+            self._route_warm_task = None
+            if pending and self.is_running:
+                self._warm_navigation_routes(pending)
 
     def handle_server_response(self, response: Dict[str, Any]) -> None:
         """处理服务器响应 - 集成机器人控制和知识库功能"""
@@ -1318,11 +1416,15 @@ class DragonDialogSession:
             return
 
         if msg_type == 'SERVER_ACK' and isinstance(response.get('payload_msg'), bytes):
-            if self.is_sending_chat_tts_text:
+            if self.is_sending_chat_tts_text or self.suppress_cloud_reply or self._is_stale_tts_audio():
                 return
             audio_data = response['payload_msg']
             print(f"🎵 收到音频数据包: {len(audio_data)} 字节")
             self.last_audio_packet_time = time.time()
+            if self.mic_muted_due_to_navigation:
+                self.navigation_metrics.mark_current("first_audio")
+            if self.tts_audio_cache is not None:
+                self.tts_audio_cache.capture(audio_data)
             if not self.is_voice_playback_active:
                 EventInterface.emit_voice_event("voice_start")
                 self.is_voice_playback_active = True
@@ -1348,6 +1450,7 @@ class DragonDialogSession:
             if 'asr_result' in payload_msg:
                 asr_text = payload_msg['asr_result']
                 print(f"📍 [ASR调试] 从asr_result获得: {asr_text}")
+                self._answer_canned(asr_text)
             
             # 方法2: 事件451中的results字段
             elif event == 451 and 'results' in payload_msg:
@@ -1358,6 +1461,16 @@ class DragonDialogSession:
                         if isinstance(result, dict) and 'text' in result:
                             asr_text = result['text']
                             print(f"📍 [ASR调试] 从事件451获得: {asr_text}")
+                            self._utterance_text = asr_text
+                            if not result.get('is_interim', True):
+                                self._answer_canned(asr_text)
+                            # 推测式意图：中间结果只做稳定前缀推测，最终结果确认或撤回
+                            if self.speculative_intent is not None:
+                                if result.get('is_interim', True):
+                                    self.speculative_intent.on_partial(asr_text)
+                                else:
+                                    self.speculative_intent.on_final(asr_text)
+                                asr_text = None
                             break
             
             # 方法3: content字段 (可能包含识别结果)
@@ -1371,20 +1484,42 @@ class DragonDialogSession:
             if asr_text and asr_text.strip():
                 print(f"🎤 语音识别到: {asr_text}")
                 # 🔄 并行机器人指令监控 - 不干扰原有纯语音对话系统
-                robot_response = self.robot_controller.execute_command(asr_text)
+                decision = self.decide_intent(asr_text)
+                robot_response = self.robot_controller.execute_match(asr_text.strip(), decision.command)
 
             if event == 450:
+                self.robot_controller.begin_utterance()
+                self.suppress_cloud_reply = False
+                self._canned_live_tts_sent = False
+                self._utterance_text = None
+                if self.speculative_intent is not None:
+                    self.speculative_intent.reset()
                 print(f"清空缓存音频: {response['session_id']}")
                 while not self.audio_queue.empty():
                     try:
                         self.audio_queue.get_nowait()
                     except queue.Empty:
                         continue
+                if self.output_sink:
+                    self.output_sink.discard_pending()
                 self.is_user_querying = True
                 if self.is_voice_playback_active:
                     EventInterface.emit_voice_event("voice_end")
                     self.is_voice_playback_active = False
 
+            if event == 359 and self._stale_tts_job_id is not None:
+                # 被抢占任务的TTS流结束：其后的音频属于新任务
+                print(f"🔚 被抢占导航任务 #{self._stale_tts_job_id} 的云端音频流已结束")
+                self._stale_tts_job_id = None
+            elif event == 359 and self.mic_muted_due_to_navigation and self.tts_audio_cache is not None:
+                key = self.tts_audio_cache.commit_capture()
+                if key:
+                    print(f"💾 导航音频已写入本地TTS缓存: {key}")
+
+            if event == 359 and self.suppress_cloud_reply:
+                print("🔇 云端本轮回复已结束（音频已被固定回复替代）")
+                self.suppress_cloud_reply = False
+
             # 添加官方案例的event 350处理 - WSL2关键优化
             if event == 350:
                 tts_type = payload_msg.get("tts_type")
@@ -1405,6 +1540,12 @@ class DragonDialogSession:
 
             if event == 459:
                 self.is_user_querying = False
+                # ASR结束：以本轮最后一条识别结果检查固定回复
+                if self._utterance_text:
+                    self._answer_canned(self._utterance_text)
+                # ASR结束：未收到非中间结果时，以最后一条中间结果定稿
+                if self.speculative_intent is not None:
+                    self.speculative_intent.on_final("")
                 # 严格官方：不做文件回放
                 # 如果当前是导航静音但实质已经没有音频流，做一次兜底恢复
                 if self.mic_muted_due_to_navigation and not self.is_voice_playback_active:
@@ -1419,138 +1560,52 @@ class DragonDialogSession:
         # 其它类型暂不处理
         # print(f"ℹ️ 未处理的消息类型: {msg_type}")
 
+    def decide_intent(self, text: str) -> IntentDecision:
+        """一句话的合并意图判定（经 LRU 缓存）"""
+        return self.intent_cache.get(text)
+
+    def _decide_intent(self, text: str) -> IntentDecision:
+        return IntentDecision(
+            text=text,
+            command=self.robot_controller.match_command(text),
+            knowledge=self.knowledge_intent_classifier.classify(text),
+            canned=self.canned_responses.match(text),
+        )
+
+    def _reload_intent_rules(self) -> None:
+        """命令表或关键词表文件变化时重新编译（版本号变化使缓存失效）"""
+        engine = self.robot_controller.intent_engine
+        if engine.reload():
+            self.robot_controller.intents = engine.intents_for("dialog")
+        self.knowledge_intent_classifier.reload()
+        self.canned_responses.reload()
+
+    def classify_knowledge_intent(self, text: str) -> KnowledgeIntent:
+        """判断是否需要使用知识库，并返回命中原因（预编译自动机 + 灵活正则）"""
+        return self.decide_intent(text).knowledge
+
+    def _startup_kb_scan(self, watch_dirs: List[str]):
+        """启动扫描（后台线程）：导入新增/修改的文件，不阻塞会话建立"""
+        try:
+            print(f"📁 正在扫描知识库目录: {watch_dirs} …")
+            update_stats = self.auto_kb_manager.auto_update_knowledge_base()
+            print(f"✅ 知识库扫描完成: 新增{update_stats.get('new_added',0)} 更新{update_stats.get('modified_updated',0)} 删除{update_stats.get('deleted_removed',0)} 错误{update_stats.get('errors',0)}")
+        except Exception as scan_e:
+            print(f"⚠️ 启动扫描失败: {scan_e}")
+    
     def should_use_knowledge_base(self, text: str) -> bool:
         """判断是否需要使用知识库"""
-        # 关键词列表 - 涉及这些话题时使用知识库
-        knowledge_keywords = [
-            # 中国电信相关
-            "中国电信", "电信", "telecom", "中国电信集团",
-            
-            # 人工智能研究院相关
-            "人工智能研究院", "AI研究院", "研究院", 
-            
-            # TeleAI相关 - 添加各种可能的发音识别结果
-            "teleai", "TeleAI", "TELEAI", "泰勒AI", "泰勒爱", "太勒AI", "太勒爱",
-            "泰来AI", "泰来爱", "台来AI", "台来爱", "台勒AI", "台勒爱",
-            "泰利AI", "泰利爱", "太利AI", "太利爱", "泰里AI", "泰里爱",
-            "telephone AI", "telephone爱", "电话AI", "电话爱",
-            "tele AI", "tele爱", "特勒AI", "特勒爱", "特来AI", "特来爱",
-            "缇勒AI", "缇勒爱", "蒂勒AI", "蒂勒爱", "底勒AI", "底勒爱",
-            "提勒AI", "提勒爱", "梯勒AI", "梯勒爱", "替勒AI", "替勒爱",
-            "诶爱", "哎爱", "唉爱", "诶i", "哎i", "唉i",
-            # 四音节分离式发音变体 (Te-le-A-I)
-            "泰勒A爱", "太勒A爱", "泰来A爱", "台来A爱", "台勒A爱", "泰利A爱", "太利A爱", "泰里A爱",
-            "泰勒A艾", "太勒A艾", "泰来A艾", "台来A艾", "台勒A艾", "泰利A艾", "太利A艾", "泰里A艾",
-            "泰勒阿爱", "太勒阿爱", "泰来阿爱", "台来阿爱", "泰利阿爱", "太利阿爱",
-            "泰勒阿艾", "太勒阿艾", "泰来阿艾", "台来阿艾", "泰利阿艾", "太利阿艾",
-            "特勒A爱", "特来A爱", "特勒A艾", "特来A艾", "特勒阿爱", "特来阿爱",
-            "tele A爱", "tele A艾", "tele阿爱", "tele阿艾",
-            "Tele A爱", "Tele A艾", "Tele阿爱", "Tele阿艾",
-            
-            # 技术相关
-            "大模型", "语言模型", "机器学习", "深度学习", "神经网络",
-            "自然语言处理", "NLP", "计算机视觉", "CV",
-            "算法", "模型训练", "数据集", "推理", "微调",
-            
-            # 产品和服务相关
-            "星辰大模型", "星辰", "TeleChat", "telechat", "泰勒聊天", "泰勒查特",
-            "智能客服", "语音助手", "聊天机器人",
-            "云计算", "边缘计算", "5G", "6G",
-            
-            # 公司和组织
-            "中国电信人工智能研究院", "电信AI研究院",
-            "研发", "技术团队", "实验室", "创新",
-            
-            # 行业相关
-            "电信行业", "通信", "运营商", "网络",
-            "数字化", "智能化", "信息化"
-        ]
-        
-        text_lower = text.lower()
-        # 先检查原文
-        for keyword in knowledge_keywords:
-            if keyword.lower() in text_lower:
-                print(f"🎯 匹配到知识库关键词: {keyword}")
-                return True
-        
-        # 检查是否包含类似发音的组合
-        teleai_patterns = [
-            "泰勒", "太勒", "泰来", "台来", "台勒", "泰利", "太利", "泰里",
-            "特勒", "特来", "缇勒", "蒂勒", "底勒", "提勒", "梯勒", "替勒",
-            "tele", "Tele", "TELE"
-        ]
-        ai_patterns = ["AI", "ai", "爱", "i", "哎", "诶", "唉", "A爱", "A艾", "A", "a", "艾", "阿爱", "阿艾"]
-        
-        # 基本组合匹配
-        for tele in teleai_patterns:
-            for ai in ai_patterns:
-                if tele in text and ai in text:
-                    print(f"🎯 匹配到TeleAI发音组合: {tele} + {ai}")
-                    return True
-        
-        # 特殊模式：处理四音节分离式发音 (Te-le-A-I)
-        four_syllable_patterns = [
-            # 标准四音节模式
-            "泰勒A爱", "太勒A爱", "泰来A爱", "台来A爱", "台勒A爱", "泰利A爱", "太利A爱", "泰里A爱",
-            "泰勒A艾", "太勒A艾", "泰来A艾", "台来A艾", "台勒A艾", "泰利A艾", "太利A艾", "泰里A艾",
-            "泰勒阿爱", "太勒阿爱", "泰来阿爱", "台来阿爱", "泰利阿爱", "太利阿爱",
-            "泰勒阿艾", "太勒阿艾", "泰来阿艾", "台来阿艾", "泰利阿艾", "太利阿艾",
-            "特勒A爱", "特来A爱", "特勒A艾", "特来A艾", "特勒阿爱", "特来阿爱",
-            # 英文+中文混合
-            "tele A爱", "tele A艾", "tele阿爱", "tele阿艾",
-            "Tele A爱", "Tele A艾", "Tele阿爱", "Tele阿艾",
-            # 其他变体
-            "泰利AI", "太利AI", "台勒AI", "泰里AI", "特勒AI", "特来AI",
-            "泰利ai", "太利ai", "台勒ai", "泰里ai", "特勒ai", "特来ai"
-        ]
-        
-        for pattern in four_syllable_patterns:
-            if pattern in text:
-                print(f"🎯 匹配到TeleAI四音节发音模式: {pattern}")
-                return True
-        
-        # 更灵活的模式匹配：检查四音节分离模式（允许中间有其他字符）
-        import re
-        # 匹配: tele音素 + (0-2个字符) + A音素 + (0-2个字符) + I音素
-        flexible_pattern = r"(泰利|太利|泰勒|太勒|台来|泰来|台勒|泰里|特勒|特来|tele|Tele).{0,2}(A|a|阿).{0,2}(AI|ai|爱|艾|I|i|诶|哎)"
-        if re.search(flexible_pattern, text):
-            match = re.search(flexible_pattern, text)
-            print(f"🎯 匹配到TeleAI四音节灵活模式: {match.group()}")
-            return True
-            
-        # 额外的分离检测：检查是否同时包含tele音素和分离的A、I音素
-        tele_present = any(tele in text for tele in ["泰利", "太利", "泰勒", "太勒", "台来", "泰来", "台勒", "泰里", "特勒", "特来", "tele", "Tele"])
-        a_present = any(a in text for a in ["A", "a", "阿", "啊"])
-        i_present = any(i in text for i in ["AI", "ai", "爱", "艾", "I", "i", "诶", "哎", "唉"])
-        
-        if tele_present and a_present and i_present:
-            print(f"🎯 匹配到TeleAI分离音素模式: Tele+A+I组合")
-            return True
-        
-        return False
+        intent = self.classify_knowledge_intent(text)
+        if intent:
+            print(f"🎯 匹配到{intent.describe()}")
+        return intent.use_knowledge_base
 
     def intercept_identity_or_affiliation(self, text: str) -> Optional[str]:
         """拦截关于身份/归属的提问，直接返回规范答案。
         返回：若命中则返回要回复的文本，否则返回None。
         """
-        q = text.strip().lower()
-        # 常见身份类问题
-        identity_keys = [
-            "你是谁", "你是什么", "你的身份", "你叫什么", "你是哪位", "你的名字", "自我介绍", "你是哪个助手", "你来自哪", "你是什么助手",
-            "你是豆包吗", "你是不是豆包", "豆包"
-        ]
-        # 常见归属类问题
-        affiliation_keys = [
-            "你属于哪家公司", "你属于谁", "你的公司是谁", "你们的公司是谁", "你们是谁的产品", "你背后是谁", "谁研发了你",
-            "哪个公司开发", "隶属哪家公司", "归属", "归属于哪", "什么单位", "哪家单位", "哪个研究院", "哪个公司",
-            "你们属于什么机构", "你们的机构", "你们的团队"
-        ]
-
-        if any(k in q for k in identity_keys):
-            return "我是基于中国电信星辰大模型驱动的机器人智能助理。"
-        if any(k in q for k in affiliation_keys):
-            return "中国电信人工智能研究院。"
-        return None
+        canned = self.decide_intent(text).canned
+        return canned.text if canned else None
 
     async def receive_loop(self):
         """接收循环 - 完全按照官方"""
@@ -1564,6 +1619,8 @@ class DragonDialogSession:
                     break
                 if 'event' in response and response['event'] == 359 and not self.say_hello_over_event.is_set():
                     print(f"✅ say_hello结束事件")
+                    if self.tts_audio_cache is not None and self.tts_audio_cache.commit_capture():
+                        print("💾 开场问候音频已写入本地TTS缓存")
                     self.say_hello_over_event.set()
         except asyncio.CancelledError:
             print("接收任务已取消")
@@ -1571,9 +1628,22 @@ class DragonDialogSession:
             print(f"❌ 接收消息错误: {e}")
 
     async def custom_say_hello(self) -> None:
-        """发送自定义Hello消息"""
+        """发送自定义Hello消息；问候音频已缓存时本机直接播放，不请求云端"""
+        greeting = self.canned_responses.get(GREETING)
+        content = greeting.text if greeting else "你好，我是基于中国电信星辰大模型驱动的机器人智能助理，很高兴为您服务，希望能带给您舒适的体验。"
+        if greeting is not None:
+            audio = self._cached_reply_audio(greeting)
+            if audio is not None:
+                print("⚡ 开场问候命中本地缓存，直接播放")
+                self._queue_local_audio(audio)
+                self.say_hello_over_event.set()
+                return
+            if self.tts_audio_cache is not None:
+                # 首次问候录制写入缓存，下次启动即可本地播放
+                self.tts_audio_cache.begin_capture(self.tts_speaker, content, self.wire_format.name,
+                                                   sample_width=self.wire_format.sample_width)
         payload = {
-            "content": "你好，我是基于中国电信星辰大模型驱动的机器人智能助理，很高兴为您服务，希望能带给您舒适的体验。",
+            "content": content,
         }
         hello_request = bytearray(protocol.generate_header())
         hello_request.extend(int(300).to_bytes(4, 'big'))
@@ -1657,6 +1727,12 @@ class DragonDialogSession:
             await self.client.connect()
             print("✅ 连接中国电信星辰大模型智能助理服务成功")
             self.loop = asyncio.get_running_loop()
+            self.timers.start(self.loop)
+            self.navigation_scheduler.start()
+            # 导航路线表：后台预热 warm 策略的讲解词音频，并定期检查文件变化
+            self._warm_navigation_routes()
+            if self.NAV_ROUTES_RELOAD_SEC > 0:
+                self.timers.schedule("routes/watch", self.NAV_ROUTES_RELOAD_SEC, self._watch_navigation_routes)
             
             # 显示功能状态
             print("\n📊 功能状态:")
@@ -1703,6 +1779,7 @@ class DragonDialogSession:
             # 停止导航测试服务器
             if self.navigation_test_server:
                 self.navigation_test_server.stop()
+            self.navigation_scheduler.stop()
                 
             self.audio_device.cleanup()
             print("🛑 系统已安全关闭")
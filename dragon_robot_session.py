@@ -107,6 +107,9 @@ except ImportError as e:
     print("请确保在official_example目录下运行")
     sys.exit(1)
 
+# 共享语音意图引擎（命令表 voice_commands.json）
+from intent_engine import get_intent_engine
+
 # 导入知识库
 try:
     from simple_knowledge_base import SimpleKnowledgeBase
@@ -175,33 +178,10 @@ class DragonRobotController:
         self.ros_enabled = ROS_AVAILABLE and self.init_ros()
         self.current_action = "停止"
         
-        # 指令映射
-        self.command_map = {
-            "前进": (0.5, 0.0),
-            "后退": (-0.3, 0.0), 
-            "左转": (0.0, 0.5),
-            "右转": (0.0, -0.5),
-            "停止": (0.0, 0.0),
-            "向前": (0.5, 0.0),
-            "向后": (-0.3, 0.0),
-            "向左": (0.0, 0.5),
-            "向右": (0.0, -0.5),
-            "往前": (0.5, 0.0),
-            "往后": (-0.3, 0.0),
-            "往左": (0.0, 0.5),
-            "往右": (0.0, -0.5),
-            "前走": (0.5, 0.0),
-            "后走": (-0.3, 0.0),
-            "左拐": (0.0, 0.5),
-            "右拐": (0.0, -0.5),
-            "走前面": (0.5, 0.0),
-            "走后面": (-0.3, 0.0),
-            "左边": (0.0, 0.5),
-            "右边": (0.0, -0.5),
-            "停下": (0.0, 0.0),
-            "停车": (0.0, 0.0),
-            "暂停": (0.0, 0.0),
-        }
+        # 指令映射：来自共享意图引擎（voice_commands.json）中带 ROS Twist 的意图
+        self.intent_engine = get_intent_engine()
+        self.intents = self.intent_engine.intents_for("ros")
+        self.command_map = self.intent_engine.phrase_map("twist", "ros")
     
     def init_ros(self):
         """初始化ROS"""
@@ -222,8 +202,8 @@ class DragonRobotController:
         robot_keywords = ["机器人", "让机器人", "控制机器人", "机器人请"]
         has_robot_keyword = any(keyword in text for keyword in robot_keywords)
         
-        # 检查是否包含运动指令
-        has_movement = any(command in text for command in self.command_map.keys())
+        # 检查是否包含运动指令（单次扫描）
+        has_movement = self.intent_engine.match(text, self.intents) is not None
         
         return has_robot_keyword or has_movement
     
@@ -231,12 +211,13 @@ class DragonRobotController:
         """解析并执行语音指令"""
         text = text.strip().replace("。", "").replace("，", "").replace(",", "").replace(".", "")
         
-        for command, (x, z) in self.command_map.items():
-            if command in text:
-                self.current_action = command  # 先更新动作名称
-                self.execute_movement(x, z)    # 再执行运动
-                return True
-        return False
+        match = self.intent_engine.match(text, self.intents)
+        if match is None:
+            return False
+        x, z = match.twist
+        self.current_action = match.phrase  # 先更新动作名称
+        self.execute_movement(x, z)         # 再执行运动
+        return True
     
     def execute_movement(self, linear_x: float, angular_z: float):
         """执行运动指令"""
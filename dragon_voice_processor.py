@@ -11,6 +11,8 @@ import threading
 import json
 from typing import Dict, Any, Optional
 
+from intent_engine import get_intent_engine
+
 # 添加语音AI路径
 sys.path.append('/home/ray/agent/doubao_robot_voice_agent_starter')
 
@@ -53,37 +55,9 @@ class DragonVoiceCommandProcessor:
             'save_motor': '2',    # 保存电机数据
         }
         
-        # 速度级别映射
-        self.speed_levels = {
-            '慢': 0.3,
-            '中': 0.5, 
-            '快': 0.8,
-            '默认': 0.5
-        }
-        
-        # Dragon机器人专用命令词典
-        self.command_patterns = {
-            # 移动指令
-            'move_forward': ['向前', '前进', '往前走', '向前走'],
-            'move_backward': ['向后', '后退', '倒退', '往后走'],
-            'move_left': ['向左', '左移', '往左走', '向左走'],
-            'move_right': ['向右', '右移', '往右走', '向右走'],
-            'turn_left': ['左转', '向左转', '转左'],
-            'turn_right': ['右转', '向右转', '转右'],
-            
-            # 控制指令
-            'stop': ['停止', '停下', '站住', '暂停', '重置'],
-            'start_policy': ['开始', '启动', '开始行走', '开始策略'],
-            'switch_mode': ['切换模式', '换模式', '模式切换'],
-            
-            # 数据记录
-            'save_data': ['保存数据', '记录数据', '保存轨迹'],
-            'save_motor_data': ['保存电机数据', '记录电机', '保存电机'],
-            
-            # 状态查询
-            'status': ['状态', '当前状态', '机器人状态'],
-            'help': ['帮助', '指令', '命令列表']
-        }
+        # 命令短语与速度词来自共享意图引擎（voice_commands.json），每句话单次扫描
+        self.intent_engine = get_intent_engine()
+        self.intents = self.intent_engine.intents_for("keyboard")
         
         print("🎤 Dragon语音命令处理器初始化完成")
     
@@ -99,39 +73,18 @@ class DragonVoiceCommandProcessor:
         """
         text = voice_text.lower().strip()
         
-        # 提取速度信息
-        speed = 0.5  # 默认速度
-        for speed_word, speed_value in self.speed_levels.items():
-            if speed_word in text:
-                speed = speed_value
-                break
-        
-        # 匹配命令模式
-        for command, patterns in self.command_patterns.items():
-            if any(pattern in text for pattern in patterns):
-                return self._create_command(command, speed, text)
-        
-        return None
+        # 单次扫描同时得到命令与速度词；按命令表顺序取第一个命中的意图
+        match = self.intent_engine.match(text, self.intents, ordered=True)
+        if match is None:
+            return None
+        speed = match.speed if match.speed is not None else self.intent_engine.default_speed
+        return self._create_command(match.intent, speed, text)
     
     def _create_command(self, command: str, speed: float, original_text: str) -> Dict[str, Any]:
         """创建标准化的命令字典"""
-        command_map = {
-            'move_forward': {'key': 'w', 'type': 'movement', 'direction': 'forward'},
-            'move_backward': {'key': 's', 'type': 'movement', 'direction': 'backward'},
-            'move_left': {'key': 'a', 'type': 'movement', 'direction': 'left'}, 
-            'move_right': {'key': 'd', 'type': 'movement', 'direction': 'right'},
-            'turn_left': {'key': 'z', 'type': 'rotation', 'direction': 'left'},
-            'turn_right': {'key': 'x', 'type': 'rotation', 'direction': 'right'},
-            'stop': {'key': 'e', 'type': 'control', 'action': 'stop'},
-            'start_policy': {'key': 'q', 'type': 'control', 'action': 'start'},
-            'switch_mode': {'key': 'm', 'type': 'control', 'action': 'mode_switch'},
-            'save_data': {'key': '1', 'type': 'data', 'action': 'save_position'},
-            'save_motor_data': {'key': '2', 'type': 'data', 'action': 'save_motor'},
-            'status': {'key': None, 'type': 'query', 'action': 'status'},
-            'help': {'key': None, 'type': 'query', 'action': 'help'}
-        }
-        
-        base_cmd = command_map.get(command, {})
+        spec = self.intent_engine.intents.get(command)
+        params = spec.params if spec else {}
+        base_cmd = {k: params[k] for k in ('key', 'type', 'direction', 'action') if k in params}
         return {
             'command': command,
             'key': base_cmd.get('key'),
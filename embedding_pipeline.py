@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+入库嵌入编码流水线
+批量导入数千份文档时，嵌入编码是主要耗时。流水线对一批片段：
+
+- 按文本长度排序后切成固定大小的批次：同批文本长度相近，transformer 的 padding 最少；
+- 可选进程池（spawn 方式启动，避免 fork 已初始化的 torch 线程）把批次分给多个 CPU 核，
+  每个工作进程只加载一次模型，并按核数分配 torch 线程，避免超额订阅；
+- 结果按原始顺序写回同一个矩阵，调用方照原顺序写入所用的后端（DenseVectorIndex / Chroma）。
+
+批次不足以分给所有进程（少于 2 × 进程数）时在本进程内编码，避免为小文档付出进程与模型加载开销。
+
+环境变量：
+    DRAGON_KB_EMBED_BATCH     每批片段数（默认 64）
+    DRAGON_KB_EMBED_WORKERS   编码进程数（默认 1，即本进程内编码；0 表示 CPU 核数）
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 工作进程内的模型（由 _init_worker 加载一次）
+_worker_model = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts: List[str], normalize: bool) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False,
+                                           normalize_embeddings=normalize), dtype=np.float32)
+
+
+def length_sorted_batches(texts: Sequence[str], batch_size: int) -> List[List[int]]:
+    """按文本长度排序后分批，返回每批的原始下标"""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+class EmbeddingPipeline:
+    """按长度分批、可选多进程的嵌入编码
+
+    encode 为本进程内的批量编码函数（如已加载模型的 model.encode 或 embed_documents）；
+    多进程时工作进程按 model_name 用 SentenceTransformer 自行加载模型。
+    """
+
+    def __init__(self, model_name: str, encode: Callable[[List[str]], Any],
+                 batch_size: Optional[int] = None, workers: Optional[int] = None,
+                 normalize: bool = False):
+        self.model_name = model_name
+        self._encode = encode
+        self.batch_size = max(1, batch_size or _env_int("DRAGON_KB_EMBED_BATCH", 64))
+        workers = workers if workers is not None else _env_int("DRAGON_KB_EMBED_WORKERS", 1)
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.normalize = normalize
+        self.stats: Dict[str, Any] = {"texts": 0, "batches": 0, "parallel_runs": 0, "seconds": 0.0}
+
+    def _local(self, texts: Sequence[str], batches: List[List[int]]) -> Iterator[Tuple[List[int], np.ndarray]]:
+        for rows in batches:
+            yield rows, np.asarray(self._encode([texts[i] for i in rows]), dtype=np.float32)
+
+    def _parallel(self, texts: Sequence[str], batches: List[List[int]]) -> Iterator[Tuple[List[int], np.ndarray]]:
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(self.model_name, threads)) as pool:
+            results = pool.map(_encode_in_worker, [[texts[i] for i in rows] for rows in batches],
+                               [self.normalize] * len(batches))
+            yield from zip(batches, results)
+
+    def encode(self, texts: Sequence[str], progress: bool = False) -> np.ndarray:
+        """编码全部文本，返回按原始顺序排列的 float32 矩阵"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        start = time.perf_counter()
+        batches = length_sorted_batches(texts, self.batch_size)
+        parallel = self.workers > 1 and len(batches) >= 2 * self.workers
+        runner = self._parallel if parallel else self._local
+
+        out = None
+        report_every = max(1, len(batches) // 10)
+        for done, (rows, vectors) in enumerate(runner(texts, batches), 1):
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[rows] = vectors
+            if progress and (done % report_every == 0 or done == len(batches)):
+                print(f"   🧮 嵌入编码 {done}/{len(batches)} 批 ({min(done * self.batch_size, len(texts))}/{len(texts)} 个片段)")
+
+        elapsed = time.perf_counter() - start
+        self.stats["texts"] += len(texts)
+        self.stats["batches"] += len(batches)
+        self.stats["parallel_runs"] += int(parallel)
+        self.stats["seconds"] += elapsed
+        if progress:
+            mode = f"{self.workers} 个进程" if parallel else "单进程"
+            print(f"   ✅ 嵌入编码完成: {len(texts)} 个片段，{elapsed:.1f}s（{mode}，每批 {self.batch_size}）")
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        seconds = self.stats["seconds"]
+        return dict(self.stats, seconds=round(seconds, 2), batch_size=self.batch_size, workers=self.workers,
+                    texts_per_sec=round(self.stats["texts"] / seconds, 1) if seconds else None)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+内存映射的向量索引存储
+取代把整个嵌入数组连同全部文档字典 pickle 进 vector_index.pkl 的做法（加载慢、常驻内存随语料增长，
+且 pickle 加载不安全）。目录布局：
+
+    <store_dir>/manifest.json     格式版本、片段数、维度、精度、嵌入模型（最后写入，作为完成标志）
+    <store_dir>/embeddings.npy    归一化嵌入矩阵（np.load(mmap_mode="r")，不允许 pickle）
+    <store_dir>/documents.jsonl   文档表：每行一个片段的 JSON，与矩阵行对齐
+    <store_dir>/offsets.npy       文档表每行的字节偏移（int64，共 片段数+1 个）
+    <store_dir>/ivf.npz           可选：IVF 近似检索的质心与分簇结果（见 ivf_index.py）
+
+加载只读取 manifest 并映射两个 .npy 文件，启动耗时与常驻内存几乎与知识库规模无关：
+矩阵页按需从页缓存读入，多个进程打开同一存储时共享页缓存；文档按行号即时读取。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+DOCUMENTS = "documents.jsonl"
+OFFSETS = "offsets.npy"
+
+
+class DocumentTable:
+    """按行号读取的只读文档表（JSONL + 偏移数组）"""
+
+    def __init__(self, documents_path: str, offsets: np.ndarray):
+        self.documents_path = documents_path
+        self.offsets = offsets
+        self._file = open(documents_path, "rb")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        with self._lock:
+            self._file.seek(start)
+            line = self._file.read(end - start)
+        return json.loads(line)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class EmbeddingStore:
+    """归一化嵌入矩阵 + 文档表的磁盘存储"""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.store_dir, name)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path(MANIFEST))
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, embeddings: np.ndarray, documents: Iterable[Dict[str, Any]], model: str = "") -> Dict[str, Any]:
+        """写入存储：各文件先写临时文件再原子替换，manifest 最后写入"""
+        os.makedirs(self.store_dir, exist_ok=True)
+        # 先删除 manifest：中途失败时存储视为不存在，而不是新旧文件混用
+        try:
+            os.remove(self._path(MANIFEST))
+        except OSError:
+            pass
+
+        embeddings = np.ascontiguousarray(embeddings)
+        tmp = self._path(EMBEDDINGS + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, embeddings, allow_pickle=False)
+        os.replace(tmp, self._path(EMBEDDINGS))
+
+        offsets: List[int] = [0]
+        tmp = self._path(DOCUMENTS + ".tmp")
+        with open(tmp, "wb") as f:
+            for doc in documents:
+                line = json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        os.replace(tmp, self._path(DOCUMENTS))
+        if len(offsets) - 1 != embeddings.shape[0]:
+            raise ValueError(f"文档数 {len(offsets) - 1} 与向量数 {embeddings.shape[0]} 不一致")
+
+        tmp = self._path(OFFSETS + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64), allow_pickle=False)
+        os.replace(tmp, self._path(OFFSETS))
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "count": int(embeddings.shape[0]),
+            "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            "dtype": str(embeddings.dtype),
+            "model": model,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp = self._path(MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._path(MANIFEST))
+        return manifest
+
+    def open(self, model: Optional[str] = None):
+        """映射存储，返回 (嵌入矩阵 memmap, DocumentTable, manifest)；不存在或不匹配时返回 None"""
+        manifest = self.manifest()
+        if manifest is None or manifest.get("format") != FORMAT_VERSION:
+            return None
+        if model is not None and manifest.get("model") and manifest["model"] != model:
+            print(f"⚠️ 向量存储由模型 {manifest['model']} 生成，与当前模型 {model} 不一致，需重建")
+            return None
+        embeddings = np.load(self._path(EMBEDDINGS), mmap_mode="r", allow_pickle=False)
+        offsets = np.load(self._path(OFFSETS), mmap_mode="r", allow_pickle=False)
+        if embeddings.shape[0] != manifest["count"] or len(offsets) != manifest["count"] + 1:
+            print(f"⚠️ 向量存储文件不完整: {self.store_dir}")
+            return None
+        return embeddings, DocumentTable(self._path(DOCUMENTS), offsets), manifest
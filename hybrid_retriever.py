@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+混合检索：BM25 关键词 + 向量语义，倒数排名融合（RRF）
+纯向量检索会漏掉 "TeleChat"、"星辰" 这类精确产品名，纯关键词检索又接不住换了说法的问题。
+HybridRetriever 把同一查询同时交给多个检索器，再按倒数排名融合：
+
+    score(片段) = Σ 检索器权重 / (k + 该片段在此检索器中的名次)
+
+只看名次不看原始分数，BM25 得分与余弦相似度无需换算到同一尺度；两路都靠前的片段排在最前。
+
+- 并发：每个检索器有自己的线程池（numpy / torch 计算时释放 GIL），
+  一路卡住（如嵌入模型冷启动）不会让另一路排队；
+- 延迟预算：预算内完成的检索器参与融合，超时的被跳过（其线程跑完后结果丢弃），
+  例如向量检索来不及时只返回 BM25 的结果，而不是让语音回复等待；全部超时时返回空列表；
+  search_with_outcome 另外报告各检索器是否完成，调用方可据此不缓存部分融合的结果；
+- 候选深度：每个检索器取 top_k × depth 个候选参与融合，融合后截取 top_k；
+- 去重：片段以 key(结果) 识别，默认取 (来源, 内容)，两个检索器建在同一批片段上时同一片段得到同一个键。
+
+延迟与命中率的取舍见 benchmark_hybrid_search.py。
+
+环境变量：
+    DRAGON_KB_HYBRID_BUDGET_MS   单次检索的延迟预算（毫秒，默认 300；0 表示不限）
+    DRAGON_KB_HYBRID_RRF_K       RRF 平滑常数 k（默认 60）
+    DRAGON_KB_HYBRID_DEPTH       每个检索器的候选数倍数（默认 4）
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 检索器：(查询, 候选数) -> 按相关度降序的结果字典列表
+Retriever = Callable[[str, int], List[Dict[str, Any]]]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def result_key(result: Dict[str, Any]) -> Hashable:
+    """默认片段标识：(来源, 内容)"""
+    return result.get("source", ""), result.get("content", "")
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Hashable]], k: float = 60.0,
+                           weights: Optional[Dict[str, float]] = None) -> List[Tuple[Hashable, float]]:
+    """各检索器的排名（键列表，名次从 1 开始）-> 按 RRF 得分降序的 (键, 得分)；同分时先出现的在前"""
+    scores: Dict[Hashable, float] = {}
+    for name, keys in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, key in enumerate(keys, 1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever:
+    """并发执行多个检索器，在延迟预算内按倒数排名融合"""
+
+    def __init__(self, retrievers: Dict[str, Retriever], budget_ms: Optional[float] = None,
+                 rrf_k: Optional[float] = None, depth: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None,
+                 key: Callable[[Dict[str, Any]], Hashable] = result_key):
+        self.retrievers = dict(retrievers)
+        self.budget_ms = budget_ms if budget_ms is not None else _env_float("DRAGON_KB_HYBRID_BUDGET_MS", 300.0)
+        self.rrf_k = rrf_k if rrf_k is not None else _env_float("DRAGON_KB_HYBRID_RRF_K", 60.0)
+        self.depth = max(1, depth or _env_int("DRAGON_KB_HYBRID_DEPTH", 4))
+        self.weights = weights or {}
+        self.key = key
+        self._pools = {name: ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"kb-{name}")
+                       for name in self.retrievers}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            "queries": 0,
+            "partial": 0,
+            "seconds": 0.0,
+            "completed": {name: 0 for name in self.retrievers},
+            "timeouts": {name: 0 for name in self.retrievers},
+            "errors": {name: 0 for name in self.retrievers},
+        }
+
+    def search(self, query: str, top_k: int = 5, budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """融合后的 Top-K；每条结果附带 rrf_score 与 retrievers（检索器 -> 名次）"""
+        return self.search_with_outcome(query, top_k, budget_ms)[0]
+
+    def search_with_outcome(self, query: str, top_k: int = 5, budget_ms: Optional[float] = None
+                            ) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+        """同 search，另返回各检索器结局 {"completed": [...], "timeouts": [...], "errors": [...]}；
+        timeouts 或 errors 非空即为部分融合"""
+        outcome: Dict[str, List[str]] = {"completed": [], "timeouts": [], "errors": []}
+        if not query.strip():
+            return [], outcome
+        start = time.perf_counter()
+        budget = self.budget_ms if budget_ms is None else budget_ms
+        candidates = top_k * self.depth
+        futures = {name: self._pools[name].submit(retriever, query, candidates)
+                   for name, retriever in self.retrievers.items()}
+        done, _ = wait(futures.values(), timeout=budget / 1000 if budget > 0 else None)
+
+        rankings: Dict[str, List[Hashable]] = {}
+        merged: Dict[Hashable, Dict[str, Any]] = {}
+        for name, future in futures.items():
+            if future not in done:
+                future.cancel()  # 尚未开始的直接取消；已在运行的跑完后结果丢弃
+                outcome["timeouts"].append(name)
+                continue
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.warning(f"检索器 {name} 失败: {e}")
+                outcome["errors"].append(name)
+                continue
+            outcome["completed"].append(name)
+            keys = rankings.setdefault(name, [])
+            for result in results:
+                key = self.key(result)
+                if key in merged and name in merged[key]["retrievers"]:
+                    continue
+                entry = merged.setdefault(key, {**result, "retrievers": {}})
+                for field, value in result.items():
+                    entry.setdefault(field, value)
+                entry["retrievers"][name] = len(keys) + 1
+                keys.append(key)
+
+        fused = [dict(merged[key], rrf_score=score)
+                 for key, score in reciprocal_rank_fusion(rankings, self.rrf_k, self.weights)[:top_k]]
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["partial"] += int(len(outcome["completed"]) < len(futures))
+            self.stats["seconds"] += time.perf_counter() - start
+            for kind, names in outcome.items():
+                for name in names:
+                    self.stats[kind][name] += 1
+        if outcome["timeouts"]:
+            logger.info(f"混合检索超出 {budget:.0f}ms 预算，跳过: {', '.join(outcome['timeouts'])}")
+        return fused, outcome
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            queries = self.stats["queries"]
+            return {
+                "retrievers": list(self.retrievers),
+                "budget_ms": self.budget_ms,
+                "rrf_k": self.rrf_k,
+                "depth": self.depth,
+                "queries": queries,
+                "partial": self.stats["partial"],
+                "avg_ms": round(self.stats["seconds"] * 1000 / queries, 2) if queries else None,
+                "completed": dict(self.stats["completed"]),
+                "timeouts": dict(self.stats["timeouts"]),
+                "errors": dict(self.stats["errors"]),
+            }
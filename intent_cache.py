@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+意图判定 LRU 缓存
+展厅游客反复说同一小批话（"洗手间在哪"、"你是谁"、"前进"），每句都要重新经过命令匹配、
+知识库意图分类与固定回复（身份/归属）匹配。缓存以原文为键保存合并后的判定结果：
+
+- 以原文为键：判定中的位置与命中文本（start/end/matched_text）只对原文成立，
+  大小写、全角或标点不同的变体各自计算，不复用彼此的判定；
+- 有界 LRU，超出容量淘汰最久未用的条目；
+- 版本号（命令表、知识库关键词表、固定回复表）变化时整体失效；可选定期触发重新加载检查。
+
+环境变量：
+    DRAGON_INTENT_CACHE_SIZE         缓存条目上限（默认 512；0 表示关闭缓存）
+    DRAGON_INTENT_CACHE_RELOAD_SEC   检查命令表/关键词表文件变化的间隔（秒，默认 5.0；0 表示不检查）
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class IntentDecision:
+    """一句话的合并判定：机器人命令、知识库意图、固定回复（身份/归属等）"""
+    text: str
+    command: Optional[Any] = None
+    knowledge: Optional[Any] = None
+    canned: Optional[Any] = None
+
+
+class IntentCache:
+    """以原文为键的有界 LRU 判定缓存
+
+    compute(text) 以原文计算判定，结果按同一原文缓存；version() 返回当前规则版本（变化即清空缓存）；
+    refresh() 检查规则文件是否变化并按需重新加载，至多每 refresh_sec 秒调用一次。
+    """
+
+    def __init__(self, compute: Callable[[str], Any],
+                 version: Optional[Callable[[], Hashable]] = None,
+                 refresh: Optional[Callable[[], Any]] = None,
+                 maxsize: Optional[int] = None,
+                 refresh_sec: Optional[float] = None):
+        self.compute = compute
+        self.version = version
+        self.refresh = refresh
+        self.maxsize = maxsize if maxsize is not None else _env_int("DRAGON_INTENT_CACHE_SIZE", 512)
+        self.refresh_sec = refresh_sec if refresh_sec is not None else _env_float("DRAGON_INTENT_CACHE_RELOAD_SEC", 5.0)
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._version = version() if version else None
+        self._next_refresh = time.monotonic() + self.refresh_sec
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self) -> None:
+        if self.refresh is not None and self.refresh_sec > 0:
+            now = time.monotonic()
+            if now >= self._next_refresh:
+                self._next_refresh = now + self.refresh_sec
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ 意图规则重新加载失败: {e}")
+        if self.version is None:
+            return
+        current = self.version()
+        if current != self._version:
+            with self._lock:
+                if current != self._version:
+                    self._entries.clear()
+                    self._version = current
+                    self.stats["invalidations"] += 1
+
+    def get(self, text: str) -> Any:
+        """返回该文本的判定（命中缓存或计算后写入）"""
+        key = text or ""
+        if self.maxsize <= 0:
+            self.stats["misses"] += 1
+            return self.compute(text)
+        self._check_version()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+        # 计算不持锁：判定可能较慢（拼音音近回退），重复计算同一键无副作用
+        value = self.compute(text)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self._entries), maxsize=self.maxsize,
+                        hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else None)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+共享语音意图引擎
+所有语音命令前端（对话会话机器人控制器、键盘映射处理器、简化处理器及 WSL 演示、
+utils/agent* 本地兜底代理）共用同一张声明式命令表 voice_commands.json：
+
+    {
+        "default_speed": 0.5,
+        "speed_words": {"慢": 0.3, ...},          # 速度词（按表内顺序取第一个出现的）
+        "corrections": {"钱进": "前进", ...},     # 常见识别错误（错误写法 -> 正确写法）
+        "intents": {
+            "move_forward": {
+                "phrases": [...],                 # 命令短语（最长匹配优先）
+                "sequences": [[["抬起", "举起"], ["左手", "左臂"]]],  # 按序出现、允许间隔的短语组
+                "keywords": ["前", "进"],         # 单字兜底关键词（仅 keywords=True 时参与）
+                "cmd_id": "cmd_1",                # 对话会话命令事件ID
+                "twist": [0.5, 0.0],              # ROS Twist (linear.x, angular.z)
+                "frontends": ["dialog", ...],     # 处理该意图的前端（dialog/ros/keyboard/simple/agent）
+                ...                               # 其余字段原样放入 IntentSpec.params
+            }
+        }
+    }
+
+默认按"短语 > 关键词、精确 > 纠错、最长、最早"选出意图（对话会话与 ROS 前端）；键盘映射、简化处理器
+与本地兜底代理以 ordered=True 调用，沿用旧实现"按表顺序第一个命中的意图"，因此意图在表中的顺序即其优先级。
+
+短语、纠错变体、序列片段、关键词与速度词编译为 Aho-Corasick 自动机（每个前端的意图集合
+各编译一份并缓存），每句话只扫描一次，开销与命令表规模无关；可选拼音音近回退（phonetic_matcher）。
+命令表路径可由环境变量 DRAGON_VOICE_COMMANDS_FILE 覆盖。
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Any, Collection, Dict, FrozenSet, List, Optional, Tuple
+
+from command_matcher import AhoCorasickAutomaton
+from phonetic_matcher import PhoneticIndex, PhoneticMatch, phonetic_acceptable
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COMMANDS_FILE = os.path.join(BASE_DIR, "voice_commands.json")
+
+_SPEC_FIELDS = ("phrases", "sequences", "keywords", "cmd_id", "twist", "frontends")
+
+# 自动机输出的种类
+_KIND_PHRASE = 0
+_KIND_PART = 1
+_KIND_KEYWORD = 2
+_KIND_SPEED = 3
+
+
+@dataclass(frozen=True, eq=False)
+class IntentSpec:
+    """命令表中的一个意图"""
+    name: str
+    phrases: Tuple[str, ...] = ()
+    sequences: Tuple[Tuple[Tuple[str, ...], ...], ...] = ()
+    keywords: Tuple[str, ...] = ()
+    cmd_id: Optional[str] = None
+    twist: Optional[Tuple[float, float]] = None
+    frontends: FrozenSet[str] = frozenset()
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.params.get(key, default)
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    """一次意图命中"""
+    intent: str
+    phrase: str          # 命中的规范短语（序列命中时为各片段拼接，关键词命中时为关键词）
+    cmd_id: Optional[str]
+    start: int
+    end: int
+    matched_text: str
+    corrected: bool = False
+    confidence: float = 1.0
+    phonetic: bool = False
+    keyword: bool = False
+    speed: Optional[float] = None
+    spec: Optional[IntentSpec] = field(default=None, compare=False, repr=False)
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    @property
+    def twist(self) -> Optional[Tuple[float, float]]:
+        return self.spec.twist if self.spec else None
+
+
+class IntentEngine:
+    """由声明式命令表编译的意图引擎"""
+
+    # 纠错命中的置信度（精确命中为 1.0）
+    CORRECTED_CONFIDENCE = 0.8
+    def __init__(self, commands_file: Optional[str] = None):
+        if commands_file is None:
+            commands_file = os.environ.get("DRAGON_VOICE_COMMANDS_FILE", DEFAULT_COMMANDS_FILE)
+        self.commands_file = commands_file
+        self.version = 0
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    # ------------------------------------------------------------------
+    # 加载与编译
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _parse_intents(raw: Dict[str, Any]) -> Dict[str, IntentSpec]:
+        intents = {}
+        for name, entry in raw.items():
+            twist = entry.get("twist")
+            intents[name] = IntentSpec(
+                name=name,
+                phrases=tuple(entry.get("phrases", ())),
+                sequences=tuple(tuple(tuple(part) for part in seq) for seq in entry.get("sequences", ())),
+                keywords=tuple(entry.get("keywords", ())),
+                cmd_id=entry.get("cmd_id"),
+                twist=(float(twist[0]), float(twist[1])) if twist else None,
+                frontends=frozenset(entry.get("frontends", ())),
+                params={k: v for k, v in entry.items() if k not in _SPEC_FIELDS},
+            )
+        return intents
+
+    def reload(self, force: bool = False) -> bool:
+        """重新编译命令表；文件未变化且非强制时跳过。返回是否重新编译。"""
+        try:
+            mtime = os.path.getmtime(self.commands_file)
+        except OSError:
+            mtime = None
+        if not force and mtime == self._file_mtime:
+            return False
+        with open(self.commands_file, "r", encoding="utf-8") as f:
+            table = json.load(f)
+
+        intents = self._parse_intents(table.get("intents", {}))
+        corrections = dict(table.get("corrections", {}))
+        speed_words = dict(table.get("speed_words", {}))
+
+        phonetic = PhoneticIndex()
+        for spec in intents.values():
+            for phrase in spec.phrases:
+                phonetic.add(phrase, spec.name)
+
+        with self._lock:
+            self.table = table
+            self.intents = intents
+            self.order = {name: index for index, name in enumerate(intents)}
+            self.corrections = corrections
+            self.speed_words = speed_words
+            self.default_speed = float(table.get("default_speed", 0.5))
+            self._automata = {}
+            self.automaton = self._compile(None)
+            self.phonetic_index = phonetic if phonetic.available else None
+            self._file_mtime = mtime
+            self.version += 1
+        return True
+
+    def _compile(self, names: Optional[FrozenSet[str]]) -> AhoCorasickAutomaton:
+        """把一组意图（None 为全部）的短语、纠错变体、序列片段、关键词与速度词编译为自动机"""
+        specs = [spec for name, spec in self.intents.items() if names is None or name in names]
+        automaton = AhoCorasickAutomaton()
+        phrases = set()
+        for spec in specs:
+            for phrase in spec.phrases:
+                phrases.add(phrase)
+                automaton.add(phrase.lower(), (_KIND_PHRASE, spec.name, phrase, False))
+            for seq_index, seq in enumerate(spec.sequences):
+                for part_index, options in enumerate(seq):
+                    for option in options:
+                        automaton.add(option.lower(), (_KIND_PART, spec.name, seq_index, part_index))
+            for keyword in spec.keywords:
+                automaton.add(keyword.lower(), (_KIND_KEYWORD, spec.name, keyword, False))
+        # 纠错表编译期展开为变体短语：纠错与精确匹配在同一次扫描中完成
+        for wrong, right in self.corrections.items():
+            for spec in specs:
+                for phrase in spec.phrases:
+                    if right in phrase:
+                        variant = phrase.replace(right, wrong)
+                        if variant not in phrases:
+                            automaton.add(variant.lower(), (_KIND_PHRASE, spec.name, phrase, True))
+        for order, (word, value) in enumerate(self.speed_words.items()):
+            automaton.add(word.lower(), (_KIND_SPEED, order, float(value), word))
+        automaton.build()
+        self._automata[names] = automaton
+        return automaton
+
+    def _automaton_for(self, intents: Optional[Collection[str]]) -> AhoCorasickAutomaton:
+        """按候选意图集合取专用自动机（首次使用时编译并缓存），前端只扫描自己的意图"""
+        if intents is None:
+            return self.automaton
+        if not isinstance(intents, frozenset):
+            intents = frozenset(intents)
+        automaton = self._automata.get(intents)
+        if automaton is None:
+            with self._lock:
+                automaton = self._automata.get(intents)
+                if automaton is None:
+                    automaton = self._compile(intents)
+        return automaton
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def intents_for(self, frontend: str) -> FrozenSet[str]:
+        """某前端处理的意图名集合"""
+        return frozenset(name for name, spec in self.intents.items() if frontend in spec.frontends)
+
+    def phrase_map(self, attr: str = "cmd_id", frontend: Optional[str] = None) -> Dict[str, Any]:
+        """短语 -> 意图属性（cmd_id / twist / 意图名等），供仍按短语查表的旧接口使用"""
+        result = {}
+        for spec in self.intents.values():
+            if frontend is not None and frontend not in spec.frontends:
+                continue
+            value = spec.name if attr == "intent" else getattr(spec, attr, None)
+            if value is None:
+                continue
+            for phrase in spec.phrases:
+                result.setdefault(phrase, value)
+        return result
+
+    def _scan(self, text: str, intents: Optional[Collection[str]], keywords: bool):
+        """单次扫描，返回原始命中 (排序键, 意图名, 短语, 纠错, 关键词)、序列片段与速度"""
+        scan = text.lower()
+        hits = []
+        parts: Dict[Tuple[str, int], Dict[int, List[Tuple[int, int, str]]]] = {}
+        speed_hit: Optional[Tuple[int, float]] = None
+        for start, end, _pattern, value in self._automaton_for(intents).iter_matches(scan):
+            kind = value[0]
+            if kind == _KIND_SPEED:
+                if speed_hit is None or value[1] < speed_hit[0]:
+                    speed_hit = (value[1], value[2])
+            elif kind == _KIND_PART:
+                parts.setdefault((value[1], value[2]), {}).setdefault(value[3], []).append(
+                    (start, end, text[start:end]))
+            elif kind == _KIND_PHRASE or keywords:
+                keyword = kind == _KIND_KEYWORD
+                hits.append(((keyword, value[3], start - end, start), end, value[1], value[2]))
+        speed = speed_hit[1] if speed_hit else None
+        return hits, parts, speed
+
+    def _build(self, text: str, hit) -> IntentMatch:
+        (keyword, corrected, _length, start), end, name, phrase = hit
+        spec = self.intents[name]
+        return IntentMatch(
+            intent=name,
+            phrase=phrase,
+            cmd_id=spec.cmd_id,
+            start=start,
+            end=end,
+            matched_text=text[start:end],
+            corrected=corrected,
+            confidence=self.CORRECTED_CONFIDENCE if corrected else 1.0,
+            keyword=keyword,
+            spec=spec,
+        )
+
+    def _sequences(self, text: str, parts) -> List[IntentMatch]:
+        matches = []
+        for (name, seq_index), hits in parts.items():
+            match = self._match_sequence(text, self.intents[name], seq_index, hits)
+            if match is not None:
+                matches.append(match)
+        return matches
+
+    def find_all(self, text: str, intents: Optional[Collection[str]] = None,
+                 keywords: bool = False) -> Tuple[List[IntentMatch], Optional[float]]:
+        """单次扫描：返回全部命中（短语/纠错/序列/可选关键词）与识别到的速度"""
+        if not text:
+            return [], None
+        hits, parts, speed = self._scan(text, intents, keywords)
+        matches = [self._build(text, hit) for hit in hits]
+        matches.extend(self._sequences(text, parts))
+        return matches, speed
+
+    @staticmethod
+    def _match_sequence(text: str, spec: IntentSpec, seq_index: int,
+                        hits: Dict[int, List[Tuple[int, int, str]]]) -> Optional[IntentMatch]:
+        """各片段按序出现（可有间隔），取最早完成的一组"""
+        seq = spec.sequences[seq_index]
+        if len(hits) < len(seq):
+            return None
+        position, first_start, pieces = 0, None, []
+        for part_index in range(len(seq)):
+            candidates = [h for h in hits.get(part_index, ()) if h[0] >= position]
+            if not candidates:
+                return None
+            start, end, piece = min(candidates, key=lambda h: (h[1], h[0]))
+            if first_start is None:
+                first_start = start
+            position = end
+            pieces.append(piece)
+        return IntentMatch(
+            intent=spec.name,
+            phrase="".join(pieces),
+            cmd_id=spec.cmd_id,
+            start=first_start,
+            end=position,
+            matched_text=text[first_start:position],
+            spec=spec,
+        )
+
+    def match(self, text: str, intents: Optional[Collection[str]] = None,
+              keywords: bool = False, phonetic: bool = False,
+              ordered: bool = False) -> Optional[IntentMatch]:
+        """选出最终意图：短语优先于关键词，精确优先于纠错，其次最长匹配，再次最早出现。
+
+        intents 限定候选意图（通常为 intents_for(前端)）；phonetic=True 时未命中再走拼音音近索引，
+        只采纳满足 phonetic_acceptable() 的音近命中。
+        ordered=True 时同为短语（或同为关键词）的命中按意图在命令表中的先后取胜，
+        与按表顺序逐条 `in` 判断的旧前端（键盘映射、简化处理器、本地兜底代理）一致。
+        """
+        if not text:
+            return None
+        hits, parts, speed = self._scan(text, intents, keywords)
+        if ordered:
+            order = self.order
+            rank = lambda keyword, name, corrected, length, start: \
+                (keyword, order[name], corrected, -length, start)
+        else:
+            rank = lambda keyword, name, corrected, length, start: (keyword, corrected, -length, start)
+        # 先比较原始命中的排序键，只为胜出者构造 IntentMatch
+        best_hit = min(hits, key=lambda h: rank(h[0][0], h[2], h[0][1], -h[0][2], h[0][3])) if hits else None
+        best = self._build(text, best_hit) if best_hit else None
+        if parts:
+            for m in self._sequences(text, parts):
+                if best is None or rank(m.keyword, m.intent, m.corrected, m.length, m.start) < \
+                        rank(best.keyword, best.intent, best.corrected, best.length, best.start):
+                    best = m
+        if best is None and phonetic:
+            best = self.match_phonetic(text, intents, strict=True)
+        if best is None:
+            return None
+        if speed is not None:
+            best = replace(best, speed=speed)
+        return best
+
+    def match_phonetic(self, text: str, intents: Optional[Collection[str]] = None,
+                       strict: bool = False) -> Optional[IntentMatch]:
+        """拼音音近匹配（不查自动机）；未安装 pypinyin 时返回 None。strict=True 时只返回可采纳的命中"""
+        index = self.phonetic_index
+        if index is None:
+            return None
+        accept = (lambda value: value in intents) if intents is not None else None
+        hit = index.best(text, accept=accept)
+        if hit is None or (strict and not self.phonetic_acceptable(text, hit)):
+            return None
+        spec = self.intents[hit.value]
+        return IntentMatch(
+            intent=spec.name,
+            phrase=hit.phrase,
+            cmd_id=spec.cmd_id,
+            start=hit.start,
+            end=hit.end,
+            matched_text=hit.matched_text,
+            corrected=True,
+            confidence=min(hit.confidence, self.CORRECTED_CONFIDENCE),
+            phonetic=True,
+            spec=spec,
+        )
+
+    def phonetic_acceptable(self, text: str, hit: PhoneticMatch) -> bool:
+        """音近命中是否可当作命令（phonetic_matcher.phonetic_acceptable）"""
+        return phonetic_acceptable(text, hit)
+
+    def speed(self, text: str) -> float:
+        """文本中的速度词（命令表顺序优先），未出现时返回默认速度"""
+        speed = self._scan(text, (), False)[2] if text else None
+        return speed if speed is not None else self.default_speed
+
+
+_shared_engine: Optional[IntentEngine] = None
+_shared_lock = threading.Lock()
+
+
+def get_intent_engine() -> IntentEngine:
+    """进程内共享的意图引擎（首次调用时加载命令表）"""
+    global _shared_engine
+    if _shared_engine is None:
+        with _shared_lock:
+            if _shared_engine is None:
+                _shared_engine = IntentEngine()
+    return _shared_engine
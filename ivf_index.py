@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+IVF-flat 近似最近邻索引（纯 NumPy）
+整本产品手册、法规导入后知识库可达数十万片段，逐行扫描（DenseVectorIndex）的耗时随语料线性增长。
+IVF-flat 先用球面 k-means 把归一化向量聚成 nlist 个簇（倒排列表），查询时只与质心比较，
+再在最近的 nprobe 个簇内精确打分：
+
+- 向量本身不复制：直接在 DenseVectorIndex 的矩阵（含内存映射）上按行号取候选；
+- 倒排列表以 CSR 形式保存（按簇排序的行号 + 偏移数组），只占每行 4~8 字节；
+- 新追加的行在下次查询前分配到最近的质心，墓碑行与元数据过滤照常生效；
+  过滤后剩余行很少时直接精确扫描这些行（比探查更快，也不会漏召回）；
+- 召回/速度由 nprobe 调节（越大召回越高、越慢），nlist 缺省取 √片段数；
+- 质心与分簇结果保存为存储目录下的 ivf.npz，加载时校验行数与维度，不匹配则重新训练。
+
+召回率@K 与耗时的取舍见 benchmark_ann_search.py。
+
+环境变量：
+    DRAGON_KB_ANN            检索方式：auto（片段数达到阈值时启用 IVF，默认）/ ivf / exact
+    DRAGON_KB_ANN_MIN_ROWS   auto 模式启用 IVF 的片段数阈值（默认 50000）
+    DRAGON_KB_IVF_NLIST      倒排列表数（默认 0，即 √片段数）
+    DRAGON_KB_IVF_NPROBE     每次查询探查的列表数（默认 16）
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from vector_index import BLOCK_ROWS, DenseVectorIndex, SearchHits, normalize_rows, top_k_indices
+
+IVF_FILE = "ivf.npz"
+
+# 训练 k-means 时每个质心的采样行数（faiss 的经验值为 39~256）
+TRAIN_ROWS_PER_LIST = 40
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def ann_mode() -> str:
+    mode = os.environ.get("DRAGON_KB_ANN", "auto").strip().lower()
+    return mode if mode in ("auto", "ivf", "exact") else "auto"
+
+
+def use_ann(rows: int) -> bool:
+    """按 DRAGON_KB_ANN 与片段数决定是否启用 IVF"""
+    mode = ann_mode()
+    if mode == "auto":
+        return rows >= _env_int("DRAGON_KB_ANN_MIN_ROWS", 50000)
+    return mode == "ivf" and rows > 0
+
+
+def auto_nlist(rows: int) -> int:
+    return max(1, min(rows, int(round(np.sqrt(rows)))))
+
+
+def assign_rows(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """每行最近（余弦最大）的质心编号；按块计算，float16 矩阵逐块转为 float32"""
+    labels = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(matrix: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """在采样行上训练球面 k-means，返回归一化质心 (nlist, 维度)"""
+    rng = np.random.default_rng(seed)
+    rows = matrix.shape[0]
+    nlist = min(nlist, rows)
+    sample_size = min(rows, nlist * TRAIN_ROWS_PER_LIST)
+    sample = np.sort(rng.choice(rows, sample_size, replace=False))
+    x = np.asarray(matrix[sample], dtype=np.float32)
+    centroids = x[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_rows(x, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        # 空簇用随机样本重新播种，避免质心数实际减少
+        empty = np.flatnonzero(~nonempty)
+        if empty.size:
+            sums[empty] = x[rng.choice(sample_size, empty.size, replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFFlatIndex:
+    """DenseVectorIndex 之上的 IVF-flat 近似检索（search() 与 DenseVectorIndex.search 接口一致）"""
+
+    def __init__(self, index: DenseVectorIndex, nlist: Optional[int] = None, nprobe: Optional[int] = None):
+        self.index = index
+        self.nlist = nlist or _env_int("DRAGON_KB_IVF_NLIST", 0) or auto_nlist(len(index))
+        self.nprobe = nprobe or _env_int("DRAGON_KB_IVF_NPROBE", 16)
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self.train_seconds = 0.0
+        self._assign = np.empty(0, dtype=np.int32)
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, iterations: int = 10, seed: int = 0) -> None:
+        """训练质心并为全部行分簇"""
+        start = time.perf_counter()
+        matrix = self.index.matrix
+        self.nlist = min(self.nlist, len(self.index))
+        self.centroids = train_centroids(matrix, self.nlist, iterations, seed)
+        self._assign = assign_rows(matrix, self.centroids)
+        self._order = None
+        self.trained_rows = len(self.index)
+        self.train_seconds = time.perf_counter() - start
+
+    def stale(self) -> bool:
+        """语料规模已是训练时的两倍以上：质心不再有代表性，应重新训练"""
+        return not self.trained or len(self.index) > 2 * self.trained_rows
+
+    def take(self, keep: np.ndarray) -> None:
+        """压缩后只保留 keep 中的行（与 DenseVectorIndex.compact() 的返回值对应）"""
+        self._assign = self._assign[keep]
+        self._order = None
+
+    def _lists(self):
+        """分配新追加的行，并按需重建 CSR 倒排列表"""
+        size = len(self.index)
+        if len(self._assign) < size:
+            fresh = assign_rows(self.index.matrix[len(self._assign):size], self.centroids)
+            self._assign = np.concatenate([self._assign, fresh])
+            self._order = None
+        if self._order is None:
+            self._order = np.argsort(self._assign, kind="stable")
+            self._offsets = np.concatenate([[0], np.cumsum(np.bincount(self._assign, minlength=self.nlist))])
+        return self._order, self._offsets
+
+    def search(self, queries, top_k: int = 5, threshold: Optional[float] = None,
+               mask: Optional[np.ndarray] = None, nprobe: Optional[int] = None) -> List[SearchHits]:
+        """每条查询在最近的 nprobe 个簇内精确打分，返回 (下标数组, 得分数组)"""
+        q = normalize_rows(queries)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if not self.index.live_count:
+            return [empty for _ in range(q.shape[0])]
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        selected = self.index.selection(mask)
+        # 过滤后剩余行不多于一次探查的预期候选数：精确扫描更快且不漏召回
+        if mask is not None and selected.sum() <= len(self.index) * nprobe / self.nlist:
+            return self.index.search(q, top_k, threshold, mask=mask)
+
+        order, offsets = self._lists()
+        probes = top_k_indices(q @ self.centroids.T, nprobe)
+        hits = []
+        for vector, lists in zip(q, probes):
+            rows = np.concatenate([order[offsets[l]:offsets[l + 1]] for l in lists])
+            if selected is not None:
+                rows = rows[selected[rows]]
+            if rows.size == 0:
+                hits.append(empty)
+                continue
+            scores = self.index.scores(vector, rows)[0]
+            idx = top_k_indices(scores, top_k)
+            values = scores[idx]
+            keep = values > (threshold if threshold is not None else -np.inf)
+            hits.append((rows[idx][keep], values[keep]))
+        return hits
+
+    def save(self, path: str) -> None:
+        """写入质心与分簇结果（临时文件 + 原子替换）"""
+        self._lists()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, assign=self._assign,
+                     nprobe=np.int64(self.nprobe), trained_rows=np.int64(self.trained_rows))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, index: DenseVectorIndex) -> Optional["IVFFlatIndex"]:
+        """加载已保存的 IVF；文件不存在或与索引行数/维度不一致时返回 None"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                centroids, assign = data["centroids"], data["assign"]
+                nprobe, trained_rows = int(data["nprobe"]), int(data["trained_rows"])
+        except (OSError, KeyError, ValueError):
+            return None
+        if len(assign) != len(index) or centroids.shape[1] != index.dim:
+            print(f"⚠️ IVF 索引与向量存储不一致，需重新训练: {path}")
+            return None
+        ivf = cls(index, nlist=centroids.shape[0], nprobe=_env_int("DRAGON_KB_IVF_NPROBE", nprobe))
+        ivf.centroids = centroids
+        ivf._assign = assign
+        ivf.trained_rows = trained_rows
+        return ivf
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "ivf_flat",
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "trained_rows": self.trained_rows,
+            "train_seconds": round(self.train_seconds, 2),
+        }
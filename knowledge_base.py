@@ -12,6 +12,10 @@ from typing import List, Dict, Tuple, Optional
 from datetime import datetime
 import logging
 
+import model_warmup
+import query_cache
+from bm25_index import BM25Index, fingerprint as bm25_fingerprint
+
 # 文档处理相关
 import PyPDF2
 import docx
@@ -22,7 +26,10 @@ import pandas as pd
 try:
     from sentence_transformers import SentenceTransformer
     import numpy as np
-    from sklearn.metrics.pairwise import cosine_similarity
+    from vector_index import DenseVectorIndex, MetadataColumns, compact_ratio
+    from embedding_store import EmbeddingStore
+    from embedding_pipeline import EmbeddingPipeline
+    from ivf_index import IVF_FILE, IVFFlatIndex, use_ann
     VECTOR_AVAILABLE = True
 except ImportError:
     VECTOR_AVAILABLE = False
@@ -32,6 +39,9 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 可用于过滤检索的片段元数据字段
+FILTER_FIELDS = ('file_type', 'category', 'source')
+
 class DocumentProcessor:
     """文档处理器 - 支持多种格式"""
     
@@ -192,93 +202,315 @@ class TextSplitter:
         return chunks
 
 class VectorSearchEngine:
-    """向量搜索引擎"""
-    
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    """向量搜索引擎
+
+    嵌入在建索引时一次性归一化并存为连续矩阵（见 vector_index.DenseVectorIndex），
+    查询只需一次矩阵-向量乘积 + argpartition 取 Top-K；search_batch() 合并多条查询。
+    add_documents()/remove_documents() 按片段ID增量维护：只编码新增片段，删除打墓碑并定期压缩。
+    filters（file_type / category / source，可组合）转为行掩码，只在匹配的行上做矩阵乘积。
+    查询嵌入与 Top-K 结果走共享的 query_cache（索引内容变化时递增版本，旧结果不再命中）。
+    片段数达到 DRAGON_KB_ANN_MIN_ROWS（或 DRAGON_KB_ANN=ivf）时改用 IVF-flat 近似检索（见 ivf_index.py）。
+    入库编码走 EmbeddingPipeline（按长度分批，可选多进程，见 embedding_pipeline.py）。
+    模型在后台线程加载（见 model_warmup.py，ready 为就绪信号）；未就绪时查询在 DRAGON_KB_READY_WAIT_MS 内
+    等待，超时改用同一批片段上的 BM25 关键词检索。
+    """
+    
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', dtype: str = None):
         if not VECTOR_AVAILABLE:
             raise ImportError("向量搜索依赖未安装")
         
-        self.model = SentenceTransformer(model_name)
-        self.embeddings = None
+        self.model_name = model_name
+        self._model = model_warmup.shared(("sentence_transformers", model_name), f"嵌入模型 {model_name}",
+                                          lambda: SentenceTransformer(model_name))
+        self.ready = self._model.future
+        self.pipeline = EmbeddingPipeline(
+            model_name, lambda texts: self.model.encode(texts, batch_size=len(texts), show_progress_bar=False))
+        self.index = DenseVectorIndex(dtype=dtype)
         self.documents = []
+        self._rows = None  # 片段ID -> 行号（首次增量修改时建立）
+        self._columns = None  # 过滤字段编码列（首次过滤检索时建立）
+        self.cache_scope = query_cache.new_scope("vector")  # 由 LocalKnowledgeBase 绑定为知识库目录
+        self.ann = None  # IVF 近似检索（语料较大时启用）
+        self._keyword = None  # 模型预热期间的关键词回退（按知识库版本重建）
+        self._keyword_version = None
+    
+    @property
+    def model(self):
+        """嵌入模型（后台加载，未就绪时等待）"""
+        return self._model.get()
+    
+    @property
+    def embeddings(self):
+        """归一化后的嵌入矩阵（未建索引时为 None）"""
+        return self.index.matrix
     
     def build_index(self, documents: List[Dict]):
         """构建向量索引"""
-        self.documents = documents
+        self.documents = list(documents)
+        self._rows = None
+        self._columns = None
         texts = [doc['content'] for doc in documents]
         
         logger.info(f"正在构建 {len(texts)} 个文档的向量索引...")
-        self.embeddings = self.model.encode(texts, show_progress_bar=True)
-        logger.info("向量索引构建完成")
-    
-    def search(self, query: str, top_k: int = 5, threshold: float = 0.3) -> List[Dict]:
-        """向量搜索"""
-        if self.embeddings is None:
-            return []
-        
-        query_embedding = self.model.encode([query])
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-        
-        # 获取最相关的文档
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        
+        self.index.set(self.pipeline.encode(texts, progress=True))
+        self.refresh_ann()
+        query_cache.bump_version(self.cache_scope)
+        logger.info(f"向量索引构建完成 ({self.index.dtype}, {self.index.memory_bytes() / 1e6:.1f}MB)")
+    
+    def refresh_ann(self, store_dir: str = None):
+        """按片段数与 DRAGON_KB_ANN 启用/停用 IVF；store_dir 给定时优先加载已保存的聚类结果"""
+        if not use_ann(self.index.live_count):
+            self.ann = None
+            return
+        if store_dir:
+            self.ann = IVFFlatIndex.load(os.path.join(store_dir, IVF_FILE), self.index)
+            if self.ann is not None:
+                return
+        self.ann = IVFFlatIndex(self.index)
+        logger.info(f"正在训练 IVF 近似检索索引（{len(self.index)} 个片段，{self.ann.nlist} 个簇）...")
+        self.ann.train()
+        logger.info(f"IVF 索引训练完成 ({self.ann.train_seconds:.1f}s, nprobe={self.ann.nprobe})")
+    
+    def _ensure_mutable(self):
+        """首次增量修改时把映射加载的文档表转为列表并建立 片段ID -> 行号"""
+        if not isinstance(self.documents, list):
+            self.documents = list(self.documents)
+        if self._rows is None:
+            self._rows = {doc['id']: row for row, doc in enumerate(self.documents)
+                          if not self.index.is_deleted(row)}
+    
+    def add_documents(self, documents: List[Dict]) -> int:
+        """增量添加片段：只编码新片段并追加到索引；同ID片段先移除旧版本"""
+        if not documents:
+            return 0
+        self._ensure_mutable()
+        self.remove_documents([doc['id'] for doc in documents if doc['id'] in self._rows])
+        vectors = self.pipeline.encode([doc['content'] for doc in documents], progress=len(documents) > 1000)
+        rows = self.index.append(vectors)
+        for row, doc in zip(rows, documents):
+            self.documents.append(doc)
+            self._rows[doc['id']] = row
+        if self._columns is not None:
+            self._columns.append(documents)
+        # 新行在下次查询前分配到已有质心；语料翻倍（或刚达到启用阈值）时重新训练
+        if self.ann is None or self.ann.stale():
+            self.refresh_ann()
+        query_cache.bump_version(self.cache_scope)
+        return len(documents)
+    
+    def remove_documents(self, chunk_ids: List[str]) -> int:
+        """按片段ID移除：打墓碑，墓碑占比超过 DRAGON_KB_COMPACT_RATIO 时压缩"""
+        self._ensure_mutable()
+        rows = [self._rows.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self._rows]
+        removed = self.index.delete(rows)
+        if removed:
+            query_cache.bump_version(self.cache_scope)
+        if self.index.deleted_ratio > compact_ratio():
+            self.compact()
+        return removed
+    
+    def compact(self):
+        """压缩墓碑行（只搬移向量与文档，不重新编码）"""
+        if not self.index.deleted_count:
+            return
+        dropped = self.index.deleted_count
+        keep = self.index.compact()
+        self.documents = [self.documents[row] for row in keep]
+        if self._columns is not None:
+            self._columns.take(keep)
+        if self.ann is not None:
+            self.ann.take(keep)
+        self._rows = {doc['id']: row for row, doc in enumerate(self.documents)}
+        logger.info(f"向量索引已压缩：移除 {dropped} 个已删除片段，剩余 {len(self.documents)} 个")
+    
+    def search(self, query: str, top_k: int = 5, threshold: float = 0.3,
+               filters: Optional[Dict] = None) -> List[Dict]:
+        """向量搜索（相同问题在知识库未变化时直接返回缓存结果）"""
+        if not self._model.wait():
+            return self._keyword_fallback(query, top_k, filters)
+        params = query_cache.params_key(top_k=top_k, threshold=threshold, filters=filters)
+        return query_cache.cached_result(self.cache_scope, self.model_name, query, params,
+                                         lambda: self.search_batch([query], top_k, threshold, filters)[0])
+    
+    def _keyword_fallback(self, query: str, top_k: int, filters: Optional[Dict]) -> List[Dict]:
+        """模型仍在加载：在同一批片段上做 BM25 检索（结果不写入缓存）"""
+        version = query_cache.kb_version(self.cache_scope)
+        if self._keyword is None or self._keyword_version != version:
+            live = [doc for row, doc in enumerate(self.documents) if not self.index.is_deleted(row)]
+            self._keyword = KeywordSearchEngine()
+            self._keyword.build_index(live)
+            self._keyword_version = version
+        logger.info(f"嵌入模型尚未就绪，使用关键词检索: '{query}'")
+        return self._keyword.search(query, top_k, filters=filters)
+    
+    def filter_mask(self, filters: Optional[Dict]):
+        """过滤条件 -> 行掩码（无条件时为 None）"""
+        if not filters:
+            return None
+        if self._columns is None:
+            self._columns = MetadataColumns(FILTER_FIELDS)
+            self._columns.build(self.documents)
+        return self._columns.mask(filters)
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, threshold: float = 0.3,
+                     filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量向量搜索：多条查询一次编码、一次矩阵乘积"""
+        if self.embeddings is None or not queries:
+            return [[] for _ in queries]
+        
+        mask = self.filter_mask(filters)
+        query_embeddings = self.encode_queries(queries)
         results = []
-        for idx in top_indices:
-            if similarities[idx] > threshold:
+        searcher = self.ann if self.ann is not None else self.index
+        for indices, scores in searcher.search(query_embeddings, top_k, threshold, mask=mask):
+            hits = []
+            for idx, score in zip(indices, scores):
                 result = self.documents[idx].copy()
-                result['score'] = float(similarities[idx])
-                results.append(result)
-        
+                result['score'] = float(score)
+                hits.append(result)
+            results.append(hits)
         return results
     
-    def save_index(self, file_path: str):
-        """保存向量索引"""
+    def encode_queries(self, queries: List[str]):
+        """编码查询：命中嵌入缓存的直接复用，其余合并为一次模型调用"""
+        vectors = [query_cache.embedding_cache.get((self.model_name, query_cache.normalize_query(q)))
+                   for q in queries]
+        missing = [i for i, v in enumerate(vectors) if v is query_cache.MISSING]
+        if missing:
+            encoded = self.model.encode([queries[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                query_cache.embedding_cache.put((self.model_name, query_cache.normalize_query(queries[i])), vector)
+        return np.vstack(vectors)
+    
+    def save_index(self, store_dir: str):
+        """保存向量索引（内存映射存储，见 embedding_store.py）"""
         if self.embeddings is not None:
-            with open(file_path, 'wb') as f:
-                pickle.dump({
-                    'embeddings': self.embeddings,
-                    'documents': self.documents
-                }, f)
-    
-    def load_index(self, file_path: str):
-        """加载向量索引"""
+            self.compact()
+            EmbeddingStore(store_dir).save(self.embeddings, self.documents, model=self.model_name)
+            ivf_path = os.path.join(store_dir, IVF_FILE)
+            if self.ann is not None:
+                self.ann.save(ivf_path)
+            elif os.path.exists(ivf_path):
+                os.remove(ivf_path)
+    
+    def load_index(self, store_dir: str):
+        """映射加载向量索引：矩阵与文档表均按需读取，不整体载入内存"""
+        opened = EmbeddingStore(store_dir).open(model=self.model_name)
+        if opened is None:
+            return False
+        embeddings, documents, manifest = opened
+        self.index = DenseVectorIndex(embeddings, dtype=manifest['dtype'], normalized=True)
+        self.documents = documents
+        self._rows = None
+        self._columns = None
+        self.refresh_ann(store_dir)
+        query_cache.bump_version(self.cache_scope)
+        return True
+    
+    def load_legacy_index(self, file_path: str):
+        """加载旧版 pickle 索引（仅用于迁移本程序此前写入的 vector_index.pkl）"""
         if os.path.exists(file_path):
             with open(file_path, 'rb') as f:
                 data = pickle.load(f)
-                self.embeddings = data['embeddings']
+                # 旧版索引保存的是未归一化的原始嵌入，加载时统一归一化
+                self.index.set(data['embeddings'])
                 self.documents = data['documents']
+                self._rows = None
+                self._columns = None
+            self.refresh_ann()
+            query_cache.bump_version(self.cache_scope)
             return True
         return False
 
+def matches_filters(doc: Dict, filters: Optional[Dict]) -> bool:
+    """片段是否满足过滤条件（字段间为"且"，同字段多取值为"或"）"""
+    for field, wanted in (filters or {}).items():
+        if wanted is None:
+            continue
+        if isinstance(wanted, (str, int, float)):
+            wanted = [wanted]
+        if doc.get(field) not in wanted:
+            return False
+    return True
+
 class KeywordSearchEngine:
-    """关键词搜索引擎（备用方案）"""
+    """关键词搜索引擎（备用方案）
+
+    BM25 倒排索引（见 bm25_index.py）：中文按字二元组切分（可选 jieba），
+    查询只读取命中词的倒排链；增删按片段ID增量维护，删除打墓碑并定期压缩。
+    """
     
     def __init__(self):
         self.documents = []
+        self.index = BM25Index()
+        self._rows = None  # 片段ID -> 行号（首次增量修改时建立）
     
     def build_index(self, documents: List[Dict]):
         """构建关键词索引"""
-        self.documents = documents
-        logger.info(f"关键词搜索引擎已加载 {len(documents)} 个文档")
-    
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        """关键词搜索"""
-        query_words = set(query.lower().split())
+        self.documents = list(documents)
+        self.index.build([doc['content'] for doc in self.documents])
+        self._rows = None
+        logger.info(f"关键词搜索引擎已加载 {len(documents)} 个文档 ({len(self.index.vocab)} 个词)")
+    
+    def _ensure_rows(self):
+        if self._rows is None:
+            self._rows = {doc['id']: row for row, doc in enumerate(self.documents)
+                          if not self.index.is_deleted(row)}
+    
+    def add_documents(self, documents: List[Dict]) -> int:
+        """增量添加片段；同ID片段先移除旧版本"""
+        if not documents:
+            return 0
+        self._ensure_rows()
+        self.remove_documents([doc['id'] for doc in documents if doc['id'] in self._rows])
+        rows = self.index.add([doc['content'] for doc in documents])
+        for row, doc in zip(rows, documents):
+            self.documents.append(doc)
+            self._rows[doc['id']] = row
+        return len(documents)
+    
+    def remove_documents(self, chunk_ids: List[str]) -> int:
+        """按片段ID移除：打墓碑，墓碑占比超过 DRAGON_KB_COMPACT_RATIO 时压缩"""
+        self._ensure_rows()
+        removed = self.index.delete([self._rows.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self._rows])
+        if self.index.needs_compaction():
+            self.compact()
+        return removed
+    
+    def compact(self):
+        """压缩墓碑行（只搬移倒排数组与文档，不重新分词）"""
+        if not self.index.deleted_count:
+            return
+        keep = self.index.compact()
+        self.documents = [self.documents[row] for row in keep]
+        self._rows = None
+    
+    def search(self, query: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
+        """关键词搜索（BM25）"""
+        accept = (lambda row: matches_filters(self.documents[row], filters)) if filters else None
+        rows, scores = self.index.search(query, top_k, accept=accept)
         results = []
-        
-        for doc in self.documents:
-            content_words = set(doc['content'].lower().split())
-            # 计算关键词重叠度
-            overlap = len(query_words.intersection(content_words))
-            if overlap > 0:
-                score = overlap / len(query_words)
-                result = doc.copy()
-                result['score'] = score
-                results.append(result)
-        
-        # 按得分排序
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+        for row, score in zip(rows, scores):
+            result = self.documents[row].copy()
+            result['score'] = float(score)
+            results.append(result)
+        return results
+    
+    def save_index(self, file_path: str):
+        """保存倒排索引（附语料指纹，加载时校验）"""
+        self.compact()
+        self.index.save(file_path, bm25_fingerprint(doc['content'] for doc in self.documents))
+    
+    def load_index(self, file_path: str, documents: List[Dict]) -> bool:
+        """加载与 documents 一致的倒排索引；不存在或不一致时返回 False"""
+        index = BM25Index.load(file_path, bm25_fingerprint(doc['content'] for doc in documents))
+        if index is None:
+            return False
+        self.index = index
+        self.documents = list(documents)
+        self._rows = None
+        return True
 
 class LocalKnowledgeBase:
     """本地知识库主类"""
@@ -292,6 +524,7 @@ class LocalKnowledgeBase:
         if VECTOR_AVAILABLE:
             try:
                 self.search_engine = VectorSearchEngine()
+                self.search_engine.cache_scope = query_cache.kb_scope(knowledge_dir)
                 self.search_type = "vector"
                 logger.info("使用向量搜索引擎")
             except Exception as e:
@@ -329,8 +562,9 @@ class LocalKnowledgeBase:
         except:
             return ""
     
-    def add_document(self, file_path: str, title: str = None, metadata: Dict = None) -> bool:
-        """添加文档到知识库"""
+    def add_document(self, file_path: str, title: str = None, metadata: Dict = None,
+                     update_index: bool = True) -> bool:
+        """添加文档到知识库；update_index=False 时只登记片段，由调用方稍后统一编码入索引"""
         if not os.path.exists(file_path):
             logger.error(f"文件不存在: {file_path}")
             return False
@@ -351,12 +585,12 @@ class LocalKnowledgeBase:
         chunks = TextSplitter.split_by_paragraphs(content, max_length=500, overlap=50)
         
         title = title or os.path.basename(file_path)
-        doc_id = len(self.documents)
         
-        # 添加文档片段
+        # 添加文档片段（片段ID由文件哈希与片段序号决定，删除其他文档后保持不变）
+        new_docs = []
         for i, chunk in enumerate(chunks):
             doc = {
-                'id': f"{doc_id}_{i}",
+                'id': f"{file_hash[:16]}_{i}",
                 'title': f"{title} (第{i+1}段)",
                 'content': chunk,
                 'source': file_path,
@@ -370,7 +604,12 @@ class LocalKnowledgeBase:
             if metadata:
                 doc.update(metadata)
             
-            self.documents.append(doc)
+            new_docs.append(doc)
+        
+        self.documents.extend(new_docs)
+        # 增量更新索引：只编码本文档的片段
+        if update_index:
+            self.search_engine.add_documents(new_docs)
         
         # 保存元数据
         self.metadata[file_hash] = {
@@ -385,12 +624,13 @@ class LocalKnowledgeBase:
         return True
     
     def add_directory(self, dir_path: str, recursive: bool = True) -> int:
-        """批量添加目录中的文档"""
+        """批量添加目录中的文档：先提取、分割全部文件，再一次性分批编码写入索引"""
         if not os.path.exists(dir_path):
             logger.error(f"目录不存在: {dir_path}")
             return 0
         
         added_count = 0
+        pending_start = len(self.documents)
         supported_extensions = {'.pdf', '.docx', '.doc', '.txt', '.md', '.csv', '.py', '.js', '.html'}
         
         for root, dirs, files in os.walk(dir_path):
@@ -399,12 +639,14 @@ class LocalKnowledgeBase:
                 ext = os.path.splitext(file)[1].lower()
                 
                 if ext in supported_extensions:
-                    if self.add_document(file_path):
+                    if self.add_document(file_path, update_index=False):
                         added_count += 1
             
             if not recursive:
                 break
         
+        self.search_engine.add_documents(self.documents[pending_start:])
+        
         logger.info(f"✅ 批量添加完成，共添加 {added_count} 个文档")
         return added_count
     
@@ -418,23 +660,16 @@ class LocalKnowledgeBase:
         self.save_index()
         logger.info("搜索索引构建完成")
     
-    def search(self, query: str, top_k: int = 5, file_type: str = None) -> List[Dict]:
-        """搜索知识库"""
+    def search(self, query: str, top_k: int = 5, file_type: str = None,
+               category: str = None, source: str = None) -> List[Dict]:
+        """搜索知识库；file_type / category / source 可组合过滤（每项可为单值或列表）"""
         if not self.documents:
             return []
         
-        # 如果指定了文件类型，先过滤
-        documents = self.documents
-        if file_type:
-            documents = [doc for doc in self.documents if doc.get('file_type') == file_type]
-            
-            # 临时构建索引
-            if documents:
-                temp_engine = VectorSearchEngine() if self.search_type == "vector" else KeywordSearchEngine()
-                temp_engine.build_index(documents)
-                return temp_engine.search(query, top_k)
-        
-        return self.search_engine.search(query, top_k)
+        # 过滤条件在现有索引上转为行掩码，不重建索引
+        filters = {'file_type': file_type, 'category': category, 'source': source}
+        filters = {k: v for k, v in filters.items() if v}
+        return self.search_engine.search(query, top_k, filters=filters or None)
     
     def get_context_for_query(self, query: str, max_context_length: int = 1500) -> str:
         """为查询获取相关上下文"""
@@ -487,26 +722,60 @@ class LocalKnowledgeBase:
                 self.metadata = json.load(f)
             logger.info(f"📋 已加载 {len(self.metadata)} 个文件的元数据")
         
+        # 迁移后的片段ID写回 documents.json，否则每次启动都会重新迁移并重建索引
+        migrated = self._migrate_chunk_ids()
+        if migrated:
+            self.save_knowledge_base()
+        
         # 加载索引
-        self.load_index()
+        self.load_index(rebuild=migrated)
+    
+    def _migrate_chunk_ids(self) -> bool:
+        """旧版片段ID为 "<加入时文档数>_<序号>"，删除文档后可能重复；统一改为 "<文件哈希>_<序号>"。
+        返回是否有改动（改动后需重建一次索引）"""
+        changed = False
+        for doc in self.documents:
+            stable_id = f"{doc.get('file_hash', '')[:16]}_{doc.get('chunk_index', 0)}"
+            if doc.get('file_hash') and doc.get('id') != stable_id:
+                doc['id'] = stable_id
+                changed = True
+        if changed:
+            logger.info("片段ID已迁移为稳定ID（文件哈希_序号）")
+        return changed
     
     def save_index(self):
         """保存搜索索引"""
         if self.search_type == "vector":
-            index_path = f"{self.knowledge_dir}/indices/vector_index.pkl"
-            self.search_engine.save_index(index_path)
+            self.search_engine.save_index(f"{self.knowledge_dir}/indices/vector_store")
+        else:
+            self.search_engine.save_index(self._bm25_path())
     
-    def load_index(self):
-        """加载搜索索引"""
-        if self.search_type == "vector":
-            index_path = f"{self.knowledge_dir}/indices/vector_index.pkl"
-            if self.search_engine.load_index(index_path):
-                logger.info("向量索引已加载")
+    def _bm25_path(self) -> str:
+        """关键词倒排索引与文档表存放在一起"""
+        return f"{self.knowledge_dir}/documents/bm25_index.npz"
+    
+    def load_index(self, rebuild: bool = False):
+        """加载搜索索引；rebuild=True 时忽略已保存的索引重新构建"""
+        if self.search_type == "vector" and not rebuild:
+            if self.search_engine.load_index(f"{self.knowledge_dir}/indices/vector_store"):
+                logger.info(f"向量索引已映射加载 ({len(self.search_engine.documents)} 个片段)")
+                return
+            # 旧版 pickle 索引：加载一次并迁移为内存映射存储
+            legacy_path = f"{self.knowledge_dir}/indices/vector_index.pkl"
+            if self.search_engine.load_legacy_index(legacy_path):
+                self.save_index()
+                logger.info("旧版 pickle 向量索引已迁移为内存映射存储")
+                return
+        if self.search_type == "keyword" and not rebuild:
+            if self.search_engine.load_index(self._bm25_path(), self.documents):
+                logger.info(f"BM25 索引已加载 ({len(self.search_engine.documents)} 个片段)")
                 return
         
         # 如果有文档但没有索引，重新构建
         if self.documents:
             self.search_engine.build_index(self.documents)
+            if rebuild or self.search_type == "keyword":
+                self.save_index()
     
     def get_statistics(self) -> Dict:
         """获取知识库统计信息"""
@@ -523,6 +792,9 @@ class LocalKnowledgeBase:
             'total_chunks': total_chunks,
             'file_types': file_types,
             'search_engine': self.search_type,
+            'ann': self.search_engine.ann.snapshot() if getattr(self.search_engine, 'ann', None) else None,
+            'embedding': self.search_engine.pipeline.snapshot() if hasattr(self.search_engine, 'pipeline') else None,
+            'bm25': self.search_engine.index.snapshot() if self.search_type == 'keyword' else None,
             'last_updated': datetime.now().isoformat()
         }
     
@@ -538,14 +810,14 @@ class LocalKnowledgeBase:
             return False
         
         # 移除文档片段
+        removed_ids = [doc['id'] for doc in self.documents if doc['file_hash'] == file_hash]
         self.documents = [doc for doc in self.documents if doc['file_hash'] != file_hash]
         
         # 移除元数据
         del self.metadata[file_hash]
         
-        # 重新构建索引
-        if self.documents:
-            self.search_engine.build_index(self.documents)
+        # 增量更新索引：墓碑标记，不重新编码其余片段
+        self.search_engine.remove_documents(removed_ids)
         
         logger.info(f"✅ 已移除文档: {file_path}")
         return True
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+知识库意图分类器
+判断一句用户语音是否需要检索本地知识库，并给出命中原因。
+
+所有字面模式（知识库关键词、TeleAI 的 "Tele" 音节、"AI" 音节）在加载时编译为
+一个 Aho-Corasick 自动机，对小写化文本单次扫描；仅当出现 "Tele" 音节时再运行
+预编译的灵活四音节正则（Te-le-A-I）。每句话的开销只与文本长度有关，与词表规模无关。
+字面模式均未命中时，再用拼音音近索引（phonetic_matcher，需 pypinyin）匹配
+phonetic_keywords，自动覆盖词表之外的 TeleAI 同音/近音写法。
+
+词表可通过 JSON 文件覆盖（环境变量 DRAGON_KB_KEYWORDS_FILE，默认 kb_keywords.json）：
+    {
+        "keywords": [...],          # 知识库关键词（大小写不敏感）
+        "tele_syllables": [...],    # TeleAI 中 "Tele" 的各种识别写法
+        "ai_syllables": [...],      # TeleAI 中 "AI" 的各种识别写法
+        "flexible_pattern": "...",  # Te-le-A-I 分离发音正则
+        "phonetic_keywords": [...]  # 按拼音音近匹配的关键词（仅汉字部分参与）
+    }
+文件中出现的字段替换默认值，未出现的字段沿用默认值。
+导出默认词表：python3 knowledge_intent.py --export kb_keywords.json
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from command_matcher import AhoCorasickAutomaton
+from phonetic_matcher import PhoneticIndex, phonetic_acceptable
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_KEYWORDS_FILE = os.path.join(BASE_DIR, "kb_keywords.json")
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "keywords": [
+        # 中国电信相关
+        "中国电信", "电信", "telecom", "中国电信集团",
+        # 人工智能研究院相关
+        "人工智能研究院", "AI研究院", "研究院",
+        # TeleAI相关 - 各种可能的发音识别结果
+        "teleai", "泰勒AI", "泰勒爱", "太勒AI", "太勒爱",
+        "泰来AI", "泰来爱", "台来AI", "台来爱", "台勒AI", "台勒爱",
+        "泰利AI", "泰利爱", "太利AI", "太利爱", "泰里AI", "泰里爱",
+        "telephone AI", "telephone爱", "电话AI", "电话爱",
+        "tele AI", "tele爱", "特勒AI", "特勒爱", "特来AI", "特来爱",
+        "缇勒AI", "缇勒爱", "蒂勒AI", "蒂勒爱", "底勒AI", "底勒爱",
+        "提勒AI", "提勒爱", "梯勒AI", "梯勒爱", "替勒AI", "替勒爱",
+        "诶爱", "哎爱", "唉爱", "诶i", "哎i", "唉i",
+        # 技术相关
+        "大模型", "语言模型", "机器学习", "深度学习", "神经网络",
+        "自然语言处理", "NLP", "计算机视觉", "CV",
+        "算法", "模型训练", "数据集", "推理", "微调",
+        # 产品和服务相关
+        "星辰大模型", "星辰", "TeleChat", "泰勒聊天", "泰勒查特",
+        "智能客服", "语音助手", "聊天机器人",
+        "云计算", "边缘计算", "5G", "6G",
+        # 公司和组织
+        "中国电信人工智能研究院", "电信AI研究院",
+        "研发", "技术团队", "实验室", "创新",
+        # 行业相关
+        "电信行业", "通信", "运营商", "网络",
+        "数字化", "智能化", "信息化",
+    ],
+    "tele_syllables": [
+        "泰勒", "太勒", "泰来", "台来", "台勒", "泰利", "太利", "泰里",
+        "特勒", "特来", "缇勒", "蒂勒", "底勒", "提勒", "梯勒", "替勒",
+        "tele",
+    ],
+    "ai_syllables": [
+        "ai", "爱", "i", "哎", "诶", "唉", "a爱", "a艾", "a", "艾", "阿爱", "阿艾",
+    ],
+    # tele音素 + (0-2个字符) + A音素 + (0-2个字符) + I音素
+    "flexible_pattern": r"(泰利|太利|泰勒|太勒|台来|泰来|台勒|泰里|特勒|特来|tele).{0,2}(a|阿).{0,2}(ai|爱|艾|i|诶|哎)",
+    "phonetic_keywords": ["泰勒爱", "人工智能研究院", "星辰大模型"],
+}
+
+_KIND_KEYWORD = "keyword"
+_KIND_TELE = "tele"
+_KIND_AI = "ai"
+
+
+@dataclass(frozen=True)
+class KnowledgeIntent:
+    """知识库意图判定结果"""
+    use_knowledge_base: bool
+    reason: str                     # keyword / teleai_flexible / teleai_combination / none
+    pattern: str = ""               # 命中的模式或片段
+
+    def __bool__(self) -> bool:
+        return self.use_knowledge_base
+
+    def describe(self) -> str:
+        labels = {
+            "keyword": "知识库关键词",
+            "teleai_flexible": "TeleAI四音节灵活模式",
+            "teleai_combination": "TeleAI发音组合",
+            "phonetic": "拼音音近",
+        }
+        return f"{labels.get(self.reason, self.reason)}: {self.pattern}"
+
+
+NO_INTENT = KnowledgeIntent(False, "none")
+
+
+class KnowledgeIntentClassifier:
+    """预编译的知识库意图分类器"""
+
+    def __init__(self, keywords_file: Optional[str] = None):
+        if keywords_file is None:
+            keywords_file = os.environ.get("DRAGON_KB_KEYWORDS_FILE", DEFAULT_KEYWORDS_FILE)
+        self.keywords_file = keywords_file
+        self.version = 0
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    def _load_config(self) -> Dict[str, Any]:
+        config = dict(DEFAULT_CONFIG)
+        self._file_mtime = None
+        if self.keywords_file and os.path.exists(self.keywords_file):
+            try:
+                with open(self.keywords_file, "r", encoding="utf-8") as f:
+                    overrides = json.load(f)
+                config.update({k: v for k, v in overrides.items() if k in DEFAULT_CONFIG})
+                self._file_mtime = os.path.getmtime(self.keywords_file)
+                print(f"📘 知识库关键词配置已加载: {self.keywords_file}")
+            except Exception as e:
+                print(f"⚠️ 知识库关键词配置加载失败，使用默认词表: {e}")
+        return config
+
+    def reload(self, force: bool = False) -> bool:
+        """重新编译词表；文件未变化且非强制时跳过。返回是否重新编译。"""
+        if not force:
+            try:
+                mtime = os.path.getmtime(self.keywords_file) if self.keywords_file else None
+            except OSError:
+                mtime = None
+            if mtime == self._file_mtime:
+                return False
+        config = self._load_config()
+        automaton = AhoCorasickAutomaton()
+        for kind, key in ((_KIND_KEYWORD, "keywords"), (_KIND_TELE, "tele_syllables"), (_KIND_AI, "ai_syllables")):
+            for pattern in config[key]:
+                automaton.add(str(pattern).lower(), (kind, pattern))
+        automaton.build()
+        flexible = re.compile(config["flexible_pattern"], re.IGNORECASE)
+        phonetic = PhoneticIndex()
+        for keyword in config["phonetic_keywords"]:
+            phonetic.add(keyword, keyword)
+        with self._lock:
+            self.config = config
+            self.automaton = automaton
+            self.flexible_regex = flexible
+            self.phonetic_index = phonetic
+            self.version += 1
+        return True
+
+    def classify(self, text: str, partial: bool = False) -> KnowledgeIntent:
+        """单次扫描判定是否需要知识库，返回命中原因；partial=True（流式中间结果）时不做拼音音近回退"""
+        if not text:
+            return NO_INTENT
+        automaton, flexible = self.automaton, self.flexible_regex
+        text_lower = text.lower()
+        tele_hit: Optional[str] = None
+        ai_hit: Optional[str] = None
+        for _start, _end, _pattern, (kind, original) in automaton.iter_matches(text_lower):
+            if kind == _KIND_KEYWORD:
+                return KnowledgeIntent(True, "keyword", original)
+            if kind == _KIND_TELE and tele_hit is None:
+                tele_hit = original
+            elif kind == _KIND_AI and ai_hit is None:
+                ai_hit = original
+        if tele_hit is not None:
+            match = flexible.search(text_lower)
+            if match:
+                return KnowledgeIntent(True, "teleai_flexible", text[match.start():match.end()])
+            if ai_hit is not None:
+                return KnowledgeIntent(True, "teleai_combination", f"{tele_hit} + {ai_hit}")
+        if partial:
+            return NO_INTENT
+        hit = self.phonetic_index.best(text)
+        if hit is not None and phonetic_acceptable(text, hit):
+            return KnowledgeIntent(True, "phonetic", f"{hit.matched_text} ≈ {hit.phrase}")
+        return NO_INTENT
+
+    def export(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.config, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库意图分类器")
+    parser.add_argument("--export", metavar="PATH", help="导出当前词表为JSON")
+    parser.add_argument("text", nargs="*", help="待判定的文本")
+    args = parser.parse_args()
+
+    classifier = KnowledgeIntentClassifier()
+    if args.export:
+        classifier.export(args.export)
+        print(f"✅ 已导出词表: {args.export}")
+    for text in args.text:
+        intent = classifier.classify(text)
+        print(f"{'🎯' if intent else '—'} {text} -> {intent.describe() if intent else '不使用知识库'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -35,9 +35,8 @@ def add_file_command(kb: LocalKnowledgeBase, args):
     if success:
         print(f"✅ 文件添加成功: {title}")
         
-        # 重新构建索引
-        print("🔄 正在重新构建搜索索引...")
-        kb.build_index()
+        # 索引已在添加时增量更新，只需保存
+        kb.save_index()
         kb.save_knowledge_base()
         print("💾 知识库已保存")
     else:
@@ -57,9 +56,8 @@ def add_directory_command(kb: LocalKnowledgeBase, args):
     if added_count > 0:
         print(f"✅ 成功添加 {added_count} 个文档")
         
-        # 重新构建索引
-        print("🔄 正在构建搜索索引...")
-        kb.build_index()
+        # 索引已在添加时增量更新，只需保存
+        kb.save_index()
         kb.save_knowledge_base()
         print("💾 知识库已保存")
     else:
@@ -70,7 +68,7 @@ def search_command(kb: LocalKnowledgeBase, args):
     print(f"🔍 搜索查询: '{args.search}'")
     print("-" * 50)
     
-    results = kb.search(args.search, top_k=args.top_k or 5)
+    results = kb.search(args.search, top_k=args.top_k or 5, file_type=args.file_type, category=args.category)
     
     if not results:
         print("❌ 没有找到相关结果")
@@ -133,6 +131,7 @@ def remove_command(kb: LocalKnowledgeBase, args):
     
     if success:
         print(f"✅ 文档移除成功: {args.remove}")
+        kb.save_index()
         kb.save_knowledge_base()
         print("💾 知识库已保存")
     else:
@@ -212,6 +211,9 @@ def main():
   # 搜索知识库
   python knowledge_manager.py --search "机器人操作方法" --top-k 3
   
+  # 按类型/分类过滤搜索
+  python knowledge_manager.py --search "星辰大模型" --file-type pdf --category "技术文档"
+  
   # 查看统计信息
   python knowledge_manager.py --stats
   
@@ -232,6 +234,7 @@ def main():
     # 搜索操作
     parser.add_argument('--search', type=str, help='搜索知识库')
     parser.add_argument('--top-k', type=int, default=5, help='搜索结果数量')
+    parser.add_argument('--file-type', type=str, help='只搜索该类型的文档(pdf/docx/text/csv)，可与 --category 组合')
     
     # 信息查看
     parser.add_argument('--list', action='store_true', help='列出所有文档')
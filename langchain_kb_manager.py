@@ -2,11 +2,11 @@
 # -*- coding: utf-8 -*-
 """
 LangChain知识库管理工具
-支持简化版和LangChain两种知识库后端
+支持简化版、LangChain 与混合检索（LangChain 向量 + BM25，倒数排名融合）三种知识库后端
 
 功能:
 - 统一的知识库管理接口
-- 自动检测知识库类型
+- 自动检测知识库类型（DRAGON_KB_BACKEND 可指定后端）
 - 文档添加、删除、搜索操作
 - 知识库统计和维护
 - 批量操作支持
@@ -18,16 +18,21 @@ LangChain知识库管理工具
 import os
 import sys
 import argparse
+import functools
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
+from concurrent.futures import Future
 from datetime import datetime
 
 # 添加当前目录到路径
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+import query_cache
+from hybrid_retriever import HybridRetriever
+
 # 导入知识库模块
 try:
     from simple_knowledge_base import SimpleKnowledgeBase
@@ -56,30 +61,52 @@ logger = logging.getLogger(__name__)
 class UnifiedKnowledgeBaseManager:
     """统一知识库管理器"""
     
-    def __init__(self, kb_dir: str = "knowledge_base", backend: str = "auto"):
+    def __init__(self, kb_dir: str = "knowledge_base", backend: Optional[str] = None):
         """
         初始化知识库管理器
         
         Args:
             kb_dir: 知识库目录
-            backend: 后端类型 ("simple", "langchain", "auto")
+            backend: 后端类型 ("simple", "langchain", "hybrid", "auto")，缺省取环境变量 DRAGON_KB_BACKEND（默认 auto）
         """
         self.kb_dir = Path(kb_dir)
-        self.backend = backend
+        self.backend = backend or os.environ.get("DRAGON_KB_BACKEND", "auto").strip().lower()
         self.kb_instance = None
+        # 混合检索器（仅 hybrid 后端）：向量与 BM25 并发检索后按倒数排名融合
+        self.retriever: Optional[HybridRetriever] = None
         
         # 自动检测或初始化知识库
         self._initialize_knowledge_base()
     
+    @property
+    def cache_scope(self) -> str:
+        """查询缓存中的知识库标识（与同目录的知识库实例共享版本号）"""
+        return query_cache.kb_scope(self.kb_dir)
+    
+    def _invalidate_cache(self, backend_bumped: bool) -> None:
+        """写操作后使查询缓存失效。LangChain 后端写入成功时已自行递增版本并据此追加 BM25 索引，
+        再递增一次会让刚追加的索引被判为过期而整体重建；其余情况（简化版、写入失败可能已部分写入）由这里递增"""
+        if backend_bumped and self.backend in ("langchain", "hybrid"):
+            return
+        query_cache.bump_version(self.cache_scope)
+    
     def _initialize_knowledge_base(self):
         """初始化知识库实例"""
         if self.backend == "auto":
             self.backend = self._detect_kb_type()
         
-        if self.backend == "langchain" and LANGCHAIN_KB_AVAILABLE:
+        if self.backend in ("langchain", "hybrid") and LANGCHAIN_KB_AVAILABLE:
             try:
                 self.kb_instance = LangChainKnowledgeBase(str(self.kb_dir))
-                logger.info("使用LangChain知识库")
+                if self.backend == "hybrid":
+                    # 向量一路不做关键词回退（模型未就绪时由延迟预算跳过），避免 BM25 结果计两次
+                    self.retriever = HybridRetriever({
+                        "vector": functools.partial(self.kb_instance.search, fallback=False),
+                        "bm25": self.kb_instance.lexical_search,
+                    })
+                    logger.info("使用混合检索知识库（向量 + BM25）")
+                else:
+                    logger.info("使用LangChain知识库")
             except Exception as e:
                 logger.error(f"LangChain知识库初始化失败: {e}")
                 self._fallback_to_simple()
@@ -96,6 +123,15 @@ class UnifiedKnowledgeBaseManager:
             logger.error(f"不支持的知识库后端: {self.backend}")
             self.kb_instance = None
     
+    @property
+    def ready(self) -> Future:
+        """知识库就绪信号（LangChain 后端在嵌入模型与向量数据库后台加载完成时完成）"""
+        ready = getattr(self.kb_instance, 'ready', None)
+        if ready is None:
+            ready = Future()
+            ready.set_result(self.kb_instance)
+        return ready
+    
     def _detect_kb_type(self) -> str:
         """自动检测知识库类型"""
         if not self.kb_dir.exists():
@@ -120,6 +156,7 @@ class UnifiedKnowledgeBaseManager:
         if SIMPLE_KB_AVAILABLE:
             try:
                 self.backend = "simple"
+                self.retriever = None
                 self.kb_instance = SimpleKnowledgeBase(str(self.kb_dir))
                 logger.info("已回退到简化版知识库")
             except Exception as e:
@@ -132,11 +169,34 @@ class UnifiedKnowledgeBaseManager:
             logger.error("知识库未初始化")
             return False
         
+        added = False
         try:
-            return self.kb_instance.add_document(file_path, category)
+            added = self.kb_instance.add_document(file_path, category)
+            return added
         except Exception as e:
             logger.error(f"添加文档失败: {e}")
             return False
+        finally:
+            self._invalidate_cache(added)
+    
+    def add_documents(self, file_paths: List[str], category: str = "general") -> Dict[str, bool]:
+        """批量添加文档（LangChain 后端一次分批编码写入），返回每个文件是否成功"""
+        if not self.kb_instance:
+            logger.error("知识库未初始化")
+            return {str(path): False for path in file_paths}
+        
+        results: Dict[str, bool] = {}
+        try:
+            if hasattr(self.kb_instance, 'add_documents'):
+                results = self.kb_instance.add_documents(file_paths, category)
+            else:
+                results = {str(path): self.kb_instance.add_document(path, category) for path in file_paths}
+            return results
+        except Exception as e:
+            logger.error(f"批量添加文档失败: {e}")
+            return {str(path): False for path in file_paths}
+        finally:
+            self._invalidate_cache(any(results.values()))
     
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """搜索知识库"""
@@ -145,6 +205,8 @@ class UnifiedKnowledgeBaseManager:
             return []
         
         try:
+            if self.retriever is not None:
+                return self.retriever.search(query, top_k)
             if hasattr(self.kb_instance, 'search'):
                 return self.kb_instance.search(query, top_k)
             else:
@@ -156,35 +218,59 @@ class UnifiedKnowledgeBaseManager:
             return []
     
     def get_context(self, query: str, max_length: int = 2000) -> str:
-        """获取相关上下文"""
+        """获取相关上下文（相同问题在知识库未变化时直接返回缓存的上下文）"""
         if not self.kb_instance:
             return "知识库未初始化"
         
         try:
-            if hasattr(self.kb_instance, 'get_relevant_context'):
-                return self.kb_instance.get_relevant_context(query, max_length)
-            else:
-                # 简化版知识库的替代方法
-                results = self.search(query, 3)
-                if not results:
-                    return "未找到相关信息"
-                
-                context_parts = []
-                current_length = 0
-                
-                for result in results:
-                    content = result.get("content", "")
-                    if current_length + len(content) <= max_length:
-                        context_parts.append(content)
-                        current_length += len(content)
-                    else:
-                        break
-                
-                return "\n\n".join(context_parts) if context_parts else "未找到相关信息"
+            # 嵌入模型预热期间是关键词回退的结果，不写入缓存
+            if not self.ready.done():
+                return self._build_context(query, max_length)[0]
+            model_name = getattr(self.kb_instance, 'model_name', self.backend)
+            params = query_cache.params_key(context=max_length, backend=self.backend)
+            # 混合检索只有部分检索器在预算内完成时不缓存，下次同一问题重新检索
+            context, _complete = query_cache.cached_result(self.cache_scope, model_name, query, params,
+                                                           lambda: self._build_context(query, max_length),
+                                                           cacheable=lambda value: value[1])
+            return context
         except Exception as e:
             logger.error(f"获取上下文失败: {e}")
             return "获取信息时出现错误"
     
+    def _build_context(self, query: str, max_length: int) -> Tuple[str, bool]:
+        """(上下文, 是否完整)；混合检索有检索器超时或失败时不完整"""
+        if self.retriever is None and hasattr(self.kb_instance, 'get_relevant_context'):
+            return self.kb_instance.get_relevant_context(query, max_length), True
+        
+        # 简化版知识库与混合检索的替代方法
+        complete = True
+        if self.retriever is not None:
+            try:
+                results, outcome = self.retriever.search_with_outcome(query, 3)
+                complete = not (outcome["timeouts"] or outcome["errors"])
+            except Exception as e:
+                logger.error(f"搜索失败: {e}")
+                results, complete = [], False
+        else:
+            results = self.search(query, 3)
+        if not results:
+            return "未找到相关信息", complete
+        
+        context_parts = []
+        current_length = 0
+        
+        for result in results:
+            content = result.get("content", "")
+            if self.retriever is not None:
+                content = f"[来源: {result.get('filename', '未知文件')}]\n{content}"
+            if current_length + len(content) <= max_length:
+                context_parts.append(content)
+                current_length += len(content)
+            else:
+                break
+        
+        return ("\n\n".join(context_parts) if context_parts else "未找到相关信息"), complete
+    
     def list_documents(self) -> List[Dict[str, Any]]:
         """列出所有文档"""
         if not self.kb_instance:
@@ -202,11 +288,15 @@ class UnifiedKnowledgeBaseManager:
             logger.error("知识库未初始化")
             return False
         
+        removed = False
         try:
-            return self.kb_instance.remove_document(file_path)
+            removed = self.kb_instance.remove_document(file_path)
+            return removed
         except Exception as e:
             logger.error(f"删除文档失败: {e}")
             return False
+        finally:
+            self._invalidate_cache(removed)
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
@@ -216,9 +306,13 @@ class UnifiedKnowledgeBaseManager:
         try:
             stats = self.kb_instance.get_stats()
             stats["backend_type"] = self.backend
+            stats["query_cache"] = query_cache.snapshot()
+            if self.retriever is not None:
+                stats["hybrid"] = self.retriever.snapshot()
             stats["backend_available"] = {
                 "simple": SIMPLE_KB_AVAILABLE,
-                "langchain": LANGCHAIN_KB_AVAILABLE
+                "langchain": LANGCHAIN_KB_AVAILABLE,
+                "hybrid": LANGCHAIN_KB_AVAILABLE
             }
             return stats
         except Exception as e:
@@ -231,7 +325,7 @@ class UnifiedKnowledgeBaseManager:
             logger.error("迁移工具不可用")
             return False
         
-        if self.backend == "langchain":
+        if self.backend in ("langchain", "hybrid"):
             logger.info("已经是LangChain知识库")
             return True
         
@@ -261,8 +355,8 @@ def main():
     """命令行主函数"""
     parser = argparse.ArgumentParser(description="Dragon Robot 知识库管理工具")
     parser.add_argument("--kb-dir", default="knowledge_base", help="知识库目录")
-    parser.add_argument("--backend", choices=["simple", "langchain", "auto"], 
-                       default="auto", help="知识库后端类型")
+    parser.add_argument("--backend", choices=["simple", "langchain", "hybrid", "auto"], 
+                       default=None, help="知识库后端类型（缺省取 DRAGON_KB_BACKEND，默认 auto）")
     parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], 
                        default="INFO", help="日志级别")
     
@@ -328,6 +422,8 @@ def main():
             print(f"   分类: {result.get('category', '未知')}")
             if 'similarity_score' in result:
                 print(f"   相似度: {result['similarity_score']:.3f}")
+            if 'rrf_score' in result:
+                print(f"   融合得分: {result['rrf_score']:.4f} (名次: {result.get('retrievers', {})})")
             content = result.get('content', '')
             print(f"   内容预览: {content[:200]}...")
     
@@ -17,9 +17,11 @@
 
 import os
 import logging
+import threading
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import json
+from concurrent.futures import Future, InvalidStateError
 from datetime import datetime
 
 # LangChain核心组件
@@ -32,14 +34,46 @@ from langchain_community.document_loaders import (
     TextLoader
 )
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 # 文档处理工具
 import PyPDF2
 import docx
-from sentence_transformers import SentenceTransformer
+
+import model_warmup
+import query_cache
+from bm25_index import BM25Index, fingerprint as bm25_fingerprint
+from embedding_pipeline import EmbeddingPipeline
+from model_warmup import BackgroundLoader
 
 logger = logging.getLogger(__name__)
 
+
+class KnowledgeBaseEmbeddings(Embeddings):
+    """Chroma 的 embedding_function：查询嵌入走共享缓存，入库嵌入走编码流水线
+
+    相似度检索时 Chroma 调用 embed_query 编码查询，命中缓存（query_cache.embedding_cache）即跳过模型推理；
+    入库时 embed_documents 收到一次写入的全部片段，由 EmbeddingPipeline 按长度分批（可选多进程）编码，
+    结果按原顺序返回给 Chroma 写入。底层模型由后台加载器提供（见 model_warmup.py），首次编码时等待就绪。
+    """
+
+    def __init__(self, loader: BackgroundLoader, model_name: str):
+        self.loader = loader
+        self.model_name = model_name
+        # 工作进程与 HuggingFaceEmbeddings 一样输出归一化向量
+        self.pipeline = EmbeddingPipeline(model_name, lambda texts: self.embeddings.embed_documents(texts),
+                                          normalize=True)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.loader.get()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.pipeline.encode(texts, progress=len(texts) > 1000).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return query_cache.cached_embedding(self.model_name, text, self.embeddings.embed_query)
+
 class LangChainKnowledgeBase:
     """
     基于LangChain的高级知识库系统
@@ -49,6 +83,8 @@ class LangChainKnowledgeBase:
     - ChromaDB作为向量数据库
     - 支持增量更新和批量导入
     - 语义相似度搜索
+    - 同一批片段上的 BM25 关键词检索（供混合检索融合，见 hybrid_retriever.py）
+    - 嵌入模型与向量数据库在后台加载，模型未就绪时语义搜索回退为关键词检索
     - 文档元数据管理
     """
     
@@ -84,13 +120,19 @@ class LangChainKnowledgeBase:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         
-        # 初始化嵌入模型
+        # 查询缓存：按知识库目录登记版本，入库/删除/重建时递增
+        self.model_name = model_name
+        self.cache_scope = query_cache.kb_scope(self.knowledge_base_dir)
+        
+        # 初始化嵌入模型（后台加载，进程内按模型名共享；查询嵌入经共享缓存，近似重复的问题不再重复推理）
         logger.info(f"初始化嵌入模型: {model_name}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={'device': 'cpu'},  # 如果有GPU可以改为'cuda'
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        self.embeddings = KnowledgeBaseEmbeddings(model_warmup.shared(
+            ("huggingface", model_name), f"嵌入模型 {model_name}",
+            lambda: HuggingFaceEmbeddings(
+                model_name=model_name,
+                model_kwargs={'device': 'cpu'},  # 如果有GPU可以改为'cuda'
+                encode_kwargs={'normalize_embeddings': True}
+            )), model_name)
         
         # 初始化文本分割器
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -100,13 +142,66 @@ class LangChainKnowledgeBase:
             separators=["\n\n", "\n", "。", "！", "？", ".", "!", "?", " "]
         )
         
-        # 初始化向量数据库
-        self.vector_store = self._initialize_vector_store()
-        
         # 加载元数据
         self.metadata = self._load_metadata()
         
-        logger.info("LangChain知识库初始化完成")
+        # 关键词索引：向量数据库打开后即从中读出全部片段构建（或加载已保存的倒排表）
+        self.lexical_index_file = self.knowledge_base_dir / "bm25_index.npz"
+        self._lexical: Optional[BM25Index] = None
+        self._lexical_chunks: List[Tuple[str, Dict[str, Any]]] = []
+        self._lexical_version: Optional[int] = None
+        self._lexical_lock = threading.Lock()
+        
+        # 初始化向量数据库（后台打开，不等待嵌入模型；关键词回退只依赖它）
+        self._store = BackgroundLoader("向量数据库", self._open_vector_store)
+        
+        # 就绪信号：嵌入模型与向量数据库都加载完成
+        self.ready = self._ready_future()
+        
+        logger.info("LangChain知识库初始化完成（嵌入模型后台加载中）")
+    
+    @property
+    def vector_store(self) -> Chroma:
+        """向量数据库（后台打开，未就绪时等待）"""
+        return self._store.get()
+    
+    @vector_store.setter
+    def vector_store(self, store: Chroma):
+        self._store = BackgroundLoader.loaded("向量数据库", store)
+    
+    def _ready_future(self) -> Future:
+        ready = Future()
+        loaders = [self.embeddings.loader, self._store]
+        
+        def check(_):
+            if ready.done() or not all(loader.future.done() for loader in loaders):
+                return
+            errors = [loader.future.exception() for loader in loaders if loader.failed]
+            try:
+                if errors:
+                    ready.set_exception(errors[0])
+                else:
+                    ready.set_result(self)
+            except InvalidStateError:
+                pass  # 另一个加载器的回调已先完成
+        
+        for loader in loaders:
+            loader.future.add_done_callback(check)
+        return ready
+    
+    def wait_ready(self, budget_ms: Optional[float] = None) -> bool:
+        """在预算内（默认 DRAGON_KB_READY_WAIT_MS）等待语义检索可用"""
+        return self.embeddings.loader.wait(budget_ms) and self._store.wait(budget_ms)
+    
+    def _open_vector_store(self) -> Chroma:
+        """打开向量数据库并预热 BM25 倒排表（后台线程执行）"""
+        vector_store = self._initialize_vector_store()
+        try:
+            with self._lexical_lock:
+                self._lexical_index(vector_store)
+        except Exception as e:
+            logger.warning(f"BM25 索引预热失败: {e}")
+        return vector_store
     
     def _initialize_vector_store(self) -> Chroma:
         """初始化ChromaDB向量数据库"""
@@ -161,12 +256,64 @@ class LangChainKnowledgeBase:
         Returns:
             bool: 添加是否成功
         """
+        return self.add_documents([file_path], category).get(str(file_path), False)
+    
+    def add_documents(self, file_paths: List[str], category: str = "general") -> Dict[str, bool]:
+        """
+        批量添加文档：先加载、分割全部文件，再一次写入向量数据库
+        
+        全部片段的嵌入在一次 embed_documents 调用中由编码流水线分批（可选多进程）完成，
+        按原顺序写入，而不是逐个文档编码。
+        
+        Args:
+            file_paths: 文档文件路径列表
+            category: 文档分类
+        
+        Returns:
+            Dict[str, bool]: 每个文件是否添加成功
+        """
+        results = {str(path): False for path in file_paths}
+        prepared = []
+        for path in file_paths:
+            chunks = self._prepare_chunks(Path(path), category)
+            if chunks:
+                prepared.append((Path(path), chunks))
+        if not prepared:
+            return results
+        
         try:
-            file_path = Path(file_path)
+            # 添加到向量数据库
+            all_chunks = [chunk for _, chunks in prepared for chunk in chunks]
+            self.vector_store.add_documents(all_chunks)
             
+            # 持久化向量数据库
+            self.vector_store.persist()
+            self._extend_lexical_index(all_chunks, query_cache.bump_version(self.cache_scope))
+        except Exception as e:
+            logger.error(f"添加文档失败: {e}")
+            return results
+        
+        # 更新元数据
+        for file_path, chunks in prepared:
+            file_id = str(file_path)
+            self.metadata["documents"][file_id] = {
+                "filename": file_path.name,
+                "category": category,
+                "file_type": file_path.suffix.lower(),
+                "chunks_count": len(chunks),
+                "added_time": datetime.now().isoformat()
+            }
+            results[file_id] = True
+            logger.info(f"成功添加文档: {file_path.name}")
+        self._save_metadata()
+        return results
+    
+    def _prepare_chunks(self, file_path: Path, category: str) -> List[Document]:
+        """加载并分割单个文档，返回带元数据的有效片段（失败或内容为空时返回空列表）"""
+        try:
             if not file_path.exists():
                 logger.error(f"文件不存在: {file_path}")
-                return False
+                return []
             
             # 检查文件类型
             file_ext = file_path.suffix.lower()
@@ -174,13 +321,13 @@ class LangChainKnowledgeBase:
             
             if file_ext not in supported_formats:
                 logger.error(f"不支持的文件格式: {file_ext}")
-                return False
+                return []
             
             # 加载文档
             documents = self._load_document(file_path)
             if not documents:
                 logger.error(f"文档加载失败: {file_path}")
-                return False
+                return []
             
             # 检查文档内容是否为空 (可能是扫描版PDF)
             total_content = ""
@@ -192,7 +339,7 @@ class LangChainKnowledgeBase:
                 logger.warning(f"文档内容为空，可能是扫描版PDF: {file_path.name}")
                 # 对于扫描版PDF，我们可以选择跳过或尝试OCR
                 # 目前先跳过，后续可以集成OCR功能
-                return False
+                return []
             
             # 为文档添加元数据
             for doc in documents:
@@ -211,7 +358,7 @@ class LangChainKnowledgeBase:
             # 检查是否有有效内容
             if len(chunks) == 0:
                 logger.warning(f"文档内容为空，跳过添加: {file_path.name}")
-                return False
+                return []
             
             # 过滤空白内容的分块
             valid_chunks = []
@@ -221,33 +368,14 @@ class LangChainKnowledgeBase:
             
             if len(valid_chunks) == 0:
                 logger.warning(f"文档只包含空白内容，跳过添加: {file_path.name}")
-                return False
+                return []
             
             logger.info(f"过滤后有效片段数: {len(valid_chunks)}")
-            
-            # 添加到向量数据库
-            self.vector_store.add_documents(valid_chunks)
-            
-            # 持久化向量数据库
-            self.vector_store.persist()
-            
-            # 更新元数据
-            file_id = str(file_path)
-            self.metadata["documents"][file_id] = {
-                "filename": file_path.name,
-                "category": category,
-                "file_type": file_ext,
-                "chunks_count": len(valid_chunks),
-                "added_time": datetime.now().isoformat()
-            }
-            self._save_metadata()
-            
-            logger.info(f"成功添加文档: {file_path.name}")
-            return True
+            return valid_chunks
             
         except Exception as e:
             logger.error(f"添加文档失败: {e}")
-            return False
+            return []
     
     def _load_document(self, file_path: Path) -> List[Document]:
         """
@@ -305,7 +433,8 @@ class LangChainKnowledgeBase:
             logger.error(f"文档加载错误: {e}")
             return []
     
-    def search(self, query: str, top_k: int = 5, score_threshold: float = 0.0) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = 5, score_threshold: float = 0.0,
+               fallback: bool = True) -> List[Dict[str, Any]]:
         """
         语义搜索知识库
         
@@ -313,6 +442,7 @@ class LangChainKnowledgeBase:
             query: 搜索查询
             top_k: 返回结果数量
             score_threshold: 相似度阈值
+            fallback: 嵌入模型在等待预算内未就绪时改用关键词检索（False 时等待模型加载完成）
         
         Returns:
             List[Dict]: 搜索结果列表
@@ -321,25 +451,17 @@ class LangChainKnowledgeBase:
             if not query.strip():
                 return []
             
-            # 执行相似度搜索
-            results = self.vector_store.similarity_search_with_score(
-                query=query,
-                k=top_k
-            )
+            # 启动后模型仍在预热：回退结果不写入缓存，模型就绪后自动恢复语义检索
+            if fallback and not self.wait_ready():
+                logger.info(f"嵌入模型尚未就绪，使用关键词检索: '{query}'")
+                return self.lexical_search(query, top_k)
             
-            # 格式化结果
-            formatted_results = []
-            for doc, score in results:
-                if score >= score_threshold:
-                    result = {
-                        "content": doc.page_content,
-                        "metadata": doc.metadata,
-                        "similarity_score": float(score),
-                        "source": doc.metadata.get("source", "未知"),
-                        "category": doc.metadata.get("category", "general"),
-                        "filename": doc.metadata.get("filename", "未知文件")
-                    }
-                    formatted_results.append(result)
+            # 相同问题在知识库未变化时直接返回缓存结果（检索失败的异常不写入缓存）
+            params = query_cache.params_key(top_k=top_k, score_threshold=score_threshold)
+            formatted_results = query_cache.cached_result(
+                self.cache_scope, self.model_name, query, params,
+                lambda: self._similarity_search(query, top_k, score_threshold)
+            )
             
             logger.info(f"搜索查询: '{query}' - 找到 {len(formatted_results)} 个相关结果")
             return formatted_results
@@ -348,6 +470,91 @@ class LangChainKnowledgeBase:
             logger.error(f"搜索失败: {e}")
             return []
     
+    def _similarity_search(self, query: str, top_k: int, score_threshold: float) -> List[Dict[str, Any]]:
+        """执行相似度搜索并格式化结果"""
+        results = self.vector_store.similarity_search_with_score(
+            query=query,
+            k=top_k
+        )
+        
+        formatted_results = []
+        for doc, score in results:
+            if score >= score_threshold:
+                formatted_results.append(self._format_result(doc.page_content, doc.metadata,
+                                                             similarity_score=float(score)))
+        return formatted_results
+    
+    @staticmethod
+    def _format_result(content: str, metadata: Dict[str, Any], **scores: float) -> Dict[str, Any]:
+        return {
+            "content": content,
+            "metadata": metadata,
+            **scores,
+            "source": metadata.get("source", "未知"),
+            "category": metadata.get("category", "general"),
+            "filename": metadata.get("filename", "未知文件")
+        }
+    
+    def lexical_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        关键词搜索（BM25），与语义搜索使用向量库中的同一批片段
+        
+        产品名、型号等精确词语义搜索容易漏掉，混合检索把两者的排名融合。
+        
+        Args:
+            query: 搜索查询
+            top_k: 返回结果数量
+        
+        Returns:
+            List[Dict]: 搜索结果列表（bm25_score 为 BM25 得分）
+        """
+        try:
+            if not query.strip():
+                return []
+            if not self._store.wait():
+                logger.warning("向量数据库仍在加载，暂无关键词检索结果")
+                return []
+            with self._lexical_lock:
+                rows, scores = self._lexical_index(self.vector_store).search(query, top_k)
+                chunks = [self._lexical_chunks[row] for row in rows]
+            return [self._format_result(content, metadata, bm25_score=float(score))
+                    for (content, metadata), score in zip(chunks, scores)]
+        except Exception as e:
+            logger.error(f"关键词搜索失败: {e}")
+            return []
+    
+    def _lexical_index(self, vector_store: Chroma) -> BM25Index:
+        """向量库全部片段上的 BM25 索引（调用方持有 _lexical_lock）；片段指纹一致时加载已保存的倒排表。
+        知识库版本变化（同一目录上的其它实例，如自动知识库管理器入库）时从向量库重新读取"""
+        version = query_cache.kb_version(self.cache_scope)
+        if self._lexical is None or self._lexical_version != version:
+            data = vector_store.get(include=["documents", "metadatas"])
+            chunks = [(content, metadata or {}) for content, metadata in zip(data["documents"], data["metadatas"])]
+            corpus_fingerprint = bm25_fingerprint(content for content, _ in chunks)
+            index = BM25Index.load(str(self.lexical_index_file), corpus_fingerprint)
+            if index is None:
+                index = BM25Index()
+                index.build([content for content, _ in chunks])
+                index.save(str(self.lexical_index_file), corpus_fingerprint)
+                logger.info(f"BM25 索引已构建: {len(chunks)} 个片段")
+            self._lexical_chunks = chunks
+            self._lexical = index
+            self._lexical_version = version
+        return self._lexical
+    
+    def _extend_lexical_index(self, chunks: List[Document], version: int) -> None:
+        """新写入向量库的片段追加到已加载的 BM25 索引；version 为本次入库递增后的知识库版本。
+        索引未加载或已落后于上一版本（期间有其它实例入库）时丢弃，留待下次检索整体重建"""
+        with self._lexical_lock:
+            if self._lexical is None or self._lexical_version != version - 1:
+                self._lexical = None
+                return
+            self._lexical_chunks.extend((chunk.page_content, chunk.metadata) for chunk in chunks)
+            self._lexical.add([chunk.page_content for chunk in chunks])
+            self._lexical.save(str(self.lexical_index_file),
+                               bm25_fingerprint(content for content, _ in self._lexical_chunks))
+            self._lexical_version = version
+    
     def get_relevant_context(self, query: str, max_context_length: int = 2000) -> str:
         """
         获取查询相关的上下文信息
@@ -432,6 +639,7 @@ class LangChainKnowledgeBase:
             # 从元数据中移除
             del self.metadata["documents"][file_id]
             self._save_metadata()
+            query_cache.bump_version(self.cache_scope)
             
             logger.info(f"成功移除文档: {file_path}")
             return True
@@ -457,7 +665,14 @@ class LangChainKnowledgeBase:
                 "categories": categories,
                 "last_updated": self.metadata.get("last_updated"),
                 "vector_db_path": str(self.vector_db_dir),
-                "model_name": "paraphrase-multilingual-MiniLM-L12-v2"
+                "model_name": "paraphrase-multilingual-MiniLM-L12-v2",
+                "query_cache": query_cache.snapshot(),
+                "embedding": self.embeddings.pipeline.snapshot(),
+                "bm25": self._lexical.snapshot() if self._lexical is not None else None,
+                "warmup": {
+                    "embeddings": self.embeddings.loader.snapshot(),
+                    "vector_store": self._store.snapshot()
+                }
             }
             
         except Exception as e:
@@ -478,16 +693,20 @@ class LangChainKnowledgeBase:
                 embedding_function=self.embeddings,
                 collection_name="dragon_knowledge_base"
             )
+            with self._lexical_lock:
+                self._lexical = None
+            query_cache.bump_version(self.cache_scope)
             
-            # 重新添加所有文档
-            success_count = 0
+            # 重新添加所有文档（按分类批量编码写入）
+            by_category: Dict[str, List[str]] = {}
             for file_path in docs_to_rebuild:
                 if Path(file_path).exists():
-                    doc_info = self.metadata["documents"][file_path]
-                    if self.add_document(file_path, doc_info["category"]):
-                        success_count += 1
+                    by_category.setdefault(self.metadata["documents"][file_path]["category"], []).append(file_path)
                 else:
                     logger.warning(f"文件不存在，跳过: {file_path}")
+            success_count = 0
+            for category, file_paths in by_category.items():
+                success_count += sum(self.add_documents(file_paths, category).values())
             
             logger.info(f"索引重建完成，成功重建 {success_count} 个文档")
             return True
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+嵌入模型后台预热
+加载 transformer 嵌入模型（导入 torch、读取权重）与打开向量数据库要数秒，原先都发生在
+DragonDialogSession.__init__ 里，语音会话要等它们完成才连上服务端。BackgroundLoader 把加载放到
+后台线程，构造函数立即返回，future 即就绪信号：
+
+- get()：等待就绪并返回对象（入库、重建等非交互路径使用）；
+- wait(budget_ms)：交互查询在预算内等待，超时返回 False，调用方改走 BM25 关键词回退，
+  模型就绪后自动恢复语义检索；加载失败同样返回 False，查询不会因模型缺失而报错；
+- shared(key, ...)：同一进程内按键共享加载器，会话与自动知识库管理器各自的知识库实例
+  只加载一次同一个模型。
+
+环境变量：
+    DRAGON_KB_WARMUP           启动时即在后台加载（默认 1；0 表示首次使用时才开始加载）
+    DRAGON_KB_READY_WAIT_MS    模型未就绪时查询最多等待的毫秒数（默认 200）
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def warmup_enabled() -> bool:
+    return os.environ.get("DRAGON_KB_WARMUP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def ready_wait_ms() -> float:
+    return _env_float("DRAGON_KB_READY_WAIT_MS", 200.0)
+
+
+class BackgroundLoader:
+    """在后台线程执行一次 load()，future 完成即就绪"""
+
+    def __init__(self, name: str, load: Callable[[], Any], start: Optional[bool] = None):
+        self.name = name
+        self._load = load
+        self.future: Future = Future()
+        self._lock = threading.Lock()
+        self._started = False
+        self.seconds: Optional[float] = None
+        if warmup_enabled() if start is None else start:
+            self.start()
+
+    @classmethod
+    def loaded(cls, name: str, value: Any) -> "BackgroundLoader":
+        """已就绪的加载器（对象已在调用线程创建，如重建索引时新开的向量数据库）"""
+        loader = cls(name, lambda: value, start=False)
+        loader._started = True
+        loader.seconds = 0.0
+        loader.future.set_result(value)
+        return loader
+
+    def start(self) -> Future:
+        with self._lock:
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, name=f"warmup-{self.name}", daemon=True).start()
+        return self.future
+
+    def _run(self) -> None:
+        start = time.perf_counter()
+        try:
+            value = self._load()
+        except BaseException as e:
+            self.seconds = time.perf_counter() - start
+            print(f"⚠️ {self.name} 加载失败: {e}")
+            self.future.set_exception(e)
+        else:
+            self.seconds = time.perf_counter() - start
+            print(f"✅ {self.name} 已就绪 ({self.seconds:.1f}s)")
+            self.future.set_result(value)
+
+    @property
+    def ready(self) -> bool:
+        return self.future.done() and self.future.exception() is None
+
+    @property
+    def failed(self) -> bool:
+        return self.future.done() and self.future.exception() is not None
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """等待就绪并返回对象（尚未开始时立即开始加载）；加载失败时抛出原异常"""
+        self.start()
+        return self.future.result(timeout)
+
+    def wait(self, budget_ms: Optional[float] = None) -> bool:
+        """在预算内等待就绪；超时或加载失败返回 False"""
+        self.start()
+        budget = ready_wait_ms() if budget_ms is None else budget_ms
+        try:
+            self.future.result(timeout=max(0.0, budget) / 1000)
+            return True
+        except FutureTimeout:
+            return False
+        except Exception:
+            return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.ready:
+            state = "ready"
+        elif self.failed:
+            state = "failed"
+        else:
+            state = "loading" if self._started else "idle"
+        return {"state": state, "seconds": round(self.seconds, 2) if self.seconds is not None else None}
+
+
+_shared: Dict[Hashable, BackgroundLoader] = {}
+_shared_lock = threading.Lock()
+
+
+def shared(key: Hashable, name: str, load: Callable[[], Any]) -> BackgroundLoader:
+    """进程内按键共享的加载器；此前加载失败的键重新加载"""
+    with _shared_lock:
+        loader = _shared.get(key)
+        if loader is None or loader.failed:
+            loader = _shared[key] = BackgroundLoader(name, load)
+        return loader
+
+
+def snapshot() -> Dict[str, Any]:
+    with _shared_lock:
+        return {loader.name: loader.snapshot() for loader in _shared.values()}
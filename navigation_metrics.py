@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+导航耗时指标
+每个导航任务按阶段记录单调时钟时间戳：
+
+    trigger        HTTP 触发（NavigationTestHandler 收到请求）
+    enqueue        进入导航调度器
+    prompt_start   _send_navigation_prompt 开始
+    query_sent     chat_text_query 已发送（本地TTS缓存命中时无此阶段）
+    first_audio    首个音频包（云端音频包到达，或缓存音频入队）
+    voice_end      播报结束（voice_end）
+    mic_restored   麦克风恢复
+
+按导航点统计相邻阶段及端到端区间的直方图（分桶计数 + p50/p95/p99），可经 HTTP
+（/metrics/navigation、/metrics/navigation.jsonl）查看，或追加写入 JSONL 文件离线分析，
+用数据而非猜测来调 DRAGON_NAV_AUDIO_FALLBACK_SEC 与导航播报超时：
+
+    python3 navigation_metrics.py nav_metrics.jsonl
+
+环境变量：
+    DRAGON_NAV_METRICS_FILE      每个任务结束时追加一行 JSONL（默认不写文件）
+    DRAGON_NAV_METRICS_HISTORY   内存中保留的任务数（默认 500）
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STAGES = ("trigger", "enqueue", "prompt_start", "query_sent", "first_audio", "voice_end", "mic_restored")
+
+# 统计的区间：(名称, 起点阶段, 终点阶段)
+INTERVALS: Tuple[Tuple[str, str, str], ...] = (
+    ("queue_wait", "enqueue", "prompt_start"),
+    ("send", "prompt_start", "query_sent"),
+    ("cloud_first_audio", "query_sent", "first_audio"),
+    ("time_to_first_audio", "prompt_start", "first_audio"),
+    ("playback", "first_audio", "voice_end"),
+    ("mic_restore", "voice_end", "mic_restored"),
+    ("announce_total", "prompt_start", "mic_restored"),
+    ("trigger_to_first_audio", "trigger", "first_audio"),
+    ("trigger_to_mic_restored", "trigger", "mic_restored"),
+)
+
+# 直方图分桶上界（毫秒）
+BUCKETS_MS = (50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 30000)
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """最近秩百分位（输入需已排序）"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values_ms: Iterable[float]) -> Dict[str, Any]:
+    values = sorted(values_ms)
+    if not values:
+        return {"count": 0}
+    buckets = {f"<={b}": 0 for b in BUCKETS_MS}
+    buckets["inf"] = 0
+    for v in values:
+        for b in BUCKETS_MS:
+            if v <= b:
+                buckets[f"<={b}"] += 1
+                break
+        else:
+            buckets["inf"] += 1
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1),
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(values[-1], 1),
+        "buckets": buckets,
+    }
+
+
+class NavigationTrace:
+    """一个导航任务的阶段时间戳"""
+
+    __slots__ = ("job_id", "point", "marks", "cached", "outcome", "wall_time")
+
+    def __init__(self, job_id: int, point: str):
+        self.job_id = job_id
+        self.point = point
+        self.marks: Dict[str, float] = {}
+        self.cached = False
+        self.outcome: Optional[str] = None
+        self.wall_time = time.time()
+
+    def interval_ms(self, start: str, end: str) -> Optional[float]:
+        if start in self.marks and end in self.marks:
+            return (self.marks[end] - self.marks[start]) * 1000.0
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = min(self.marks.values()) if self.marks else 0.0
+        return {
+            "job_id": self.job_id,
+            "point": self.point,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.wall_time)),
+            "cached": self.cached,
+            "outcome": self.outcome,
+            # 各阶段相对首个时间戳的毫秒偏移
+            "stages_ms": {s: round((self.marks[s] - origin) * 1000.0, 1) for s in STAGES if s in self.marks},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NavigationTrace":
+        trace = cls(data.get("job_id", 0), data.get("point", "?"))
+        trace.cached = bool(data.get("cached"))
+        trace.outcome = data.get("outcome")
+        trace.marks = {s: v / 1000.0 for s, v in data.get("stages_ms", {}).items()}
+        return trace
+
+
+class NavigationMetrics:
+    """导航任务阶段计时与分位统计"""
+
+    def __init__(self, history: Optional[int] = None, export_path: Optional[str] = None):
+        if history is None:
+            try:
+                history = int(os.environ.get("DRAGON_NAV_METRICS_HISTORY", "500"))
+            except ValueError:
+                history = 500
+        self.export_path = export_path if export_path is not None else os.environ.get("DRAGON_NAV_METRICS_FILE")
+        self.completed: deque = deque(maxlen=history)
+        self._active: Dict[int, NavigationTrace] = {}
+        self._current: Optional[NavigationTrace] = None
+        self._lock = threading.Lock()
+
+    def begin(self, job_id: int, point: str, triggered_at: Optional[float] = None,
+              enqueued_at: Optional[float] = None) -> NavigationTrace:
+        """任务开始播报：建立计时记录，后续 mark_current() 记到该任务上"""
+        trace = NavigationTrace(job_id, point)
+        if triggered_at is not None:
+            trace.marks["trigger"] = triggered_at
+        if enqueued_at is not None:
+            trace.marks["enqueue"] = enqueued_at
+        trace.marks["prompt_start"] = time.monotonic()
+        with self._lock:
+            self._active[job_id] = trace
+            self._current = trace
+        return trace
+
+    def mark_current(self, stage: str, cached: Optional[bool] = None) -> None:
+        """给正在播报的任务记录阶段时间戳（同一阶段只记第一次；无播报任务时忽略）"""
+        with self._lock:
+            trace = self._current
+            if trace is None:
+                return
+            if stage not in trace.marks:
+                trace.marks[stage] = time.monotonic()
+            if cached is not None:
+                trace.cached = cached
+
+    def complete(self, job_id: int, outcome: Optional[str]) -> Optional[NavigationTrace]:
+        """任务结束（完成/取消）：移入历史并按需追加写入 JSONL"""
+        with self._lock:
+            trace = self._active.pop(job_id, None)
+            if trace is None:
+                return None
+            if self._current is trace:
+                self._current = None
+            trace.outcome = outcome
+            self.completed.append(trace)
+        if self.export_path:
+            try:
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"⚠️ 导航指标写入失败: {e}")
+        return trace
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def traces(self) -> List[NavigationTrace]:
+        with self._lock:
+            return list(self.completed)
+
+    def summary(self, traces: Optional[List[NavigationTrace]] = None) -> Dict[str, Any]:
+        """按导航点（及 "all"）统计各区间的分位数与直方图"""
+        traces = self.traces() if traces is None else traces
+        groups: Dict[str, List[NavigationTrace]] = {"all": traces}
+        for trace in traces:
+            groups.setdefault(trace.point, []).append(trace)
+        result = {}
+        for point, items in groups.items():
+            outcomes: Dict[str, int] = {}
+            for trace in items:
+                outcomes[trace.outcome or "unknown"] = outcomes.get(trace.outcome or "unknown", 0) + 1
+            result[point] = {
+                "jobs": len(items),
+                "cached": sum(1 for t in items if t.cached),
+                "outcomes": outcomes,
+                "intervals_ms": {
+                    name: summarize(v for v in (t.interval_ms(a, b) for t in items) if v is not None)
+                    for name, a, b in INTERVALS
+                },
+            }
+        return result
+
+    def suggest(self, traces: Optional[List[NavigationTrace]] = None) -> Dict[str, Any]:
+        """由 p99 给出导航音频回退时间与播报超时的建议值（秒，留 50%/20% 余量）"""
+        summary = self.summary(traces).get("all", {}).get("intervals_ms", {})
+        first_audio = summary.get("cloud_first_audio", {}).get("p99")
+        announce = summary.get("announce_total", {}).get("p99")
+        return {
+            "DRAGON_NAV_AUDIO_FALLBACK_SEC": math.ceil(first_audio * 1.5 / 1000.0) if first_audio else None,
+            "DRAGON_NAV_TIMEOUT_SEC": math.ceil(announce * 1.2 / 1000.0) if announce else None,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            current = self._current.to_dict() if self._current else None
+            jobs = len(self.completed)
+        return {"jobs": jobs, "current": current, "export_path": self.export_path or None,
+                "suggest": self.suggest()}
+
+    def export_jsonl(self) -> str:
+        return "".join(json.dumps(t.to_dict(), ensure_ascii=False) + "\n" for t in self.traces())
+
+
+def load_jsonl(path: str) -> List[NavigationTrace]:
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                traces.append(NavigationTrace.from_dict(json.loads(line)))
+    return traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导航耗时指标分析")
+    parser.add_argument("jsonl", help="DRAGON_NAV_METRICS_FILE 导出的 JSONL")
+    args = parser.parse_args()
+
+    traces = load_jsonl(args.jsonl)
+    metrics = NavigationMetrics(export_path="")
+    summary = metrics.summary(traces)
+    print(f"🧭 导航任务 {len(traces)} 个")
+    for point, stats in summary.items():
+        print("=" * 72)
+        print(f"{point}: 任务 {stats['jobs']} | 缓存命中 {stats['cached']} | 结果 {stats['outcomes']}")
+        print(f"   {'区间':<26}{'次数':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for name, s in stats["intervals_ms"].items():
+            if s["count"]:
+                print(f"   {name:<26}{s['count']:>6}{s['p50']:>10.0f}{s['p95']:>10.0f}{s['p99']:>10.0f}{s['max']:>10.0f}")
+    print("=" * 72)
+    for name, value in metrics.suggest(traces).items():
+        if value is not None:
+            print(f"💡 建议 {name}={value}")
+
+
+if __name__ == "__main__":
+    main()
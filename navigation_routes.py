@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+导航路线表
+导航点不再写死在代码里，而是从路线表（环境变量 DRAGON_NAV_ROUTES_FILE，默认 navigation_routes.json）加载：
+
+    {
+        "version": 1,
+        "routes": {
+            "point1": {
+                "title": "欢迎词和观影点引导",   # 测试页按钮文字
+                "script": "欢迎各位领导……",     # 讲解词（实际播报的文字）
+                "priority": 0,                   # 默认优先级（HTTP ?priority= 可覆盖），高者抢占
+                "cache": "record",               # TTS缓存策略，见下
+                "timeout": 40                    # 可选：播报超时（秒），缺省用 DRAGON_NAV_TIMEOUT_SEC
+            }
+        }
+    }
+
+TTS缓存策略：
+    warm     启动及路线变化时在后台预先合成讲解词音频
+    record   首次播放时录制写入缓存（默认）
+    none     不使用缓存，每次都走云端
+
+运行中的会话定期检查文件变化（DRAGON_NAV_ROUTES_RELOAD_SEC，默认 2 秒），新路线表整体校验通过后
+一次性替换（校验失败保留旧表）；讲解词变化的路线旧缓存音频作废并在后台重新合成。
+"""
+
+import argparse
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from tts_audio_cache import REPEAT_INSTRUCTION
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROUTES_FILE = os.path.join(BASE_DIR, "navigation_routes.json")
+
+CACHE_WARM = "warm"
+CACHE_RECORD = "record"
+CACHE_NONE = "none"
+CACHE_POLICIES = (CACHE_WARM, CACHE_RECORD, CACHE_NONE)
+
+
+@dataclass(frozen=True)
+class NavigationRoute:
+    """一个导航点"""
+    id: str
+    script: str
+    title: str = ""
+    priority: int = 0
+    cache: str = CACHE_RECORD
+    timeout: Optional[float] = None
+    order: int = 0
+
+    @property
+    def prompt(self) -> str:
+        """发给模型的文本：要求逐字复述讲解词"""
+        return REPEAT_INSTRUCTION + self.script
+
+    @property
+    def cacheable(self) -> bool:
+        return self.cache != CACHE_NONE
+
+
+def parse_routes(raw: Dict[str, Any]) -> Dict[str, NavigationRoute]:
+    """校验并构建路线；任一路线无效时抛出 ValueError（整表不生效）"""
+    routes = {}
+    for order, (route_id, entry) in enumerate(raw.get("routes", {}).items()):
+        script = (entry.get("script") or "").strip()
+        if not script:
+            raise ValueError(f"路线 {route_id} 缺少讲解词 script")
+        if not route_id or "/" in route_id or "?" in route_id:
+            raise ValueError(f"路线ID不合法: {route_id!r}")
+        cache = entry.get("cache", CACHE_RECORD)
+        if cache not in CACHE_POLICIES:
+            raise ValueError(f"路线 {route_id} 的缓存策略未知: {cache}")
+        timeout = entry.get("timeout")
+        routes[route_id] = NavigationRoute(
+            id=route_id,
+            script=script,
+            title=entry.get("title", route_id),
+            priority=int(entry.get("priority", 0)),
+            cache=cache,
+            timeout=float(timeout) if timeout is not None else None,
+            order=order,
+        )
+    return routes
+
+
+def stale_routes(old: Dict[str, NavigationRoute], new: Dict[str, NavigationRoute]) -> List[NavigationRoute]:
+    """讲解词已变化或已删除的旧路线（其缓存音频应作废）"""
+    return [route for route_id, route in old.items()
+            if route_id not in new or new[route_id].script != route.script]
+
+
+class NavigationRoutes:
+    """可热更新的导航路线表"""
+
+    def __init__(self, routes_file: Optional[str] = None):
+        if routes_file is None:
+            routes_file = os.environ.get("DRAGON_NAV_ROUTES_FILE", DEFAULT_ROUTES_FILE)
+        self.routes_file = routes_file
+        self.version = 0
+        self.file_version: Optional[Any] = None
+        self.routes: Dict[str, NavigationRoute] = {}
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """重新加载路线表；文件未变化且非强制时跳过，校验失败保留旧表。返回是否已替换。"""
+        try:
+            mtime = os.path.getmtime(self.routes_file)
+        except OSError:
+            mtime = None
+        if not force and mtime == self._file_mtime:
+            return False
+        raw = {}
+        if mtime is not None:
+            try:
+                with open(self.routes_file, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                routes = parse_routes(raw)
+            except Exception as e:
+                print(f"⚠️ 导航路线表加载失败（保留当前路线）: {e}")
+                self._file_mtime = mtime
+                return False
+        else:
+            print(f"⚠️ 导航路线表不存在: {self.routes_file}")
+            routes = {}
+
+        with self._lock:
+            self.routes = routes
+            self.file_version = raw.get("version")
+            self._file_mtime = mtime
+            self.version += 1
+        return True
+
+    def get(self, route_id: str) -> Optional[NavigationRoute]:
+        return self.routes.get(route_id)
+
+    def __contains__(self, route_id: str) -> bool:
+        return route_id in self.routes
+
+    def ordered(self) -> List[NavigationRoute]:
+        return sorted(self.routes.values(), key=lambda r: r.order)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "file": self.routes_file,
+            "file_version": self.file_version,
+            "version": self.version,
+            "routes": [{"id": r.id, "title": r.title, "priority": r.priority, "cache": r.cache,
+                        "timeout": r.timeout} for r in self.ordered()],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导航路线表")
+    parser.add_argument("--file", default=None, help="路线表文件")
+    args = parser.parse_args()
+
+    routes = NavigationRoutes(args.file)
+    print(f"🧭 导航路线 {len(routes.routes)} 条 (版本 {routes.file_version}): {routes.routes_file}")
+    for route in routes.ordered():
+        timeout = f"{route.timeout}s" if route.timeout is not None else "默认"
+        print(f"   {route.id}: {route.title} | 优先级 {route.priority} | 缓存 {route.cache} | 超时 {timeout}")
+        print(f"      {route.script[:50]}...")
+
+
+if __name__ == "__main__":
+    main()
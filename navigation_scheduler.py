@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+导航任务调度器
+所有导航播报由事件循环上的单个调度协程串行执行，取代原先的 queue.Queue + threading.Lock +
+navigation_task_active 标志 + run_coroutine_threadsafe 回调链：
+
+- asyncio.PriorityQueue 保存导航任务，优先级高者先播；同优先级按提交顺序；
+- 任务状态显式流转：queued -> announcing -> done / cancelled（附原因）；
+- 同一导航点的重复触发合并为一个任务（排队中或正在播报均合并）；
+- 更高优先级的导航点抢占正在播报的任务；
+- 每个任务有排队有效期（过期丢弃）与播报超时（超时强制恢复，计时注册在时间轮 "nav/timeout"）。
+
+播报从发送提示开始，到会话调用 finish()（voice_end / 强制恢复）结束。
+任意线程均可调用 submit()/finish()/cancel()，状态只在事件循环线程中修改。
+
+环境变量：
+    DRAGON_NAV_TIMEOUT_SEC     单次播报超时（秒，默认 25）
+    DRAGON_NAV_QUEUE_TTL_SEC   排队有效期（秒，默认 120；0 表示不过期）
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from timer_wheel import TimerWheel
+
+QUEUED = "queued"
+ANNOUNCING = "announcing"
+DONE = "done"
+CANCELLED = "cancelled"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass(eq=False)
+class NavigationJob:
+    """一次导航播报任务"""
+    point_key: str
+    priority: int = 0
+    job_id: int = 0
+    timeout: float = 25.0
+    expires_at: Optional[float] = None
+    state: str = QUEUED
+    reason: Optional[str] = None
+    coalesced: int = 0
+    triggered_at: Optional[float] = None
+    created_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    ended: Optional[asyncio.Event] = field(default=None, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, ANNOUNCING)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "job_id": self.job_id,
+            "point": self.point_key,
+            "priority": self.priority,
+            "state": self.state,
+            "reason": self.reason,
+            "coalesced": self.coalesced,
+            "age_sec": round(now - self.created_at, 2),
+            "announce_sec": round((self.finished_at or now) - self.started_at, 2) if self.started_at else None,
+        }
+
+
+class NavigationScheduler:
+    """事件循环上的导航任务调度器
+
+    announce(job) 发送播报（返回 False 表示未开始，任务取消）；
+    on_timeout(job) 播报超时时调用（通常强制恢复麦克风）；
+    on_preempt(job) 正在播报的任务被抢占时调用（通常清空本地播放队列）；
+    on_close(job) 任务结束（完成或取消）时调用（通常用于耗时统计）。
+    """
+
+    def __init__(self, announce: Callable[[NavigationJob], Awaitable[bool]],
+                 on_timeout: Optional[Callable[[NavigationJob], Any]] = None,
+                 on_preempt: Optional[Callable[[NavigationJob], Any]] = None,
+                 on_close: Optional[Callable[[NavigationJob], Any]] = None,
+                 timeout: Optional[float] = None,
+                 queue_ttl: Optional[float] = None,
+                 timers: Optional[TimerWheel] = None):
+        self.announce = announce
+        self.timers = timers or TimerWheel()
+        self.on_timeout = on_timeout
+        self.on_preempt = on_preempt
+        self.on_close = on_close
+        self.timeout = timeout if timeout is not None else _env_float("DRAGON_NAV_TIMEOUT_SEC", 25.0)
+        self.queue_ttl = queue_ttl if queue_ttl is not None else _env_float("DRAGON_NAV_QUEUE_TTL_SEC", 120.0)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.current: Optional[NavigationJob] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pending: Dict[str, NavigationJob] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+        self.history: deque = deque(maxlen=20)
+        self.stats: Dict[str, int] = {
+            "submitted": 0,
+            "coalesced": 0,
+            "preempted": 0,
+            "expired": 0,
+            "timeouts": 0,
+            "done": 0,
+            "cancelled": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self) -> asyncio.Task:
+        """在当前运行的事件循环上启动调度协程"""
+        self.loop = asyncio.get_running_loop()
+        if not self.timers.running:
+            self.timers.start(self.loop)
+        self._queue = asyncio.PriorityQueue()
+        self._worker = self.loop.create_task(self._run())
+        return self._worker
+
+    def stop(self) -> None:
+        if self._worker is not None:
+            self._call(self._worker.cancel)
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _call(self, fn: Callable, *args) -> None:
+        """在事件循环线程中执行（已在循环中则直接执行）"""
+        if self._in_loop():
+            fn(*args)
+        elif self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    # ------------------------------------------------------------------
+    # 提交 / 结束 / 取消
+    # ------------------------------------------------------------------
+    def submit(self, point_key: str, priority: int = 0, timeout: Optional[float] = None,
+               triggered_at: Optional[float] = None) -> NavigationJob:
+        """提交导航任务；返回实际承载该触发的任务（可能是被合并的已有任务）
+
+        triggered_at 为外部触发时刻（time.monotonic()，如 HTTP 请求到达），仅用于耗时统计。
+        """
+        if self.loop is None or not self.loop.is_running():
+            raise RuntimeError("导航调度器未启动")
+        if self._in_loop():
+            return self._enqueue(point_key, priority, timeout, triggered_at)
+        result = {}
+        done = threading.Event()
+
+        def _enqueue_threadsafe():
+            try:
+                result["job"] = self._enqueue(point_key, priority, timeout, triggered_at)
+            finally:
+                done.set()
+
+        self.loop.call_soon_threadsafe(_enqueue_threadsafe)
+        if not done.wait(timeout=2.0) or "job" not in result:
+            raise RuntimeError("导航调度器无响应")
+        return result["job"]
+
+    def _enqueue(self, point_key: str, priority: int, timeout: Optional[float],
+                 triggered_at: Optional[float] = None) -> NavigationJob:
+        self.stats["submitted"] += 1
+        existing = self._pending.get(point_key)
+        if existing is None and self.current is not None and self.current.point_key == point_key:
+            existing = self.current
+        if existing is not None and existing.active:
+            existing.coalesced += 1
+            self.stats["coalesced"] += 1
+            if existing.state == QUEUED and priority > existing.priority:
+                # 提升排队任务的优先级：重新入队，旧条目出队时因优先级不符被跳过
+                existing.priority = priority
+                self._queue.put_nowait((-priority, next(self._seq), existing))
+                self._maybe_preempt(existing)
+            return existing
+
+        now = time.monotonic()
+        job = NavigationJob(
+            point_key=point_key,
+            priority=priority,
+            job_id=next(self._ids),
+            timeout=timeout if timeout is not None else self.timeout,
+            expires_at=now + self.queue_ttl if self.queue_ttl > 0 else None,
+            triggered_at=triggered_at,
+            ended=asyncio.Event(),
+        )
+        self._pending[point_key] = job
+        self._queue.put_nowait((-priority, next(self._seq), job))
+        self._maybe_preempt(job)
+        return job
+
+    def _maybe_preempt(self, job: NavigationJob) -> None:
+        current = self.current
+        if current is not None and current.state == ANNOUNCING and job.priority > current.priority:
+            print(f"⏭️ [NAV] {job.point_key}(优先级{job.priority}) 抢占正在播报的 {current.point_key}(优先级{current.priority})")
+            self.stats["preempted"] += 1
+            self._close(current, CANCELLED, "preempted")
+            if self.on_preempt is not None:
+                try:
+                    self.on_preempt(current)
+                except Exception as e:
+                    print(f"⚠️ [NAV] 抢占处理失败: {e}")
+
+    def finish(self, reason: str = "voice_end") -> None:
+        """当前播报结束（voice_end / 强制恢复）"""
+        def _finish():
+            if self.current is not None and self.current.state == ANNOUNCING:
+                self._close(self.current, DONE, reason)
+        self._call(_finish)
+
+    def cancel(self, point_key: Optional[str] = None, reason: str = "cancelled") -> None:
+        """取消排队中的任务（point_key 为 None 时取消全部排队任务）"""
+        def _cancel():
+            for key, job in list(self._pending.items()):
+                if point_key is None or key == point_key:
+                    self._close(job, CANCELLED, reason)
+        self._call(_cancel)
+
+    def _close(self, job: NavigationJob, state: str, reason: str) -> None:
+        if not job.active:
+            return
+        job.state = state
+        job.reason = reason
+        job.finished_at = time.monotonic()
+        if self._pending.get(job.point_key) is job:
+            del self._pending[job.point_key]
+        self.stats["done" if state == DONE else "cancelled"] += 1
+        self.history.append(job)
+        if job.ended is not None:
+            job.ended.set()
+        if self.on_close is not None:
+            try:
+                self.on_close(job)
+            except Exception as e:
+                print(f"⚠️ [NAV] 任务结束回调失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 调度协程
+    # ------------------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            neg_priority, _seq, job = await self._queue.get()
+            if job.state != QUEUED or -neg_priority != job.priority:
+                continue
+            if job.expires_at is not None and time.monotonic() > job.expires_at:
+                print(f"⌛ [NAV] 导航任务排队过期，丢弃: {job.point_key}")
+                self.stats["expired"] += 1
+                self._close(job, CANCELLED, "expired")
+                continue
+            await self._announce(job)
+
+    async def _announce(self, job: NavigationJob) -> None:
+        if self._pending.get(job.point_key) is job:
+            del self._pending[job.point_key]
+        job.state = ANNOUNCING
+        job.started_at = time.monotonic()
+        self.current = job
+        try:
+            try:
+                started = await self.announce(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ [NAV] 导航播报异常: {e}")
+                started = False
+            if not started:
+                self._close(job, CANCELLED, "not_started")
+                return
+            remaining = job.timeout - (time.monotonic() - job.started_at)
+            timer = self.timers.schedule("nav/timeout", max(remaining, 0.0), lambda: self._expire(job))
+            try:
+                await job.ended.wait()
+            finally:
+                timer.cancel()
+        finally:
+            self.current = None
+
+    def _expire(self, job: NavigationJob) -> None:
+        """（时间轮回调）播报超时"""
+        if job.state != ANNOUNCING:
+            return
+        print(f"⏱️ [NAV] 导航点 {job.point_key} 超过 {job.timeout}s 未结束")
+        self.stats["timeouts"] += 1
+        self._close(job, CANCELLED, "timeout")
+        if self.on_timeout is not None:
+            self.on_timeout(job)
+
+    # ------------------------------------------------------------------
+    # 观测
+    # ------------------------------------------------------------------
+    @property
+    def queue_length(self) -> int:
+        return len(self._pending)
+
+    def queued(self) -> List[NavigationJob]:
+        return sorted(self._pending.values(), key=lambda j: (-j.priority, j.job_id))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "current": self.current.snapshot() if self.current else None,
+            "queued": [job.snapshot() for job in self.queued()],
+            "recent": [job.snapshot() for job in list(self.history)[-5:]],
+            "stats": dict(self.stats),
+            "timeout_sec": self.timeout,
+            "queue_ttl_sec": self.queue_ttl,
+        }
@@ -5,10 +5,13 @@
 
 使用方法：
 1. 将此代码集成到Dragon系统中，启动HTTP服务器
-2. 通过HTTP GET请求触发导航点：
+2. 通过HTTP GET请求触发导航点（导航点来自路线表 navigation_routes.json，修改后自动生效）：
    curl http://localhost:8080/point1
    curl http://localhost:8080/point2
    等等...
+3. 导航耗时统计（各阶段 p50/p95/p99 与直方图）：
+   curl http://localhost:8080/metrics/navigation
+   curl http://localhost:8080/metrics/navigation.jsonl
 """
 
 import asyncio
@@ -16,6 +19,10 @@ from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
 import time
 import urllib.parse
+from html import escape as html_escape
+
+import model_warmup
+import query_cache
 
 class NavigationTestHandler(BaseHTTPRequestHandler):
     """处理导航测试请求的HTTP处理器"""
@@ -24,11 +31,20 @@ class NavigationTestHandler(BaseHTTPRequestHandler):
         self.dragon_session = dragon_session
         super().__init__(*args, **kwargs)
     
+    def _routes(self):
+        """当前导航路线（随路线表热更新）"""
+        routes = getattr(self.dragon_session, 'navigation_routes', None)
+        return routes.ordered() if routes else []
+
     def do_GET(self):
         """处理GET请求"""
+        # 导航耗时统计的起点：HTTP 请求到达
+        triggered_at = time.monotonic()
         try:
-            # 解析URL路径
-            path = self.path.strip('/')
+            # 解析URL路径（可选查询参数 priority：导航优先级，高者抢占）
+            parsed = urllib.parse.urlparse(self.path)
+            path = parsed.path.strip('/')
+            query = urllib.parse.parse_qs(parsed.query)
             
             if path == '':
                 # 根路径，显示可用的导航点
@@ -36,15 +52,23 @@ class NavigationTestHandler(BaseHTTPRequestHandler):
                 self.send_header('Content-type', 'text/html; charset=utf-8')
                 self.end_headers()
                 
-                html = """
+                # 导航点按钮与命令示例由当前路线表生成（路线表热更新后刷新页面即可）
+                routes = self._routes()
+                buttons = "".join(
+                    f'    <a href="/{html_escape(r.id)}" class="nav-button">{html_escape(r.id)} - {html_escape(r.title)}</a><br>\n'
+                    for r in routes
+                )
+                curls = "".join(f"curl http://localhost:8080/{html_escape(r.id)}\n" for r in routes)
+                example = routes[0].id if routes else "point1"
+                html = f"""
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <title>Dragon导航点测试</title>
     <style>
-        body { font-family: Arial, sans-serif; margin: 40px; }
-        .nav-button { 
+        body {{ font-family: Arial, sans-serif; margin: 40px; }}
+        .nav-button {{ 
             display: inline-block; 
             padding: 10px 20px; 
             margin: 10px; 
@@ -52,27 +76,20 @@ class NavigationTestHandler(BaseHTTPRequestHandler):
             color: white; 
             text-decoration: none; 
             border-radius: 5px; 
-        }
-        .nav-button:hover { background: #0056b3; }
+        }}
+        .nav-button:hover {{ background: #0056b3; }}
     </style>
 </head>
 <body>
     <h1>🤖 Dragon导航点测试</h1>
     <p>点击按钮触发对应的导航点：</p>
     
-    <a href="/point1" class="nav-button">Point 1 - 欢迎词和观影点引导</a><br>
-    <a href="/point2" class="nav-button">Point 2 - 真实之境沙盘介绍</a><br>
-    <a href="/point3" class="nav-button">Point 3 - 数字人展区介绍</a><br>
-    <a href="/point4" class="nav-button">Point 4 - 全模态大模型基座介绍</a><br>
-    <a href="/point5" class="nav-button">Point 5 - 智能家居展厅介绍</a><br>
-    
+{buttons}    
     <h2>命令行测试</h2>
     <pre>
-curl http://localhost:8080/point1
-curl http://localhost:8080/point2
-curl http://localhost:8080/point3
-curl http://localhost:8080/point4
-curl http://localhost:8080/point5
+{curls}curl "http://localhost:8080/{html_escape(example)}?priority=10"   # 高优先级，抢占正在播报的导航点
+curl http://localhost:8080/metrics/navigation       # 导航各阶段耗时 p50/p95/p99
+curl http://localhost:8080/metrics/navigation.jsonl # 导出每个导航任务的阶段时间戳
     </pre>
 </body>
 </html>
@@ -87,30 +104,83 @@ curl http://localhost:8080/point5
                 if sess:
                     attrs = [
                         'dialog_mode','microphone_muted','mic_muted_due_to_navigation','is_voice_playback_active',
-                        'is_user_querying','pending_navigation_point','is_recording','is_running'
+                        'is_user_querying','pending_navigation_point','is_recording','is_running',
+                        'stale_tts_packets_dropped'
                     ]
                     for a in attrs:
                         st[a] = getattr(sess,a,None)
-                    # 导航队列长度
-                    q_len = None
+                    # 导航调度器：当前任务、排队任务、最近任务与统计
+                    scheduler = getattr(sess,'navigation_scheduler',None)
+                    st['navigation_queue_len'] = scheduler.queue_length if scheduler else None
                     try:
-                        if hasattr(sess,'navigation_queue'):
-                            q_len = sess.navigation_queue.qsize()
-                    except Exception:
-                        pass
-                    st['navigation_queue_len'] = q_len
+                        st['navigation_scheduler'] = scheduler.snapshot() if scheduler else None
+                    except RuntimeError:
+                        st['navigation_scheduler'] = None
                     # 最近导航发送与最近音频包时间差
-                    import time
                     now = time.time()
                     st['last_navigation_send_age'] = round(now - getattr(sess,'last_navigation_send_time',0.0),2)
                     st['last_audio_packet_age'] = round(now - getattr(sess,'last_audio_packet_time',0.0),2)
+                    # 音频输出端统计（类型、写入时长、欠载、播放线程CPU）
+                    sink = getattr(sess,'output_sink',None)
+                    st['audio_sink'] = sink.stats() if sink else None
+                    # 流式ASR推测式意图统计（中间结果/最终结果条数、提前下发/确认/撤回、最终结果下发）
+                    spec = getattr(sess,'speculative_intent',None)
+                    st['speculative_intent'] = dict(spec.stats) if spec else None
+                    # 命令去重合并统计（话轮id、已下发、重复丢弃、冲突替换）
+                    robot = getattr(sess,'robot_controller',None)
+                    coalescer = getattr(robot,'command_coalescer',None)
+                    st['command_coalescer'] = coalescer.snapshot() if coalescer else None
+                    # 意图判定缓存命中率（命中/未命中/淘汰/规则更新失效）
+                    cache = getattr(sess,'intent_cache',None)
+                    st['intent_cache'] = cache.snapshot() if cache else None
+                    # 时间轮：待触发的看门狗定时器（名称与剩余时间）
+                    timers = getattr(sess,'timers',None)
+                    st['timers'] = timers.snapshot() if timers else None
+                    # 本地TTS音频缓存（命中/未命中/已写入/录制丢弃/录制截断）
+                    tts_cache = getattr(sess,'tts_audio_cache',None)
+                    st['tts_audio_cache'] = tts_cache.snapshot() if tts_cache else None
+                    # 导航耗时：已统计任务数、正在播报任务的阶段时间戳、超时参数建议值
+                    nav_metrics = getattr(sess,'navigation_metrics',None)
+                    st['navigation_metrics'] = nav_metrics.snapshot() if nav_metrics else None
+                    # 导航路线表（文件版本、热更新次数、各路线优先级/缓存策略/超时）
+                    routes = getattr(sess,'navigation_routes',None)
+                    st['navigation_routes'] = routes.snapshot() if routes else None
+                    # 知识库查询缓存（查询嵌入/检索结果命中率、各知识库版本）
+                    kb = getattr(sess,'knowledge_base',None)
+                    st['kb_query_cache'] = query_cache.snapshot() if kb else None
+                    # 混合检索（各检索器完成/超时次数、平均耗时）
+                    retriever = getattr(kb,'retriever',None)
+                    st['kb_hybrid'] = retriever.snapshot() if retriever else None
+                    # 嵌入模型后台预热状态（loading / ready / failed 与加载耗时）
+                    st['kb_warmup'] = model_warmup.snapshot() if kb else None
                 self.send_response(200)
                 self.send_header('Content-type','application/json; charset=utf-8')
                 self.end_headers()
                 import json
                 self.wfile.write(json.dumps(st,ensure_ascii=False,indent=2).encode('utf-8'))
                 return
-            elif path in ['point1', 'point2', 'point3', 'point4', 'point5','ping']:
+            elif path in ('metrics/navigation', 'metrics/navigation.jsonl'):
+                # 导航耗时：按导航点的分位统计（JSON）或逐任务阶段时间戳（JSONL）
+                nav_metrics = getattr(self.dragon_session,'navigation_metrics',None)
+                if nav_metrics is None:
+                    self.send_response(503)
+                    self.send_header('Content-type','text/plain; charset=utf-8')
+                    self.end_headers()
+                    self.wfile.write("❌ 导航耗时统计不可用".encode('utf-8'))
+                    return
+                self.send_response(200)
+                if path.endswith('.jsonl'):
+                    self.send_header('Content-type','application/x-ndjson; charset=utf-8')
+                    self.end_headers()
+                    self.wfile.write(nav_metrics.export_jsonl().encode('utf-8'))
+                else:
+                    import json
+                    body = {"points": nav_metrics.summary(), "suggest": nav_metrics.suggest()}
+                    self.send_header('Content-type','application/json; charset=utf-8')
+                    self.end_headers()
+                    self.wfile.write(json.dumps(body,ensure_ascii=False,indent=2).encode('utf-8'))
+                return
+            elif path == 'ping' or any(r.id == path for r in self._routes()):
                 # 触发导航点
                 if path == 'ping':
                     # 会话活跃探测：发送一个空文本TTS或轻量请求
@@ -138,11 +208,21 @@ curl http://localhost:8080/point5
                     return
                 print(f"🌐 HTTP请求触发导航点: {path}")
                 if self.dragon_session:
-                    self.dragon_session.trigger_navigation_point(path)
-                    self.send_response(200)
+                    # 未指定优先级时使用路线表中的默认优先级
+                    try:
+                        priority = int(query['priority'][0]) if 'priority' in query else None
+                    except ValueError:
+                        priority = None
+                    job = self.dragon_session.trigger_navigation_point(path, priority=priority, triggered_at=triggered_at)
+                    self.send_response(200 if job else 503)
                     self.send_header('Content-type', 'text/plain; charset=utf-8')
                     self.end_headers()
-                    self.wfile.write(f"✅ 导航点 {path} 已触发".encode('utf-8'))
+                    if job is None:
+                        self.wfile.write(f"❌ 导航点 {path} 调度失败".encode('utf-8'))
+                    elif job.coalesced:
+                        self.wfile.write(f"🔁 导航点 {path} 已在{job.state}，重复触发已合并".encode('utf-8'))
+                    else:
+                        self.wfile.write(f"✅ 导航点 {path} 已触发（任务#{job.job_id}，优先级{job.priority}）".encode('utf-8'))
                 else:
                     self.send_response(500)
                     self.send_header('Content-type', 'text/plain; charset=utf-8')
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+拼音音近匹配
+把命令词与语音识别文本的滑动窗口转换为不带声调的拼音音节，
+在按音节数分组的 BK 树中做有界距离检索，返回最接近的命令及置信度。
+新的同音/近音识别错误（西手间、钱进、座转……）无需再手工维护纠错表。
+
+音节距离（单位：1/4 音节，同长度窗口逐音节累加，满足度量公理）：
+- 0  完全相同
+- 1  模糊音等价（zh/z、ch/c、sh/s、n/l、r/l、f/h、an/ang、en/eng、in/ing、ian/iang、uan/uang）
+- 2  声母相同（模糊归一后）
+- 4  其它
+
+依赖 pypinyin（pip install pypinyin）；未安装时 PHONETIC_AVAILABLE=False，索引不会命中任何内容。
+"""
+
+import re
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from pypinyin import lazy_pinyin
+    PHONETIC_AVAILABLE = True
+except ImportError:
+    lazy_pinyin = None
+    PHONETIC_AVAILABLE = False
+
+_INITIALS = ("zh", "ch", "sh", "b", "p", "m", "f", "d", "t", "n", "l", "g", "k", "h",
+             "j", "q", "x", "r", "z", "c", "s", "y", "w")
+_FUZZY_INITIALS = {"zh": "z", "ch": "c", "sh": "s", "n": "l", "r": "l", "f": "h"}
+_FUZZY_FINALS = {"ang": "an", "eng": "en", "ing": "in", "iang": "ian", "uang": "uan"}
+HAN_RE = re.compile(r"[一-鿿]")
+
+# 单位：1/4 音节
+COST_FUZZY = 1
+COST_SAME_INITIAL = 2
+COST_DIFFERENT = 4
+
+
+def split_syllable(syllable: str) -> Tuple[str, str]:
+    for initial in _INITIALS:
+        if syllable.startswith(initial) and len(syllable) > len(initial):
+            return initial, syllable[len(initial):]
+    return "", syllable
+
+
+class _SyllableCodec:
+    """把音节映射为 (音节id, 模糊音id, 声母id) 三元组，距离计算只比较整数"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._cache: Dict[str, Tuple[int, int, int]] = {}
+
+    def _id(self, key: str) -> int:
+        value = self._ids.get(key)
+        if value is None:
+            value = self._ids[key] = len(self._ids)
+        return value
+
+    def encode(self, syllable: str) -> Tuple[int, int, int]:
+        code = self._cache.get(syllable)
+        if code is None:
+            initial, final = split_syllable(syllable)
+            initial = _FUZZY_INITIALS.get(initial, initial)
+            final = _FUZZY_FINALS.get(final, final)
+            code = (self._id("s:" + syllable), self._id("f:" + initial + "|" + final), self._id("i:" + initial))
+            self._cache[syllable] = code
+        return code
+
+
+def syllable_distance(a: Tuple[int, int, int], b: Tuple[int, int, int]) -> int:
+    if a[0] == b[0]:
+        return 0
+    if a[1] == b[1]:
+        return COST_FUZZY
+    if a[2] == b[2]:
+        return COST_SAME_INITIAL
+    return COST_DIFFERENT
+
+
+def sequence_distance(a: Tuple, b: Tuple) -> int:
+    """等长音节序列距离（逐音节累加）"""
+    return sum(syllable_distance(x, y) for x, y in zip(a, b))
+
+
+@lru_cache(maxsize=8192)
+def _char_pinyin(ch: str) -> str:
+    syllables = lazy_pinyin(ch)
+    return syllables[0] if syllables else ch.lower()
+
+
+def to_pinyin(text: str) -> List[str]:
+    """汉字逐字转不带声调拼音（取常用读音并缓存），输出与输入逐字对齐
+
+    不做整句分词消歧：命令词与识别文本使用同一套逐字读音，匹配结果一致，
+    且比整句转换快一个数量级。
+    """
+    if not PHONETIC_AVAILABLE:
+        return []
+    return [_char_pinyin(ch) for ch in text]
+
+
+class BKTree:
+    """BK 树：按度量距离组织，支持有界距离检索"""
+
+    def __init__(self):
+        self.root: Optional[list] = None  # [key, values, children{dist: node}]
+        self.size = 0
+
+    def add(self, key: Tuple, value: Any) -> None:
+        if self.root is None:
+            self.root = [key, [value], {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = sequence_distance(key, node[0])
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [value], {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, key: Tuple, max_distance: int) -> List[Tuple[int, Any]]:
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = sequence_distance(key, node[0])
+            if d <= max_distance:
+                for value in node[1]:
+                    results.append((d, value))
+            low, high = d - max_distance, d + max_distance
+            for dist, child in node[2].items():
+                if low <= dist <= high:
+                    stack.append(child)
+        return results
+
+
+@dataclass(frozen=True)
+class PhoneticMatch:
+    """一次音近命中"""
+    phrase: str          # 索引中的规范短语
+    value: Any           # 短语附带值（如 cmd_id）
+    start: int           # 原文起始位置
+    end: int             # 原文结束位置（不含）
+    matched_text: str    # 原文片段
+    distance: int        # 音节距离（1/4 音节单位）
+    confidence: float    # 1 - distance / (4 * 音节数)
+
+
+# 音近命中的采纳条件：短句（汉字数上限）、命中窗口覆盖大部分汉字、音近得分足够高。
+# 否则 "前景怎么样" -> 前进、"我想坐下" -> 向左 这类日常说话也会被当成命令或知识库问题
+PHONETIC_MAX_CHARS = 6
+PHONETIC_MIN_COVERAGE = 0.75
+PHONETIC_MIN_SCORE = 0.9
+
+
+def phonetic_acceptable(text: str, hit: PhoneticMatch) -> bool:
+    """音近命中是否可采纳：整句是短句（或就是命中的长短语本身）、窗口覆盖其大部分汉字，且音节几乎一致"""
+    han = len(HAN_RE.findall(text))
+    covered = len(HAN_RE.findall(hit.matched_text))
+    if not han or han > max(PHONETIC_MAX_CHARS, covered):
+        return False
+    return covered / han >= PHONETIC_MIN_COVERAGE and hit.confidence >= PHONETIC_MIN_SCORE
+
+
+class PhoneticIndex:
+    """拼音音近索引：按音节数分组的 BK 树"""
+
+    def __init__(self, max_error_ratio: float = 0.25, min_confidence: float = 0.75):
+        self.max_error_ratio = max_error_ratio
+        self.min_confidence = min_confidence
+        self._codec = _SyllableCodec()
+        self._trees: Dict[int, BKTree] = {}
+        # 每个长度的声母序列集合：允许距离小于 COST_DIFFERENT 时，命中必然声母逐一相同，
+        # 可先用集合查找剪掉绝大多数窗口，再进 BK 树计算精确距离
+        self._initials: Dict[int, set] = {}
+        self.phrase_count = 0
+
+    @property
+    def available(self) -> bool:
+        return PHONETIC_AVAILABLE and self.phrase_count > 0
+
+    def encode(self, syllables: Iterable[str]) -> Tuple:
+        return tuple(self._codec.encode(s) for s in syllables)
+
+    def add(self, phrase: str, value: Any = None) -> None:
+        """添加短语（仅汉字参与拼音索引）"""
+        han = "".join(HAN_RE.findall(phrase))
+        if not han or not PHONETIC_AVAILABLE:
+            return
+        key = self.encode(to_pinyin(han))
+        self._trees.setdefault(len(key), BKTree()).add(key, (phrase, value))
+        self._initials.setdefault(len(key), set()).add(tuple(c[2] for c in key))
+        self.phrase_count += 1
+
+    def max_distance(self, length: int) -> int:
+        # 两字短语只容忍一处模糊音，避免 "后天" -> "后退"、"想去" -> "向前" 这类误触发
+        if length <= 2:
+            return COST_FUZZY
+        return int(length * COST_DIFFERENT * self.max_error_ratio)
+
+    def search(self, text: str) -> List[PhoneticMatch]:
+        """在文本的所有等长汉字窗口中检索，返回满足置信度阈值的全部命中"""
+        if not self.available or not text:
+            return []
+        positions = [i for i, ch in enumerate(text) if HAN_RE.match(ch)]
+        if not positions:
+            return []
+        han = "".join(text[i] for i in positions)
+        codes = self.encode(to_pinyin(han))
+        initials = tuple(c[2] for c in codes)
+        matches = []
+        for length, tree in self._trees.items():
+            max_d = self.max_distance(length)
+            known_initials = self._initials[length] if max_d < COST_DIFFERENT else None
+            for i in range(0, len(codes) - length + 1):
+                if known_initials is not None and initials[i:i + length] not in known_initials:
+                    continue
+                window = codes[i:i + length]
+                for d, (phrase, value) in tree.search(window, max_d):
+                    confidence = 1.0 - d / float(COST_DIFFERENT * length)
+                    if confidence < self.min_confidence:
+                        continue
+                    start, end = positions[i], positions[i + length - 1] + 1
+                    matches.append(PhoneticMatch(phrase, value, start, end, text[start:end], d, confidence))
+        return matches
+
+    def best(self, text: str, accept: Optional[Callable[[Any], bool]] = None) -> Optional[PhoneticMatch]:
+        """置信度最高者；相同置信度取音节更长、位置更早者。accept 按附带值过滤候选"""
+        best = None
+        for m in self.search(text):
+            if accept is not None and not accept(m.value):
+                continue
+            if best is None or (-m.confidence, -(m.end - m.start), m.start) < (-best.confidence, -(best.end - best.start), best.start):
+                best = m
+        return best
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+知识库查询缓存
+检索中最耗时的一步是用 transformer 模型编码查询（CPU 上数十毫秒），而展厅游客整天在问
+几乎相同的问题。本模块提供进程内共享的两个有界 LRU（带 TTL）：
+
+- 查询嵌入缓存：键为 (模型名, 规范化查询文本)。嵌入只取决于模型与文本，知识库更新后仍然有效；
+- 检索结果缓存：键为 (知识库, 知识库版本, 模型名, 规范化查询文本, 检索参数)，缓存 Top-K 结果或上下文文本。
+
+知识库版本按知识库目录登记（bump_version），任何入库/删除/重建都会递增版本，
+旧版本的结果不再被命中，随 LRU 淘汰或 TTL 过期清出。同一目录的多个实例（如自动知识库管理器
+与会话各自持有的管理器）共享版本号，一方入库另一方的缓存同样失效。
+
+环境变量：
+    DRAGON_KB_EMBED_CACHE_SIZE       查询嵌入缓存条目上限（默认 1024；0 表示关闭）
+    DRAGON_KB_RESULT_CACHE_SIZE      检索结果缓存条目上限（默认 256；0 表示关闭）
+    DRAGON_KB_QUERY_CACHE_TTL_SEC    条目有效期（秒，默认 600；0 表示不过期）
+"""
+
+import copy
+import itertools
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 规范化时丢弃的 Unicode 类别前缀：标点(P)、控制及格式字符(C)；空白折叠为单个空格
+_DROPPED_CATEGORIES = ("P", "C")
+
+MISSING = object()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def normalize_query(text: str) -> str:
+    """缓存键：NFKC 折叠全角、转小写、去掉标点，连续空白折叠为一个空格（保留英文词边界）"""
+    if not text:
+        return ""
+    folded = unicodedata.normalize("NFKC", text).lower()
+    kept = "".join(" " if ch.isspace() else ch for ch in folded
+                   if ch.isspace() or unicodedata.category(ch)[0] not in _DROPPED_CATEGORIES)
+    return " ".join(kept.split())
+
+
+class QueryCache:
+    """线程安全的有界 LRU + TTL 缓存，统计命中率"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def get(self, key: Hashable) -> Any:
+        """命中返回缓存值，否则返回 MISSING"""
+        if self.maxsize <= 0:
+            self.stats["misses"] += 1
+            return MISSING
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl <= 0 or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return MISSING
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """命中直接返回；否则计算并写入（计算不持锁，重复计算同一键无副作用）；
+        cacheable 给定且对计算结果返回 False 时不写入"""
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self._entries), maxsize=self.maxsize, ttl=self.ttl,
+                        hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else None)
+
+
+_ttl = _env_float("DRAGON_KB_QUERY_CACHE_TTL_SEC", 600.0)
+embedding_cache = QueryCache("embeddings", _env_int("DRAGON_KB_EMBED_CACHE_SIZE", 1024), _ttl)
+result_cache = QueryCache("results", _env_int("DRAGON_KB_RESULT_CACHE_SIZE", 256), _ttl)
+
+_versions: Dict[str, int] = {}
+_versions_lock = threading.Lock()
+_scope_ids = itertools.count(1)
+
+
+def kb_scope(path: Any) -> str:
+    """知识库标识：目录的绝对路径"""
+    return os.path.abspath(str(path))
+
+
+def new_scope(prefix: str) -> str:
+    """未绑定目录的索引（如单独使用的 VectorSearchEngine）的唯一标识"""
+    return f"{prefix}#{next(_scope_ids)}"
+
+
+def params_key(**params: Any) -> Hashable:
+    """检索参数 -> 可哈希的缓存键（列表转元组，字典按键排序）"""
+    def freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items() if v is not None))
+        if isinstance(value, (list, tuple, set)):
+            return tuple(sorted(map(str, value)))
+        return value
+    return freeze(params)
+
+
+def kb_version(scope: str) -> int:
+    return _versions.get(scope, 0)
+
+
+def bump_version(scope: str) -> int:
+    """知识库内容变化（入库/删除/重建）：递增版本，该库此前的检索结果缓存不再命中"""
+    with _versions_lock:
+        _versions[scope] = _versions.get(scope, 0) + 1
+        return _versions[scope]
+
+
+def cached_embedding(model_name: str, query: str, encode: Callable[[str], Any]) -> Any:
+    """查询嵌入：按 (模型名, 规范化文本) 缓存；encode 接收原始查询文本"""
+    return embedding_cache.get_or_compute((model_name, normalize_query(query)), lambda: encode(query))
+
+
+def cached_result(scope: str, model_name: str, query: str, params: Hashable,
+                  compute: Callable[[], Any], cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+    """检索结果：按 (知识库, 版本, 模型名, 规范化文本, 参数) 缓存；返回副本，调用方可自由修改。
+    cacheable 对结果返回 False 时本次不缓存（如混合检索只有部分检索器在预算内完成）"""
+    key = (scope, kb_version(scope), model_name, normalize_query(query), params)
+    return copy.deepcopy(result_cache.get_or_compute(key, compute, cacheable))
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        "embeddings": embedding_cache.snapshot(),
+        "results": result_cache.snapshot(),
+        "kb_versions": dict(_versions),
+    }
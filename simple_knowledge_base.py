@@ -1,6 +1,6 @@
 """
 简化版本地知识库 - 无向量依赖
-纯关键词搜索，支持多种文件格式
+纯关键词搜索（BM25 倒排索引，中文按字二元组切分，见 bm25_index.py），支持多种文件格式
 """
 
 import os
@@ -10,6 +10,8 @@ from typing import List, Dict, Optional
 from datetime import datetime
 import logging
 
+from bm25_index import BM25Index, fingerprint
+
 # 文档处理相关
 try:
     import PyPDF2
@@ -142,6 +144,7 @@ class SimpleKnowledgeBase:
         self.knowledge_dir = knowledge_dir
         self.documents = []
         self.metadata = {}
+        self.index = BM25Index()
         
         self.ensure_directories()
         self.load_knowledge_base()
@@ -222,33 +225,34 @@ class SimpleKnowledgeBase:
         logger.info(f"✅ 已添加文档: {title} ({len(chunks)}个片段)")
         return True
     
+    @staticmethod
+    def _index_text(doc: Dict) -> str:
+        """参与检索的文本：标题 + 内容（标题中的词同样计分）"""
+        return f"{doc['title']}\n{doc['content']}"
+    
+    def _index_path(self) -> str:
+        return f"{self.knowledge_dir}/documents/bm25_index.npz"
+    
+    def _ensure_index(self):
+        """文档只追加不删除：把尚未入索引的片段补进倒排表"""
+        if len(self.index) > len(self.documents):
+            self.index.build([self._index_text(doc) for doc in self.documents])
+        elif len(self.index) < len(self.documents):
+            self.index.add([self._index_text(doc) for doc in self.documents[len(self.index):]])
+    
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        """简单关键词搜索"""
+        """关键词搜索（BM25）"""
         if not self.documents:
             return []
         
-        query_words = set(query.lower().split())
+        self._ensure_index()
+        rows, scores = self.index.search(query, top_k)
         results = []
-        
-        for doc in self.documents:
-            content_lower = doc['content'].lower()
-            title_lower = doc['title'].lower()
-            
-            # 计算匹配度
-            content_matches = sum(1 for word in query_words if word in content_lower)
-            title_matches = sum(1 for word in query_words if word in title_lower)
-            
-            # 标题匹配权重更高
-            total_score = content_matches + (title_matches * 2)
-            
-            if total_score > 0:
-                result = doc.copy()
-                result['score'] = total_score / len(query_words)
-                results.append(result)
-        
-        # 按得分排序
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:top_k]
+        for row, score in zip(rows, scores):
+            result = self.documents[row].copy()
+            result['score'] = float(score)
+            results.append(result)
+        return results
     
     def get_context_for_query(self, query: str, max_context_length: int = 1000) -> str:
         """为查询获取相关上下文"""
@@ -284,6 +288,10 @@ class SimpleKnowledgeBase:
         with open(meta_path, 'w', encoding='utf-8') as f:
             json.dump(self.metadata, f, ensure_ascii=False, indent=2)
         
+        # 保存倒排索引（与文档表放在一起）
+        self._ensure_index()
+        self.index.save(self._index_path(), fingerprint(self._index_text(doc) for doc in self.documents))
+        
         logger.info("知识库已保存")
     
     def load_knowledge_base(self):
@@ -301,6 +309,11 @@ class SimpleKnowledgeBase:
                 with open(meta_path, 'r', encoding='utf-8') as f:
                     self.metadata = json.load(f)
                 logger.info(f"📋 已加载 {len(self.metadata)} 个文件的元数据")
+            
+            # 加载倒排索引；不存在或与文档不一致时在首次检索前重建
+            index = BM25Index.load(self._index_path(), fingerprint(self._index_text(doc) for doc in self.documents))
+            if index is not None:
+                self.index = index
         except Exception as e:
             logger.error(f"加载知识库失败: {e}")
     
@@ -325,6 +338,7 @@ class SimpleKnowledgeBase:
             'total_chunks': len(self.documents),
             'file_types': file_types,
             'categories': categories,
+            'bm25': self.index.snapshot(),
             'last_updated': datetime.now().isoformat()
         }
 
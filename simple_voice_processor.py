@@ -4,9 +4,10 @@
 用于WSL2环境下的语音控制演示
 """
 
-import re
 from typing import Dict, Any, Optional
 
+from intent_engine import get_intent_engine
+
 class DragonVoiceProcessor:
     """Dragon机器人语音命令处理器"""
     
@@ -15,50 +16,9 @@ class DragonVoiceProcessor:
         self.setup_command_patterns()
     
     def setup_command_patterns(self):
-        """设置语音命令模式"""
-        
-        # 移动命令模式
-        self.movement_patterns = {
-            r'(前进|向前|往前)': {'action': 'move', 'params': {'direction': 'forward'}},
-            r'(后退|向后|往后)': {'action': 'move', 'params': {'direction': 'backward'}},
-            r'(向左|往左|左转)': {'action': 'move', 'params': {'direction': 'left'}},
-            r'(向右|往右|右转)': {'action': 'move', 'params': {'direction': 'right'}},
-        }
-        
-        # 旋转命令模式
-        self.rotation_patterns = {
-            r'(转身|掉头)': {'action': 'rotate', 'params': {'angle': 180}},
-            r'(左转|向左转)': {'action': 'rotate', 'params': {'angle': -90}},
-            r'(右转|向右转)': {'action': 'rotate', 'params': {'angle': 90}},
-        }
-        
-        # 关节控制命令模式
-        self.joint_patterns = {
-            r'(抬起|举起|抬).*?(左手|左臂)': {'action': 'joint', 'params': {'joint': 'left_arm', 'action': 'raise'}},
-            r'(放下|降下|落下).*?(左手|左臂)': {'action': 'joint', 'params': {'joint': 'left_arm', 'action': 'lower'}},
-            r'(抬起|举起|抬).*?(右手|右臂)': {'action': 'joint', 'params': {'joint': 'right_arm', 'action': 'raise'}},
-            r'(放下|降下|落下).*?(右手|右臂)': {'action': 'joint', 'params': {'joint': 'right_arm', 'action': 'lower'}},
-            r'(抬起|举起|抬).*?(左腿|左脚)': {'action': 'joint', 'params': {'joint': 'left_leg', 'action': 'raise'}},
-            r'(放下|降下|落下).*?(左腿|左脚)': {'action': 'joint', 'params': {'joint': 'left_leg', 'action': 'lower'}},
-            r'(抬起|举起|抬).*?(右腿|右脚)': {'action': 'joint', 'params': {'joint': 'right_leg', 'action': 'raise'}},
-            r'(放下|降下|落下).*?(右腿|右脚)': {'action': 'joint', 'params': {'joint': 'right_leg', 'action': 'lower'}},
-        }
-        
-        # 控制命令模式
-        self.control_patterns = {
-            r'(停止|停下|暂停)': {'action': 'stop', 'params': {}},
-            r'(快一点|快点|加速)': {'action': 'speed', 'params': {'level': 2}},
-            r'(慢一点|慢点|减速)': {'action': 'speed', 'params': {'level': 1}},
-            r'(蹲下|下蹲)': {'action': 'pose', 'params': {'pose': 'squat'}},
-            r'(站起|起立|站立)': {'action': 'pose', 'params': {'pose': 'stand'}},
-        }
-        
-        # 合并所有模式
-        self.all_patterns = {}
-        self.all_patterns.update(self.movement_patterns)
-        self.all_patterns.update(self.rotation_patterns)
-        self.all_patterns.update(self.joint_patterns)
-        self.all_patterns.update(self.control_patterns)
+        """设置语音命令模式：命令短语来自共享意图引擎（voice_commands.json）"""
+        self.intent_engine = get_intent_engine()
+        self.intents = self.intent_engine.intents_for("simple")
     
     def parse_voice_command(self, voice_text: str) -> Optional[Dict[str, Any]]:
         """
@@ -76,33 +36,39 @@ class DragonVoiceProcessor:
         # 清理输入文本
         voice_text = voice_text.strip().lower()
         
-        # 尝试匹配所有模式
-        for pattern, command in self.all_patterns.items():
-            if re.search(pattern, voice_text):
-                return command.copy()
+        # 单次扫描：命令短语、"抬起…左手"类序列与单字方向关键词；按命令表顺序取第一个命中的意图
+        match = self.intent_engine.match(voice_text, self.intents, keywords=True, ordered=True)
+        if match is not None:
+            command = self.to_command(match.spec)
+            if command is not None:
+                return command
         
         # 如果没有匹配到特定模式，尝试关键词匹配
         return self.fallback_keyword_match(voice_text)
     
+    @staticmethod
+    def to_command(spec) -> Optional[Dict[str, Any]]:
+        """意图 -> {'action', 'params'} 命令字典"""
+        kind = spec.get('type')
+        if kind == 'movement':
+            return {'action': 'move', 'params': {'direction': spec.get('direction')}}
+        if kind == 'rotation':
+            return {'action': 'rotate', 'params': {'angle': spec.get('angle')}}
+        if kind == 'joint':
+            return {'action': 'joint', 'params': {'joint': spec.get('joint'), 'action': spec.get('joint_action')}}
+        if kind == 'control' and spec.get('action') == 'stop':
+            return {'action': 'stop', 'params': {}}
+        if kind == 'speed':
+            return {'action': 'speed', 'params': {'level': spec.get('level')}}
+        if kind == 'pose':
+            return {'action': 'pose', 'params': {'pose': spec.get('pose')}}
+        return None
+    
     def fallback_keyword_match(self, voice_text: str) -> Optional[Dict[str, Any]]:
         """备用关键词匹配"""
         
-        # 方向关键词
-        if any(keyword in voice_text for keyword in ['前', '进']):
-            return {'action': 'move', 'params': {'direction': 'forward'}}
-        elif any(keyword in voice_text for keyword in ['后', '退']):
-            return {'action': 'move', 'params': {'direction': 'backward'}}
-        elif any(keyword in voice_text for keyword in ['左']):
-            return {'action': 'move', 'params': {'direction': 'left'}}
-        elif any(keyword in voice_text for keyword in ['右']):
-            return {'action': 'move', 'params': {'direction': 'right'}}
-        
-        # 停止关键词
-        elif any(keyword in voice_text for keyword in ['停', '止']):
-            return {'action': 'stop', 'params': {}}
-        
-        # 手臂关键词
-        elif '手' in voice_text or '臂' in voice_text:
+        # 方向/停止单字关键词已编入意图引擎（keywords=True），这里仅处理手臂关键词
+        if '手' in voice_text or '臂' in voice_text:
             if '抬' in voice_text or '举' in voice_text:
                 side = 'left' if '左' in voice_text else 'right'
                 return {'action': 'joint', 'params': {'joint': f'{side}_arm', 'action': 'raise'}}
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+流式 ASR 推测式意图
+消费事件 451 的流式中间结果，在"稳定前缀"（最近若干条中间结果的公共前缀）上
+提前运行命令匹配：稳定前缀命中且置信度达到阈值即提前下发（拼音音近命中从不在中间
+结果上下发）；最终结果不一致时撤回（停止）并按最终结果重新下发，一致时不再重复下发。
+
+环境变量：
+    DRAGON_SPECULATIVE_INTENT        1/0，是否启用（默认 1）
+    DRAGON_SPECULATIVE_THRESHOLD     提前下发命令的最低置信度（默认 0.9，即仅精确命中）
+    DRAGON_SPECULATIVE_STABLE        计算稳定前缀所需的连续中间结果条数（默认 2）
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def speculative_enabled() -> bool:
+    return os.environ.get("DRAGON_SPECULATIVE_INTENT", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def common_prefix(texts: List[str]) -> str:
+    if not texts:
+        return ""
+    shortest = min(texts, key=len)
+    for i, ch in enumerate(shortest):
+        for text in texts:
+            if text[i] != ch:
+                return shortest[:i]
+    return shortest
+
+
+class SpeculativeIntentStage:
+    """推测式意图阶段（每个会话一个实例，事件回调线程调用）
+
+    matcher(text)        -> 命中对象或 None（需有 cmd_id、confidence、end 属性）
+    dispatch(match)      下发命令
+    retract(match)       撤回已下发的推测命令
+    """
+
+    def __init__(self,
+                 matcher: Callable[[str], Any],
+                 dispatch: Callable[[Any], Any],
+                 retract: Optional[Callable[[Any], Any]] = None,
+                 commit_threshold: Optional[float] = None,
+                 stable_partials: Optional[int] = None):
+        self.matcher = matcher
+        self.dispatch = dispatch
+        self.retract = retract
+        self.commit_threshold = commit_threshold if commit_threshold is not None else \
+            _env_float("DRAGON_SPECULATIVE_THRESHOLD", 0.9)
+        self.stable_partials = max(1, stable_partials if stable_partials is not None else
+                                   _env_int("DRAGON_SPECULATIVE_STABLE", 2))
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "partials": 0,
+            "finals": 0,
+            "commands_committed": 0,
+            "commands_confirmed": 0,
+            "commands_retracted": 0,
+            "commands_on_final": 0,
+        }
+        self._reset_utterance()
+
+    def _reset_utterance(self) -> None:
+        self._partials: List[str] = []
+        self._last_prefix = ""
+        self._committed = None
+        self._finalized = False
+
+    def reset(self) -> None:
+        """新一轮用户说话（事件 450）：丢弃上一轮未完成的推测"""
+        with self._lock:
+            self._reset_utterance()
+
+    def stable_prefix(self) -> str:
+        if len(self._partials) < self.stable_partials:
+            return ""
+        return common_prefix(self._partials[-self.stable_partials:])
+
+    def on_partial(self, text: str) -> None:
+        """消费一条中间结果"""
+        text = (text or "").strip()
+        if not text:
+            return
+        with self._lock:
+            if self._finalized:
+                return
+            self.stats["partials"] += 1
+            # 重复的中间结果同样说明前缀已稳定；仅保留计算稳定前缀所需的最近几条
+            self._partials.append(text)
+            del self._partials[:-self.stable_partials]
+            prefix = self.stable_prefix()
+            if not prefix or prefix == self._last_prefix:
+                return
+            self._last_prefix = prefix
+
+            if self._committed is None:
+                match = self.matcher(prefix)
+                if match is not None and not getattr(match, "phonetic", False) \
+                        and match.confidence >= self.commit_threshold:
+                    self._committed = match
+                    self.stats["commands_committed"] += 1
+                    print(f"⚡ [推测意图] 稳定前缀 '{prefix}' 提前下发 {match.cmd_id}")
+                    self.dispatch(match)
+
+    def on_final(self, text: str) -> Optional[Any]:
+        """消费最终结果：确认或撤回推测命令，返回本轮最终生效的命令（可能为 None）"""
+        text = (text or "").strip()
+        with self._lock:
+            if self._finalized:
+                return self._committed
+            self._finalized = True
+            self.stats["finals"] += 1
+            if not text and self._partials:
+                text = self._partials[-1]
+            final_match = self.matcher(text) if text else None
+
+            committed = self._committed
+            if committed is not None:
+                if final_match is not None and final_match.cmd_id == committed.cmd_id:
+                    self.stats["commands_confirmed"] += 1
+                else:
+                    self.stats["commands_retracted"] += 1
+                    print(f"↩️ [推测意图] 最终结果 '{text}' 与推测命令 {committed.cmd_id} 不一致，撤回")
+                    if self.retract is not None:
+                        self.retract(committed)
+                    committed = None
+            if committed is None and final_match is not None:
+                self.stats["commands_on_final"] += 1
+                self.dispatch(final_match)
+                committed = final_match
+            self._committed = committed
+            return committed
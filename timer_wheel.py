@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+事件循环上的分层时间轮
+会话里的各种看门狗（导航播报超时、导航音频回退、导航静默判定、硬重启延时）统一注册到
+一个时间轮，不再各自 call_later / threading.Timer / 播放线程轮询：
+
+- 三层时间轮，每层 64 槽，刻度 50ms：第 0 层覆盖 3.2s，第 1 层 204.8s，第 2 层约 3.6 小时；
+  到期较远的定时器放在高层，跨越边界时逐层下沉，增删改均为 O(1)；
+- 定时器按层级名称注册（如 "nav/timeout"、"nav/silence"），同名再次注册即重新计时（re-arm），
+  可按名称或名称前缀（"nav/"）取消；
+- 事件循环只在最近的非空槽到期时唤醒一次，无定时器时完全空闲；唤醒时直接跳到下一个非空槽
+  （或高层下沉边界），空闲后首次注册先把当前刻度对齐到现在，不逐刻度补走空闲期间的刻度；
+- 回调在事件循环线程中执行；任意线程均可注册/取消/重新计时。
+
+环境变量：
+    DRAGON_TIMER_TICK_MS   时间轮刻度（毫秒，默认 50）
+"""
+
+import asyncio
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+SLOTS = 64
+LEVELS = 3
+_SLOT_BITS = 6  # log2(SLOTS)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class Timer:
+    """时间轮中的一个定时器"""
+
+    __slots__ = ("name", "callback", "deadline", "expiry_tick", "wheel", "active", "_slot")
+
+    def __init__(self, wheel: "TimerWheel", name: str, callback: Callable[[], Any]):
+        self.wheel = wheel
+        self.name = name
+        self.callback = callback
+        self.deadline = 0.0
+        self.expiry_tick = 0
+        self.active = False
+        self._slot: Optional[Set["Timer"]] = None
+
+    def cancel(self) -> None:
+        self.wheel.cancel(self.name, timer=self)
+
+    def rearm(self, delay: float) -> "Timer":
+        """重新计时（沿用回调）"""
+        return self.wheel.schedule(self.name, delay, self.callback)
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - self.wheel.time()) if self.active else 0.0
+
+
+class TimerWheel:
+    """事件循环上的分层时间轮"""
+
+    def __init__(self, tick: Optional[float] = None):
+        self.tick = tick if tick is not None else _env_float("DRAGON_TIMER_TICK_MS", 50.0) / 1000.0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._origin = 0.0
+        self._current_tick = 0
+        self._wheels: List[List[Set[Timer]]] = [[set() for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._timers: Dict[str, Timer] = {}
+        self._lock = threading.RLock()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_tick: Optional[int] = None
+        self.stats: Dict[str, int] = {"scheduled": 0, "rearmed": 0, "cancelled": 0, "fired": 0, "wakeups": 0}
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """绑定事件循环（默认当前运行的循环）"""
+        self.loop = loop or asyncio.get_running_loop()
+        self._origin = self.loop.time()
+        self._current_tick = 0
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and not self.loop.is_closed()
+
+    def time(self) -> float:
+        return self.loop.time() if self.loop is not None else 0.0
+
+    def _now_tick(self) -> int:
+        return int((self.loop.time() - self._origin) / self.tick + 1e-9)
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    # ------------------------------------------------------------------
+    # 注册 / 取消
+    # ------------------------------------------------------------------
+    def schedule(self, name: str, delay: float, callback: Callable[[], Any]) -> Timer:
+        """注册定时器；同名定时器已存在时重新计时并替换回调"""
+        if not self.running:
+            raise RuntimeError("时间轮未绑定事件循环")
+        with self._lock:
+            if not self._timers:
+                # 时间轮空闲：各槽均为空，当前刻度直接对齐到现在
+                self._current_tick = max(self._current_tick, self._now_tick())
+            timer = self._timers.get(name)
+            if timer is not None and timer.active:
+                self._unlink(timer)
+                self.stats["rearmed"] += 1
+            else:
+                timer = Timer(self, name, callback)
+                self._timers[name] = timer
+                self.stats["scheduled"] += 1
+            timer.callback = callback
+            timer.deadline = self.time() + max(delay, 0.0)
+            timer.expiry_tick = max(self._current_tick + 1,
+                                    math.ceil((timer.deadline - self._origin) / self.tick))
+            timer.active = True
+            self._link(timer)
+        self._request_wakeup(timer.expiry_tick)
+        return timer
+
+    def cancel(self, name: str, timer: Optional[Timer] = None) -> bool:
+        """按名称取消；timer 给定时仅当名称仍指向该定时器才取消"""
+        with self._lock:
+            current = self._timers.get(name)
+            if current is None or (timer is not None and current is not timer) or not current.active:
+                return False
+            self._unlink(current)
+            current.active = False
+            del self._timers[name]
+            self.stats["cancelled"] += 1
+            return True
+
+    def cancel_prefix(self, prefix: str) -> int:
+        """取消名称以 prefix 开头的全部定时器（如 "nav/"）"""
+        with self._lock:
+            names = [name for name in self._timers if name.startswith(prefix)]
+        return sum(1 for name in names if self.cancel(name))
+
+    def get(self, name: str) -> Optional[Timer]:
+        timer = self._timers.get(name)
+        return timer if timer is not None and timer.active else None
+
+    # ------------------------------------------------------------------
+    # 槽位管理
+    # ------------------------------------------------------------------
+    def _link(self, timer: Timer) -> None:
+        delta = timer.expiry_tick - self._current_tick
+        for level in range(LEVELS):
+            if delta < SLOTS << (_SLOT_BITS * level) or level == LEVELS - 1:
+                index = (timer.expiry_tick >> (_SLOT_BITS * level)) % SLOTS
+                slot = self._wheels[level][index]
+                break
+        slot.add(timer)
+        timer._slot = slot
+
+    def _unlink(self, timer: Timer) -> None:
+        if timer._slot is not None:
+            timer._slot.discard(timer)
+            timer._slot = None
+
+    def _next_tick(self) -> Optional[int]:
+        """最近需要处理的刻度：第 0 层最近的非空槽，或高层最近非空槽的下沉边界"""
+        if not self._timers:
+            return None
+        current = self._current_tick
+        for offset in range(1, SLOTS + 1):
+            tick = current + offset
+            if self._wheels[0][tick % SLOTS]:
+                return tick
+        for level in range(1, LEVELS):
+            shift = _SLOT_BITS * level
+            base = current >> shift
+            for offset in range(1, SLOTS + 1):
+                if self._wheels[level][(base + offset) % SLOTS]:
+                    return (base + offset) << shift
+        return current + (SLOTS << (_SLOT_BITS * (LEVELS - 1)))
+
+    # ------------------------------------------------------------------
+    # 驱动
+    # ------------------------------------------------------------------
+    def _request_wakeup(self, tick: int) -> None:
+        if self._in_loop():
+            self._arm(tick)
+        elif self.running:
+            self.loop.call_soon_threadsafe(self._arm, tick)
+
+    def _arm(self, tick: Optional[int] = None) -> None:
+        """（事件循环线程）确保在 tick 或更早时唤醒"""
+        with self._lock:
+            target = self._next_tick() if tick is None else tick
+            if target is None:
+                return
+            if self._wakeup is not None:
+                if self._wakeup_tick is not None and self._wakeup_tick <= target:
+                    return
+                self._wakeup.cancel()
+            self._wakeup_tick = target
+            self._wakeup = self.loop.call_at(self._origin + target * self.tick, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self.stats["wakeups"] += 1
+        due: List[Timer] = []
+        with self._lock:
+            self._wakeup = None
+            self._wakeup_tick = None
+            target = self._now_tick()
+            while self._current_tick < target:
+                # 跳到下一个非空槽或下沉边界；其间的刻度没有定时器需要处理
+                next_tick = self._next_tick()
+                if next_tick is None or next_tick > target:
+                    self._current_tick = target
+                    break
+                self._current_tick = next_tick
+                self._cascade()
+                slot = self._wheels[0][self._current_tick % SLOTS]
+                for timer in list(slot):
+                    if timer.expiry_tick <= self._current_tick:
+                        self._unlink(timer)
+                        timer.active = False
+                        if self._timers.get(timer.name) is timer:
+                            del self._timers[timer.name]
+                        due.append(timer)
+        for timer in due:
+            self.stats["fired"] += 1
+            try:
+                timer.callback()
+            except Exception as e:
+                print(f"⚠️ 定时器 {timer.name} 回调异常: {e}")
+        self._arm()
+
+    def _cascade(self) -> None:
+        """跨越高层槽边界时，把该槽的定时器下沉到更低层"""
+        for level in range(LEVELS - 1, 0, -1):
+            shift = _SLOT_BITS * level
+            if self._current_tick % (1 << shift):
+                continue
+            slot = self._wheels[level][(self._current_tick >> shift) % SLOTS]
+            timers = list(slot)
+            slot.clear()
+            for timer in timers:
+                timer._slot = None
+                self._link(timer)
+
+    # ------------------------------------------------------------------
+    # 观测
+    # ------------------------------------------------------------------
+    def pending(self) -> List[Dict[str, Any]]:
+        """待触发定时器（按剩余时间排序）"""
+        with self._lock:
+            timers = [t for t in self._timers.values() if t.active]
+        return sorted(({"name": t.name, "remaining_sec": round(t.remaining(), 3)} for t in timers),
+                      key=lambda item: item["remaining_sec"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"tick_ms": self.tick * 1000, "pending": self.pending(), "stats": dict(self.stats)}
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+本地 TTS 音频缓存
+导航讲解词是固定文本，每次触发都要把整段文字发给云端再等 TTS 回传才能开口。
+缓存以 (音色, 文本哈希, 线上采样格式, 采样率) 为键保存原始 PCM：
+
+- 首次播放时录制（收到云端 TTS 结束事件且时长与文本相符才写入，被打断/强制恢复/时长过短则丢弃）；
+- 或离线预热：python3 tts_audio_cache.py --warm，对导航路线表（navigation_routes.json，缓存策略非 none）
+  的讲解词与固定回复（canned_responses.json）调用云端 chat_tts_text 合成；
+- 命中后音频直接送入播放队列，不经网络，也不产生云端 TTS 费用。
+
+文件布局：<cache_dir>/<key>.pcm 为音频，<key>.json 为元数据（音色、格式、文本、时长）。
+
+环境变量：
+    DRAGON_TTS_CACHE            是否启用（默认 1）
+    DRAGON_TTS_CACHE_DIR        缓存目录（默认 ./tts_cache）
+    DRAGON_TTS_CACHE_RECORD     首次播放时是否录制写入缓存（默认 1）
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "tts_cache")
+DEFAULT_SPEAKER = "zh_male_yunzhou_jupiter_bigtts"
+DEFAULT_SAMPLE_RATE = 24000
+
+# 导航讲解词以该指令开头，要求模型逐字复述；真正播报的是冒号之后的文字
+REPEAT_INSTRUCTION = "请你一字不落的重复下列文字："
+
+# 录制上限（字节），防止异常情况下无限增长（约 24kHz Float32 单声道 5 分钟）
+MAX_CAPTURE_BYTES = 24000 * 4 * 300
+
+# 播报语速上限（字/秒）：录制时长低于 文本字数 / 该值 视为音频流中途断开，不写入缓存
+MAX_CHARS_PER_SEC = 8.0
+
+
+def spoken_text(prompt: str) -> str:
+    """导航提示中实际播报的文字（去掉逐字复述指令）"""
+    if prompt.startswith(REPEAT_INSTRUCTION):
+        return prompt[len(REPEAT_INSTRUCTION):]
+    return prompt
+
+
+def cache_key(speaker: str, text: str, wire_format: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> str:
+    digest = hashlib.sha256(f"{speaker}\n{wire_format}\n{sample_rate}\n{text}".encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+def min_duration_sec(text: str) -> float:
+    """按语速上限估算一段文本播报的最短时长（只计文字与数字，不计标点空白）"""
+    return sum(1 for ch in text if ch.isalnum()) / MAX_CHARS_PER_SEC
+
+
+def tts_cache_enabled() -> bool:
+    return os.environ.get("DRAGON_TTS_CACHE", "1") != "0"
+
+
+class TTSAudioCache:
+    """按 (音色, 文本, 格式, 采样率) 缓存合成音频的本地存储"""
+
+    def __init__(self, cache_dir: Optional[str] = None, record: Optional[bool] = None):
+        self.cache_dir = cache_dir or os.environ.get("DRAGON_TTS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.record = record if record is not None else os.environ.get("DRAGON_TTS_CACHE_RECORD", "1") != "0"
+        self._memory: Dict[str, bytes] = {}
+        self._capture: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "invalidated": 0,
+            "captures_discarded": 0,
+            "captures_truncated": 0,
+        }
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".pcm", base + ".json"
+
+    def get(self, speaker: str, text: str, wire_format: str,
+            sample_rate: int = DEFAULT_SAMPLE_RATE) -> Optional[bytes]:
+        """取缓存音频；内存未命中时从磁盘加载"""
+        key = cache_key(speaker, text, wire_format, sample_rate)
+        with self._lock:
+            audio = self._memory.get(key)
+        if audio is None:
+            audio_path, _meta_path = self._paths(key)
+            try:
+                with open(audio_path, "rb") as f:
+                    audio = f.read()
+            except OSError:
+                audio = None
+            if audio:
+                with self._lock:
+                    self._memory[key] = audio
+        with self._lock:
+            self.stats["hits" if audio else "misses"] += 1
+        return audio or None
+
+    def contains(self, speaker: str, text: str, wire_format: str,
+                 sample_rate: int = DEFAULT_SAMPLE_RATE) -> bool:
+        key = cache_key(speaker, text, wire_format, sample_rate)
+        return key in self._memory or os.path.exists(self._paths(key)[0])
+
+    def put(self, speaker: str, text: str, wire_format: str, audio: bytes,
+            sample_rate: int = DEFAULT_SAMPLE_RATE, sample_width: Optional[int] = None) -> str:
+        """写入缓存（先写临时文件再原子替换）；返回缓存键"""
+        key = cache_key(speaker, text, wire_format, sample_rate)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        audio_path, meta_path = self._paths(key)
+        meta = {
+            "speaker": speaker,
+            "format": wire_format,
+            "sample_rate": sample_rate,
+            "text": text,
+            "bytes": len(audio),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if sample_width:
+            meta["duration_sec"] = round(len(audio) / (sample_width * sample_rate), 2)
+        for path, data in ((audio_path, audio), (meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._memory[key] = audio
+            self.stats["stored"] += 1
+        return key
+
+    def invalidate(self, speaker: str, text: str, wire_format: str,
+                   sample_rate: int = DEFAULT_SAMPLE_RATE) -> bool:
+        """删除一段文本的缓存音频（讲解词变更后旧音频作废）；返回是否存在"""
+        key = cache_key(speaker, text, wire_format, sample_rate)
+        with self._lock:
+            existed = self._memory.pop(key, None) is not None
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+                existed = True
+            except OSError:
+                pass
+        if existed:
+            with self._lock:
+                self.stats["invalidated"] += 1
+        return existed
+
+    # ------------------------------------------------------------------
+    # 首次播放录制
+    # ------------------------------------------------------------------
+    def begin_capture(self, speaker: str, text: str, wire_format: str,
+                      sample_rate: int = DEFAULT_SAMPLE_RATE, sample_width: Optional[int] = None) -> bool:
+        """开始录制一段播报；未启用录制时返回 False"""
+        if not self.record:
+            return False
+        with self._lock:
+            self._capture = {
+                "speaker": speaker,
+                "text": text,
+                "wire_format": wire_format,
+                "sample_rate": sample_rate,
+                "sample_width": sample_width,
+                "chunks": [],
+                "size": 0,
+            }
+        return True
+
+    def capture(self, chunk: bytes) -> None:
+        """追加播报音频包（无录制时为空操作）"""
+        capture = self._capture
+        if capture is None:
+            return
+        with self._lock:
+            if self._capture is not capture:
+                return
+            if capture["size"] + len(chunk) > MAX_CAPTURE_BYTES:
+                self._capture = None
+                self.stats["captures_discarded"] += 1
+                return
+            capture["chunks"].append(chunk)
+            capture["size"] += len(chunk)
+
+    def commit_capture(self) -> Optional[str]:
+        """播报正常结束：写入缓存，返回缓存键（无音频或时长明显短于文本时不写入）"""
+        with self._lock:
+            capture, self._capture = self._capture, None
+        if capture is None:
+            return None
+        if not capture["size"]:
+            with self._lock:
+                self.stats["captures_discarded"] += 1
+            return None
+        sample_width = capture["sample_width"]
+        if sample_width:
+            duration = capture["size"] / (sample_width * capture["sample_rate"])
+            expected = min_duration_sec(capture["text"])
+            if duration < expected:
+                print(f"⚠️ 录制音频 {duration:.2f}s 短于讲解词最短时长 {expected:.2f}s，疑似截断，不写入缓存")
+                with self._lock:
+                    self.stats["captures_truncated"] += 1
+                return None
+        return self.put(capture["speaker"], capture["text"], capture["wire_format"],
+                        b"".join(capture["chunks"]), capture["sample_rate"], capture["sample_width"])
+
+    def abort_capture(self) -> None:
+        """播报被打断或强制恢复：丢弃录制"""
+        with self._lock:
+            if self._capture is not None:
+                self._capture = None
+                self.stats["captures_discarded"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, entries_in_memory=len(self._memory),
+                        memory_bytes=sum(len(a) for a in self._memory.values()),
+                        capturing=self._capture is not None, cache_dir=self.cache_dir)
+
+
+# ----------------------------------------------------------------------
+# 离线预热
+# ----------------------------------------------------------------------
+async def synthesize(client: Any, text: str, timeout: float = 60.0) -> bytes:
+    """经已建立会话的 RealtimeDialogClient 合成一段文本，收集音频直到 TTS 结束（事件359）"""
+    await client.chat_tts_text(is_user_querying=False, start=True, end=True, content=text)
+    chunks: List[bytes] = []
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"TTS合成超时 ({timeout}s)")
+        response = await asyncio.wait_for(client.receive_server_response(), timeout=remaining)
+        message_type = response.get("message_type")
+        if message_type == "SERVER_ACK" and isinstance(response.get("payload_msg"), bytes):
+            chunks.append(response["payload_msg"])
+        elif message_type == "SERVER_ERROR":
+            raise RuntimeError(f"服务器错误: {response.get('payload_msg')}")
+        elif response.get("event") == 359 and chunks:
+            return b"".join(chunks)
+
+
+async def warm_up(cache: TTSAudioCache, texts: Iterable[str], speaker: str, wire_format: Any,
+                  sample_rate: int = DEFAULT_SAMPLE_RATE, force: bool = False) -> Dict[str, int]:
+    """为尚未缓存的文本调用云端 TTS 合成并写入缓存"""
+    texts = list(texts)
+    pending = [t for t in texts if force or not cache.contains(speaker, t, wire_format.name, sample_rate)]
+    result = {"cached": len(texts) - len(pending), "synthesized": 0, "failed": 0}
+    if not pending:
+        return result
+
+    official_dir = os.path.join(BASE_DIR, "official_example")
+    if official_dir not in sys.path:
+        sys.path.append(official_dir)
+    from realtime_dialog_client import RealtimeDialogClient
+    import config as official_config
+    from audio_format import apply_to_start_session
+
+    ws_config = dict(official_config.ws_connect_config)
+    ws_config["headers"] = dict(ws_config["headers"])
+    ws_config["headers"]["X-Api-Connect-Id"] = str(uuid.uuid4())
+    start_session_req = dict(official_config.start_session_req)
+    start_session_req["tts"] = {
+        "speaker": speaker,
+        "audio_config": {"channel": 1, "format": wire_format.name, "sample_rate": sample_rate},
+    }
+    client = RealtimeDialogClient(config=ws_config, session_id=str(uuid.uuid4()),
+                                  output_audio_format=wire_format.name)
+    client.start_session_req = apply_to_start_session(start_session_req, wire_format)
+    await client.connect()
+    try:
+        for text in pending:
+            try:
+                audio = await synthesize(client, text)
+                cache.put(speaker, text, wire_format.name, audio, sample_rate, wire_format.sample_width)
+                result["synthesized"] += 1
+                print(f"✅ 已缓存 {len(audio)} 字节: {text[:30]}...")
+            except Exception as e:
+                result["failed"] += 1
+                print(f"⚠️ 合成失败: {text[:30]}... ({e})")
+    finally:
+        try:
+            await client.finish_session()
+            await client.finish_connection()
+        except Exception:
+            pass
+        await client.close()
+    return result
+
+
+def _default_speaker() -> str:
+    try:
+        from voice_config import VoiceConfig
+        return VoiceConfig().get_current_config()["speaker"]
+    except Exception:
+        return DEFAULT_SPEAKER
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地TTS音频缓存")
+    parser.add_argument("--warm", action="store_true", help="离线预热：合成全部导航讲解词与固定回复")
+    parser.add_argument("--speaker", default=None, help="音色ID（默认取 voice_config 当前音色）")
+    parser.add_argument("--format", default="pcm_s16le", help="线上采样格式（pcm_s16le / pcm），需与会话协商结果一致")
+    parser.add_argument("--force", action="store_true", help="已缓存的文本也重新合成")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录")
+    args = parser.parse_args()
+
+    from audio_format import resolve_wire_format
+    wire_format = resolve_wire_format(args.format)
+    if wire_format is None:
+        parser.error(f"未知采样格式: {args.format}")
+    speaker = args.speaker or _default_speaker()
+    cache = TTSAudioCache(cache_dir=args.cache_dir)
+
+    from navigation_routes import NavigationRoutes
+    from canned_responses import CannedResponses
+    texts = [r.script for r in NavigationRoutes().ordered() if r.cacheable] + CannedResponses().texts()
+    print(f"🗂️ TTS缓存目录: {cache.cache_dir} | 音色: {speaker} | 格式: {wire_format.name}")
+    for text in texts:
+        state = "✅" if cache.contains(speaker, text, wire_format.name) else "❌"
+        print(f"   {state} {text[:40]}...")
+    if args.warm:
+        result = asyncio.run(warm_up(cache, texts, speaker, wire_format, force=args.force))
+        print(f"🔥 预热完成: 已有 {result['cached']} | 新合成 {result['synthesized']} | 失败 {result['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from typing import List, Dict, Any
 import requests
 from dotenv import load_dotenv
 
+from intent_engine import get_intent_engine
+
 load_dotenv()
 
 API_KEY = os.getenv("DOUBAO_API_KEY", "")
@@ -49,27 +51,33 @@ class AgentReply:
     commands: List[Dict[str, Any]]
 
 
+# 本地兜底可识别的机器人意图 -> 回复文本（命令短语来自共享意图引擎 voice_commands.json）
+_FALLBACK_REPLIES = {
+    "raise_left_hand": "好的，抬起左手。",
+    "lower_left_hand": "好的，放下左手。",
+    "raise_right_hand": "好的，抬起右手。",
+    "lower_right_hand": "好的，放下右手。",
+    "speak": "我来说话。",
+}
+_SHOULDER_JOINTS = {"left_arm": "left_shoulder", "right_arm": "right_shoulder"}
+
+
+def _intent_command(spec) -> Dict[str, Any]:
+    if spec.get("type") == "joint":
+        return {"tool": "move_joint", "args": {"joint_name": _SHOULDER_JOINTS[spec.get("joint")], "angle": spec.get("angle")}}
+    return {"tool": spec.get("tool"), "args": {"text": spec.get("text")}}
+
+
 def _fallback_agent(user_text: str) -> AgentReply:
     """本地模拟AI代理 - 简化版本"""
     text = f"收到：{user_text}。我会尽量帮你。"
     cmds = []
     
-    # 简单的规则匹配
-    if any(word in user_text for word in ['抬起左手', '举起左手']):
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "left_shoulder", "angle": 90}})
-        text = "好的，抬起左手。"
-    elif any(word in user_text for word in ['放下左手']):
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "left_shoulder", "angle": 0}})
-        text = "好的，放下左手。"
-    elif any(word in user_text for word in ['抬起右手', '举起右手']):
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "right_shoulder", "angle": 90}})
-        text = "好的，抬起右手。"
-    elif any(word in user_text for word in ['放下右手']):
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "right_shoulder", "angle": 0}})
-        text = "好的，放下右手。"
-    elif any(word in user_text for word in ['说话', '问候']):
-        cmds.append({"tool": "say", "args": {"text": "你好，我是机器人"}})
-        text = "我来说话。"
+    # 机器人意图：共享意图引擎单次扫描
+    match = get_intent_engine().match(user_text, _FALLBACK_REPLIES, ordered=True)
+    if match is not None:
+        cmds.append(_intent_command(match.spec))
+        text = _FALLBACK_REPLIES[match.intent]
     elif any(word in user_text for word in ['你好', 'hello']):
         text = "你好！我是你的机器人助手，可以和你聊天，也可以控制机器人。有什么需要帮助的吗？"
     
@@ -5,6 +5,8 @@ from typing import List, Dict, Any
 
 from dotenv import load_dotenv
 
+from intent_engine import get_intent_engine
+
 load_dotenv()
 
 # 使用火山引擎官方SDK
@@ -40,19 +42,25 @@ class AgentReply:
     commands: List[Dict[str, Any]]  # each: {"tool": str, "args": {...}}
 
 
+# 本地兜底可识别的关节意图 -> 回复附注（命令短语来自共享意图引擎 voice_commands.json）
+_FALLBACK_NOTES = {
+    "raise_right_elbow": "（准备抬右肘 30 度）",
+    "raise_left_elbow": "（准备抬左肘 30 度）",
+    "wave": "（准备挥手）",
+}
+
+
 def _fallback_agent(user_text: str) -> AgentReply:
     """本地模拟：当输入包含类似 '抬右肘30度' 时，生成一条 move_joint 命令"""
     text = f"收到：{user_text}。我会尽量帮你。"
     cmds = []
-    if "抬右肘" in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint": "r_elbow", "position_deg": 30.0, "speed": 0.5}})
-        text += "（准备抬右肘 30 度）"
-    elif "抬左肘" in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint": "l_elbow", "position_deg": 30.0, "speed": 0.5}})
-        text += "（准备抬左肘 30 度）"
-    elif "挥手" in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint": "r_wrist", "position_deg": 45.0, "speed": 0.8}})
-        text += "（准备挥手）"
+    match = get_intent_engine().match(user_text, _FALLBACK_NOTES, ordered=True)
+    if match is not None:
+        spec = match.spec
+        cmds.append({"tool": "move_joint", "args": {"joint": spec.get("joint"),
+                                                    "position_deg": spec.get("position_deg"),
+                                                    "speed": spec.get("speed")}})
+        text += _FALLBACK_NOTES[match.intent]
     return AgentReply(text=text, commands=cmds)
 
 
@@ -6,6 +6,8 @@ from typing import List, Dict, Any
 import requests
 from dotenv import load_dotenv
 
+from intent_engine import get_intent_engine
+
 load_dotenv()
 
 API_KEY = os.getenv("ARK_API_KEY", "") or os.getenv("DOUBAO_API_KEY", "")
@@ -34,24 +36,32 @@ class AgentReply:
     text: str
     commands: List[Dict[str, Any]]
 
+# 本地兜底可识别的机器人意图 -> 回复文本（命令短语来自共享意图引擎 voice_commands.json）
+_FALLBACK_REPLIES = {
+    "raise_left_hand": "抬起左手。",
+    "lower_left_hand": "放下左手。",
+    "raise_right_hand": "抬起右手。",
+    "lower_right_hand": "放下右手。",
+}
+_SHOULDER_JOINTS = {"left_arm": "left_shoulder", "right_arm": "right_shoulder"}
+
+
+def _intent_command(spec) -> Dict[str, Any]:
+    if spec.get("type") == "joint":
+        return {"tool": "move_joint", "args": {"joint_name": _SHOULDER_JOINTS[spec.get("joint")], "angle": spec.get("angle")}}
+    return {"tool": spec.get("tool"), "args": {"text": spec.get("text")}}
+
+
 def _fallback_agent(user_text: str) -> AgentReply:
     """本地AI代理 - 直接回答版本"""
     text = ""
     cmds = []
     
-    # 机器人控制
-    if '抬起左手' in user_text or '举起左手' in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "left_shoulder", "angle": 90}})
-        text = "抬起左手。"
-    elif '放下左手' in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "left_shoulder", "angle": 0}})
-        text = "放下左手。"
-    elif '抬起右手' in user_text or '举起右手' in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "right_shoulder", "angle": 90}})
-        text = "抬起右手。"
-    elif '放下右手' in user_text:
-        cmds.append({"tool": "move_joint", "args": {"joint_name": "right_shoulder", "angle": 0}})
-        text = "放下右手。"
+    # 机器人控制：共享意图引擎单次扫描
+    match = get_intent_engine().match(user_text, _FALLBACK_REPLIES, ordered=True)
+    if match is not None:
+        cmds.append(_intent_command(match.spec))
+        text = _FALLBACK_REPLIES[match.intent]
     
     # 历史人物 - 刘备
     elif '刘备' in user_text or '玄德' in user_text:
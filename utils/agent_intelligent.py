@@ -12,6 +12,8 @@ from typing import List, Dict, Any
 import requests
 from dotenv import load_dotenv
 
+from intent_engine import get_intent_engine
+
 load_dotenv()
 
 API_KEY = os.getenv("DOUBAO_API_KEY", "")
@@ -70,35 +72,39 @@ class AgentReply:
     commands: List[Dict[str, Any]]  # each: {"action": str, ...}
 
 
+# 本地兜底可识别的机器人意图 -> 回复文本（命令短语来自共享意图引擎 voice_commands.json）
+_FALLBACK_REPLIES = {
+    "move_forward": "好的，让机器人前进。",
+    "move_backward": "好的，让机器人后退。",
+    "move_left": "好的，让机器人向左移动。",
+    "move_right": "好的，让机器人向右移动。",
+    "turn_around": "好的，让机器人转身。",
+    "raise_left_hand": "好的，让机器人抬起左手。",
+    "lower_right_hand": "好的，让机器人放下右手。",
+    "stop": "好的，让机器人停止。",
+}
+
+
+def _intent_command(spec) -> Dict[str, Any]:
+    kind = spec.get("type")
+    if kind == "movement":
+        return {"action": "move", "direction": spec.get("direction")}
+    if kind == "rotation":
+        return {"action": "rotate", "angle": spec.get("angle")}
+    if kind == "joint":
+        return {"action": spec.get("joint_action"), "joint": spec.get("joint")}
+    return {"action": spec.get("action")}
+
+
 def _fallback_agent(user_text: str) -> AgentReply:
     """本地模拟AI代理 - 智能增强版"""
     cmds = []
     
-    # 机器人控制命令检测
-    if any(word in user_text for word in ['前进', '向前', '往前']):
-        cmds.append({"action": "move", "direction": "forward"})
-        text = "好的，让机器人前进。"
-    elif any(word in user_text for word in ['后退', '向后', '往后']):
-        cmds.append({"action": "move", "direction": "backward"}) 
-        text = "好的，让机器人后退。"
-    elif any(word in user_text for word in ['向左', '往左']):
-        cmds.append({"action": "move", "direction": "left"})
-        text = "好的，让机器人向左移动。"
-    elif any(word in user_text for word in ['向右', '往右']):
-        cmds.append({"action": "move", "direction": "right"})
-        text = "好的，让机器人向右移动。"
-    elif any(word in user_text for word in ['转身', '掉头']):
-        cmds.append({"action": "rotate", "angle": 180})
-        text = "好的，让机器人转身。"
-    elif any(word in user_text for word in ['抬起左手', '举起左手']):
-        cmds.append({"action": "joint", "joint": "left_arm", "action": "raise"})
-        text = "好的，让机器人抬起左手。"
-    elif any(word in user_text for word in ['放下右手', '降下右手']):
-        cmds.append({"action": "joint", "joint": "right_arm", "action": "lower"})
-        text = "好的，让机器人放下右手。"
-    elif any(word in user_text for word in ['停止', '停下']):
-        cmds.append({"action": "stop"})
-        text = "好的，让机器人停止。"
+    # 机器人控制命令检测：共享意图引擎单次扫描
+    match = get_intent_engine().match(user_text, _FALLBACK_REPLIES, ordered=True)
+    if match is not None:
+        cmds.append(_intent_command(match.spec))
+        text = _FALLBACK_REPLIES[match.intent]
     
     # 智能对话回复 - 大幅增强
     elif any(word in user_text for word in ['你好', 'hello', '嗨', '哈喽', '早上好', '下午好', '晚上好']):
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+稠密向量索引（纯 NumPy）
+知识库向量检索的数值核心，与嵌入模型解耦：
+
+- 入库时一次性 L2 归一化，存为行连续的 float32（可选 float16，内存减半）矩阵，
+  查询时余弦相似度即一次矩阵-向量乘积，不再对语料逐条重新归一化；
+- Top-K 用 np.argpartition 选出候选后只对 K 个结果排序，而非全量 argsort；
+- search() 接受一条或一批查询向量，批量查询合并为一次矩阵乘积；
+- float16 存储时按块转换为 float32 计算，避免半精度矩阵乘法走非 BLAS 路径，也限制临时内存；
+  内存减半的代价是单条查询变慢，语料很大、以批量查询为主时再考虑；
+- 增量维护：append() 追加到按倍数扩容的缓冲区（均摊 O(新增行数)），delete() 只打墓碑标记
+  （检索时屏蔽），墓碑比例超过阈值时由调用方 compact() 压缩（只搬移向量，不重新编码）；
+- 元数据过滤：MetadataColumns 为每个字段（file_type / category / source）保存按行的分类编码数组，
+  过滤条件转为行掩码，search(mask=...) 只对选中的行做矩阵乘积，不重建索引、不重新编码。
+
+环境变量：
+    DRAGON_KB_VECTOR_DTYPE   向量存储精度（float32 / float16，默认 float32）
+    DRAGON_KB_COMPACT_RATIO  墓碑行占比超过该值时压缩（默认 0.2）
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# float16 存储时每块转换的行数（约 65536 × 384 × 4B ≈ 100MB 临时内存）
+BLOCK_ROWS = 65536
+
+SearchHits = Tuple[np.ndarray, np.ndarray]
+
+
+def compact_ratio() -> float:
+    try:
+        return float(os.environ.get("DRAGON_KB_COMPACT_RATIO", "0.2"))
+    except ValueError:
+        return 0.2
+
+
+def storage_dtype(dtype=None) -> np.dtype:
+    """存储精度：显式参数优先，其次环境变量 DRAGON_KB_VECTOR_DTYPE"""
+    name = dtype or os.environ.get("DRAGON_KB_VECTOR_DTYPE", "float32")
+    resolved = np.dtype(name)
+    if resolved not in (np.dtype(np.float32), np.dtype(np.float16)):
+        raise ValueError(f"不支持的向量精度: {name}")
+    return resolved
+
+
+def normalize_rows(vectors, dtype=np.float32) -> np.ndarray:
+    """按行 L2 归一化并转为行连续矩阵（零向量保持为零）"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=dtype)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """每行得分最高的 k 个下标（按得分降序）；argpartition 选候选，只排序 k 个"""
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+class DenseVectorIndex:
+    """归一化嵌入矩阵上的精确余弦相似度检索"""
+
+    def __init__(self, embeddings=None, dtype=None, normalized: bool = False):
+        self.dtype = storage_dtype(dtype)
+        self._buffer: Optional[np.ndarray] = None
+        self._size = 0
+        self._deleted: Optional[np.ndarray] = None
+        self.deleted_count = 0
+        if embeddings is not None:
+            self.set(embeddings, normalized=normalized)
+
+    def set(self, embeddings, normalized: bool = False) -> None:
+        """替换全部向量；normalized=True 表示输入已归一化（如从磁盘加载，内存映射时不复制）"""
+        if normalized:
+            self._buffer = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        else:
+            self._buffer = normalize_rows(embeddings, self.dtype)
+        self._size = self._buffer.shape[0]
+        self._deleted = None
+        self.deleted_count = 0
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        """有效行（含墓碑行）组成的矩阵视图"""
+        return None if self._buffer is None else self._buffer[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> int:
+        return 0 if self._buffer is None else self._buffer.shape[1]
+
+    @property
+    def live_count(self) -> int:
+        return self._size - self.deleted_count
+
+    @property
+    def deleted_ratio(self) -> float:
+        return self.deleted_count / self._size if self._size else 0.0
+
+    def append(self, vectors, normalized: bool = False) -> range:
+        """追加向量，返回新行号范围；缓冲区不足（或为只读内存映射）时按倍数扩容复制"""
+        rows = np.asarray(vectors) if normalized else normalize_rows(vectors, self.dtype)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        count = rows.shape[0]
+        if count == 0:
+            return range(self._size, self._size)
+        if self._buffer is None:
+            self._buffer = np.empty((0, rows.shape[1]), dtype=self.dtype)
+        needed = self._size + count
+        if needed > self._buffer.shape[0] or not self._buffer.flags.writeable:
+            capacity = max(needed, 2 * self._size, 64)
+            grown = np.empty((capacity, rows.shape[1]), dtype=self.dtype)
+            grown[:self._size] = self._buffer[:self._size]
+            self._buffer = grown
+            if self._deleted is not None:
+                self._deleted = np.concatenate([self._deleted, np.zeros(capacity - len(self._deleted), dtype=bool)])
+        self._buffer[self._size:needed] = rows
+        start, self._size = self._size, needed
+        return range(start, needed)
+
+    def delete(self, rows: Iterable[int]) -> int:
+        """给行打墓碑（检索时跳过）；返回新增墓碑数"""
+        rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+        if rows.size == 0:
+            return 0
+        if self._deleted is None:
+            self._deleted = np.zeros(self._buffer.shape[0], dtype=bool)
+        fresh = rows[~self._deleted[rows]]
+        self._deleted[fresh] = True
+        self.deleted_count += len(fresh)
+        return len(fresh)
+
+    def is_deleted(self, row: int) -> bool:
+        return self._deleted is not None and bool(self._deleted[row])
+
+    def selection(self, mask: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """可检索的行：元数据掩码与墓碑合并后的布尔数组；既无掩码也无墓碑时为 None"""
+        if mask is None and not self.deleted_count:
+            return None
+        selected = np.ones(self._size, dtype=bool) if mask is None else np.asarray(mask[:self._size], dtype=bool)
+        if self.deleted_count:
+            selected = selected & ~self._deleted[:self._size]
+        return selected
+
+    def compact(self) -> np.ndarray:
+        """移除墓碑行；返回保留行的旧行号（新行号即其位置）"""
+        if not self.deleted_count:
+            return np.arange(self._size)
+        keep = np.flatnonzero(~self._deleted[:self._size])
+        self._buffer = np.ascontiguousarray(self._buffer[keep])
+        self._size = len(keep)
+        self._deleted = None
+        self.deleted_count = 0
+        return keep
+
+    def scores(self, queries, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """查询向量（单条或一批）的余弦相似度，形状 (查询数, 行数)
+
+        rows 给定时只计算这些行（调用方负责排除墓碑行）；否则计算全部行，墓碑行得分为 -inf。
+        """
+        q = normalize_rows(queries)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype == np.float32:
+            out = q @ matrix.T
+        else:
+            out = np.empty((q.shape[0], matrix.shape[0]), dtype=np.float32)
+            for start in range(0, matrix.shape[0], BLOCK_ROWS):
+                block = matrix[start:start + BLOCK_ROWS].astype(np.float32)
+                out[:, start:start + block.shape[0]] = q @ block.T
+        if rows is None and self.deleted_count:
+            out[:, self._deleted[:self._size]] = -np.inf
+        return out
+
+    def search(self, queries, top_k: int = 5, threshold: Optional[float] = None,
+               mask: Optional[np.ndarray] = None) -> List[SearchHits]:
+        """每条查询返回 (下标数组, 得分数组)，按得分降序；threshold 过滤得分不高于阈值的结果；
+        mask 为按行的布尔掩码（元数据过滤），只在选中的行中检索"""
+        rows = None
+        if mask is not None:
+            rows = np.flatnonzero(self.selection(mask))
+        if not self.live_count or (rows is not None and rows.size == 0):
+            count = normalize_rows(queries).shape[0]
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in range(count)]
+        scores = self.scores(queries, rows)
+        indices = top_k_indices(scores, top_k)
+        hits = []
+        for row, idx in zip(scores, indices):
+            values = row[idx]
+            keep = values > (threshold if threshold is not None else -np.inf)
+            idx, values = idx[keep], values[keep]
+            hits.append((idx if rows is None else rows[idx], values))
+        return hits
+
+    def memory_bytes(self) -> int:
+        return 0 if self._buffer is None else self._buffer.nbytes
+
+
+class MetadataColumns:
+    """按字段的分类编码列：每行一个整数编码，过滤条件组合为行掩码
+
+    条件形如 {"file_type": "pdf", "category": ["产品", "政策"]}：字段之间为"且"，
+    同一字段的多个取值为"或"；缺失该字段的行编码为 -1，不匹配任何取值。
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self._codes: Dict[str, np.ndarray] = {f: np.empty(0, dtype=np.int32) for f in self.fields}
+        self._values: Dict[str, Dict[Any, int]] = {f: {} for f in self.fields}
+
+    def __len__(self) -> int:
+        return len(self._codes[self.fields[0]]) if self.fields else 0
+
+    def _encode(self, field: str, documents: Sequence[Dict[str, Any]]) -> np.ndarray:
+        values = self._values[field]
+        codes = np.empty(len(documents), dtype=np.int32)
+        for i, doc in enumerate(documents):
+            value = doc.get(field)
+            if value is None or isinstance(value, (list, dict)):
+                codes[i] = -1
+            else:
+                codes[i] = values.setdefault(value, len(values))
+        return codes
+
+    def build(self, documents: Sequence[Dict[str, Any]]) -> None:
+        documents = list(documents)
+        self._values = {f: {} for f in self.fields}
+        self._codes = {f: self._encode(f, documents) for f in self.fields}
+
+    def append(self, documents: Sequence[Dict[str, Any]]) -> None:
+        for field in self.fields:
+            self._codes[field] = np.concatenate([self._codes[field], self._encode(field, documents)])
+
+    def take(self, keep: np.ndarray) -> None:
+        """压缩后只保留 keep 中的行（与 DenseVectorIndex.compact() 的返回值对应）"""
+        for field in self.fields:
+            self._codes[field] = self._codes[field][keep]
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """过滤条件 -> 行掩码；无条件时返回 None"""
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        if not filters:
+            return None
+        result = np.ones(len(self), dtype=bool)
+        for field, wanted in filters.items():
+            if field not in self._codes:
+                raise KeyError(f"不支持按字段 {field} 过滤（可用: {', '.join(self.fields)}）")
+            if isinstance(wanted, (str, int, float)):
+                wanted = [wanted]
+            codes = [self._values[field][v] for v in wanted if v in self._values[field]]
+            result &= np.isin(self._codes[field], codes)
+        return result